@@ -0,0 +1,190 @@
+""" Benchmarks the peak memory of loading a file into SQLite whole against
+    loading it a chunk of rows at a time, as the file grows.
+
+    The CSV is sample_data/bigfoot_sightings.csv repeated --scale times, and
+    the parquet file is the same data in row groups of --row-group-rows
+    rows. Each load runs in a fresh process and writes to a database on
+    disk, so the peak memory (max RSS) is the load's own rather than the
+    loaded table's. The import of the loader is included in it but not in
+    the time. Loading in chunks keeps the peak flat as the file grows.
+
+    Usage: python benchmarks/bench_chunked_ingestion.py [--scale 25 50 100]
+        [--chunk-rows 1000] [--row-group-rows 50000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_shared_scans import scaled_csv
+
+ROW_FORMAT = "{:>7} {:>8} {:>15} | {:>10} {:>12}"
+
+SQLITE = "svl.data_sources.sqlite:"
+
+# The loaders for each kind of file, as module:function or "pandas" for
+# pandas' readers and to_sql, and whether they load in chunks.
+LOADERS = {
+    "csv": [
+        ("pandas", "pandas", False),
+        ("pandas chunks", "pandas", True),
+        ("streaming", SQLITE + "file_to_sqlite", True),
+    ],
+    "parquet": [
+        ("pandas", "pandas", False),
+        ("pandas chunks", "pandas", True),
+        ("streaming", SQLITE + "file_to_sqlite", True),
+    ],
+}
+
+LOAD_SCRIPT = """
+import importlib
+import json
+import resource
+import sqlite3
+import sys
+import time
+
+
+def pandas_frames(filename, chunk_rows=None):
+    import pandas as pd
+
+    if not filename.endswith("parquet"):
+        return (
+            [pd.read_csv(filename)]
+            if chunk_rows is None
+            else pd.read_csv(filename, chunksize=chunk_rows)
+        )
+    elif chunk_rows is None:
+        return [pd.read_parquet(filename)]
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(filename)
+    return (
+        pa.Table.from_batches([batch]).to_pandas()
+        for ii in range(parquet_file.num_row_groups)
+        for batch in parquet_file.read_row_group(ii).to_batches(chunk_rows)
+    )
+
+
+def pandas_to_sqlite(filename, table_name, conn, chunk_rows=None):
+    # The first frame creates the table, and the later ones are appended.
+    for ii, frame in enumerate(pandas_frames(filename, chunk_rows)):
+        frame.to_sql(
+            table_name,
+            conn,
+            index=False,
+            if_exists="fail" if ii == 0 else "append",
+        )
+
+
+if sys.argv[3] == "pandas":
+    import pandas
+
+    loader = pandas_to_sqlite
+else:
+    module, function = sys.argv[3].split(":")
+    loader = getattr(importlib.import_module(module), function)
+kwargs = {"chunk_rows": int(sys.argv[4])} if sys.argv[4] != "0" else {}
+
+conn = sqlite3.connect(sys.argv[2])
+start = time.perf_counter()
+loader(sys.argv[1], "bigfoot", conn, **kwargs)
+conn.commit()
+print(
+    json.dumps(
+        {
+            "seconds": time.perf_counter() - start,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    )
+)
+"""
+
+
+PARQUET_SCRIPT = """
+import sys
+
+import pyarrow.csv
+import pyarrow.parquet as pq
+
+table = pyarrow.csv.read_csv(sys.argv[1])
+pq.write_table(table, sys.argv[2], row_group_size=int(sys.argv[3]))
+"""
+
+
+def scaled_parquet(csv_path, row_group_rows):
+    """ Writes the CSV to a parquet file next to it, with the row groups the
+        given size.
+
+        This reads the whole CSV, so it's done in another process: a process
+        starts with the peak memory of the one it was forked from.
+    """
+    path = os.path.splitext(csv_path)[0] + ".parquet"
+    subprocess.run(
+        [sys.executable, "-c", PARQUET_SCRIPT, csv_path, path]
+        + [str(row_group_rows)],
+        check=True,
+    )
+    return path
+
+
+def load(path, database, loader, chunk_rows):
+    """ Loads the file in a new process, returning its time and peak memory.
+    """
+    if os.path.exists(database):
+        os.remove(database)
+    completed = subprocess.run(
+        [sys.executable, "-c", LOAD_SCRIPT, path, database, loader]
+        + [str(chunk_rows)],
+        check=True,
+        stdout=subprocess.PIPE,
+    )
+    return json.loads(completed.stdout.decode("utf-8"))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--scale", type=int, nargs="+", default=[25, 50, 100]
+    )
+    arg_parser.add_argument("--chunk-rows", type=int, default=1000)
+    arg_parser.add_argument("--row-group-rows", type=int, default=50000)
+    args = arg_parser.parse_args()
+
+    print(
+        ROW_FORMAT.format("scale", "file", "loader", "load ms", "max RSS MB")
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, "bigfoot.db")
+        for scale in args.scale:
+            csv_path = scaled_csv(directory, scale)
+            paths = {
+                "csv": csv_path,
+                "parquet": scaled_parquet(csv_path, args.row_group_rows),
+            }
+            for kind, loaders in LOADERS.items():
+                for name, loader, chunked in loaders:
+                    stats = load(
+                        paths[kind],
+                        database,
+                        loader,
+                        args.chunk_rows if chunked else 0,
+                    )
+                    print(
+                        ROW_FORMAT.format(
+                            scale,
+                            kind,
+                            name,
+                            "{:.1f}".format(1000 * stats["seconds"]),
+                            "{:.1f}".format(stats["max_rss_kb"] / 1024),
+                        )
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+""" Compares the grid and compact layouts on pathological plot trees, where
+    groups with coprime numbers of charts blow the lcm grid up.
+
+    For each layout this reports the number of CSS grid row and column
+    tracks, the number of grid cells the browser has to size (rows x
+    columns), the size of the page's grid CSS and the time to render the
+    page. Browser layout itself isn't measured here; it scales with the
+    tracks and cells.
+
+    Usage: python benchmarks/bench_compact_layout.py [--repeat 5]
+"""
+import argparse
+import re
+import time
+
+from svl.compiler.layout import tree_to_grid
+from svl.plotly import plotly_template, plotly_template_vars
+
+ROW_FORMAT = "{:<24} {:>8} | {:>6} {:>6} {:>10} {:>10} {:>10}"
+
+NUMBER = {"type": "number", "data": "bigfoot", "value": {"field": "number"}}
+
+
+def group(cat, sizes):
+    """ Concatenates groups of charts with the given sizes.
+    """
+    other_cat = "vcat" if cat == "hcat" else "hcat"
+    return {cat: [{other_cat: [NUMBER] * size} for size in sizes]}
+
+
+LAYOUTS = [
+    ("columns of 5, 7, 9", group("hcat", [5, 7, 9])),
+    ("columns of 5, 7, 9, 11", group("hcat", [5, 7, 9, 11])),
+    (
+        "nested 5, 7, 9 x 2, 3, 4",
+        {
+            "vcat": [
+                group("hcat", [5, 7, 9]),
+                group("hcat", [2, 3, 4]),
+                {"hcat": [group("vcat", [5, 7]), group("vcat", [9, 11])]},
+            ]
+        },
+    ),
+    ("primes up to 13", group("hcat", [2, 3, 5, 7, 11, 13])),
+]
+
+
+def benchmark(tree, layout, repeat):
+    svl_plots = tree_to_grid(tree)
+    datas = [{"value": 1}] * len(svl_plots)
+    template = plotly_template()
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        template_vars = plotly_template_vars(svl_plots, datas, layout=layout)
+        template_vars["plotly_offline"] = False
+        page = template.render(**template_vars)
+        times.append(time.perf_counter() - start)
+
+    rows = len(template_vars.get("row_tracks", [])) or template_vars[
+        "num_rows"
+    ]
+    columns = len(
+        template_vars.get("column_tracks", [])
+    ) or template_vars["num_columns"]
+    grid_css = "".join(re.findall(r"grid-template-[^;]*;", page))
+
+    return rows, columns, len(grid_css), min(times)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    print(
+        ROW_FORMAT.format(
+            "tree", "layout", "rows", "cols", "cells", "css bytes", "render ms"
+        )
+    )
+    for name, tree in LAYOUTS:
+        for layout in ["grid", "compact"]:
+            rows, columns, css_bytes, render_time = benchmark(
+                tree, layout, args.repeat
+            )
+            print(
+                ROW_FORMAT.format(
+                    name,
+                    layout,
+                    rows,
+                    columns,
+                    rows * columns,
+                    css_bytes,
+                    "{:.2f}".format(1000 * render_time),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+""" Benchmarks the compiler front-end and rendering on generated SVL programs.
+
+    parse_svl, tree_to_grid, validate_plot and template rendering are timed
+    separately for each combination of chart count, nesting depth, dataset
+    count and chart property count, so a scaling regression in one stage
+    shows up on its own. Rendering uses synthetic plot data, so no data is
+    loaded or queried.
+
+    Usage: python benchmarks/bench_compiler.py [--charts 10 100 500]
+        [--depth 1 10] [--datasets 1 10] [--properties 0 4] [--repeat 5]
+"""
+import argparse
+import itertools
+import time
+
+from svl_generator import generate_svl
+
+from svl.compiler.ast import parse_svl
+from svl.compiler.layout import tree_to_grid
+from svl.compiler.plot_validators import validate_plot
+from svl.plotly import plotly_template, plotly_template_vars
+
+ROW_FORMAT = "{:>6} {:>5} {:>8} {:>5} | {:>10} {:>10} {:>10} {:>10}"
+TIMING_FORMAT = "{:10.2f}"
+
+# Plot data in the shape produced by get_svl_data for each plot type.
+XY_DATA = {"x": list(range(50)), "y": list(range(50))}
+SPLIT_DATA = {"a": XY_DATA, "b": XY_DATA}
+
+
+def synthetic_data(plot):
+    """ Produces data shaped like the data for the plot would be.
+    """
+    if plot["type"] == "pie":
+        return {"labels": ["a", "b", "c"], "values": [1, 2, 3]}
+    elif plot["type"] == "number":
+        return {"value": 42}
+    elif plot["type"] == "histogram":
+        axis = "x" if "x" in plot else "y"
+        data = {axis: list(range(100))}
+        return {"a": data, "b": data} if "split_by" in plot else data
+    elif "split_by" in plot:
+        return SPLIT_DATA
+    elif "color_by" in plot:
+        return dict(XY_DATA, color_by=list(range(50)))
+    else:
+        return XY_DATA
+
+
+def best_time(function, repeat):
+    """ Runs the function repeat times, returning the fastest time in
+        seconds and the function's result.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def benchmark(charts, depth, datasets, properties, repeat):
+    source = generate_svl(
+        charts=charts, depth=depth, datasets=datasets, properties=properties
+    )
+
+    parse_time, svl_ast = best_time(lambda: parse_svl(source), repeat)
+    layout_time, svl_plots = best_time(lambda: tree_to_grid(svl_ast), repeat)
+    validate_time, _ = best_time(
+        lambda: [validate_plot(plot) for plot in svl_plots], repeat
+    )
+
+    datas = [synthetic_data(plot) for plot in svl_plots]
+    template = plotly_template()
+
+    def _render():
+        template_vars = plotly_template_vars(svl_plots, datas)
+        template_vars["plotly_offline"] = False
+        return template.render(**template_vars)
+
+    render_time, _ = best_time(_render, repeat)
+
+    return parse_time, layout_time, validate_time, render_time
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--charts", type=int, nargs="+", default=[10, 100, 500]
+    )
+    arg_parser.add_argument("--depth", type=int, nargs="+", default=[1, 10])
+    arg_parser.add_argument(
+        "--datasets", type=int, nargs="+", default=[1, 10]
+    )
+    arg_parser.add_argument(
+        "--properties", type=int, nargs="+", default=[0, 4]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    # Warm the parser up so its construction isn't counted.
+    parse_svl(generate_svl(charts=1))
+
+    print(
+        ROW_FORMAT.format(
+            "charts",
+            "depth",
+            "datasets",
+            "props",
+            "parse ms",
+            "layout ms",
+            "valid ms",
+            "render ms",
+        )
+    )
+    for charts, depth, datasets, properties in itertools.product(
+        args.charts, args.depth, args.datasets, args.properties
+    ):
+        timings = benchmark(charts, depth, datasets, properties, args.repeat)
+        print(
+            ROW_FORMAT.format(
+                charts,
+                depth,
+                datasets,
+                properties,
+                *[TIMING_FORMAT.format(1000 * t) for t in timings]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
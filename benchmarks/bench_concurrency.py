@@ -0,0 +1,65 @@
+""" Stress tests compiling SVL programs from many threads in one process and
+    reports the throughput for each thread count.
+
+    Each compile parses, lays out and validates a program (no data is
+    loaded). The results from every thread count are checked against a
+    sequential compile.
+
+    Usage: python benchmarks/bench_concurrency.py [--scripts 5000]
+"""
+import argparse
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from svl.compiler.compiler import _compile
+
+SCRIPT_TEMPLATE = """
+DATASETS bigfoot SQL "SELECT 1 AS date, 2 AS temperature_mid"
+CONCAT(
+    LINE bigfoot X date BY YEAR Y date COUNT TITLE "Sightings {ii}"
+    (
+        HISTOGRAM bigfoot X temperature_mid BINS {bins}
+        PIE bigfoot AXIS temperature_mid HOLE 0.{hole}
+    )
+)
+NUMBER bigfoot VALUE temperature_mid AVG
+"""
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--scripts", type=int, default=5000)
+    arg_parser.add_argument(
+        "--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16]
+    )
+    args = arg_parser.parse_args()
+
+    scripts = [
+        SCRIPT_TEMPLATE.format(ii=ii, bins=ii % 50 + 1, hole=ii % 10)
+        for ii in range(args.scripts)
+    ]
+    truth = [_compile(script, {}) for script in scripts]
+
+    baseline = None
+    for threads in args.threads:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            # Warm up every thread's parser so it isn't counted.
+            list(executor.map(lambda s: _compile(s, {}), scripts[:threads]))
+
+            start = time.perf_counter()
+            answer = list(executor.map(lambda s: _compile(s, {}), scripts))
+            elapsed = time.perf_counter() - start
+
+        assert truth == answer, "Concurrent compile differs from sequential."
+        throughput = len(scripts) / elapsed
+        baseline = baseline or throughput
+        print(
+            "{:>3} threads: {:8.0f} compiles/s ({:.2f}x)".format(
+                threads, throughput, throughput / baseline
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+""" Benchmarks loading a dashboard's independent CSVs with different numbers
+    of worker processes (--load-workers on the command line).
+
+    The dashboard has a chart over each of --files CSVs, which are
+    sample_data/bigfoot_sightings.csv repeated --scale, 2 x --scale, ...
+    times. Each file is also timed on its own, in a dashboard with just its
+    chart. With one worker the files are parsed in threads of the calling
+    process, so the load takes about as long as the files do one after the
+    other (the sum); with more, the files share a pool of processes, and the
+    load can get down to about as long as the biggest file alone, or further
+    with that file parsed in parts. The speedup can't be more than the
+    number of CPUs (which is printed).
+
+    Usage: python benchmarks/bench_concurrent_loading.py [--files 5]
+        [--scale 10] [--load-workers 1 2 4 8] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+
+from bench_shared_scans import best_time, scaled_csv
+
+from svl.compiler.compiler import compile_program, execute_plan, plan_program
+
+ROW_FORMAT = "{:>8} | {:>10} {:>10} {:>10} {:>8}"
+
+
+def dashboard(paths):
+    """ Generates the dashboard, with a chart over each file.
+    """
+    return "DATASETS\n{}\n{}\n".format(
+        "\n".join(
+            'bigfoot_{} "{}"'.format(ii, path) for ii, path in enumerate(paths)
+        ),
+        "\n".join(
+            "BAR bigfoot_{} X classification Y temperature_mid AVG".format(ii)
+            for ii in range(len(paths))
+        ),
+    )
+
+
+def load_time(paths, load_workers, repeat):
+    """ Times loading the dashboard's files (only the columns its charts
+        use) and running its queries.
+    """
+    plan = plan_program(compile_program(dashboard(paths)))
+    return best_time(
+        lambda: execute_plan(plan, load_workers=load_workers), repeat
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--files", type=int, default=5)
+    arg_parser.add_argument("--scale", type=int, default=10)
+    arg_parser.add_argument(
+        "--load-workers", type=int, nargs="+", default=[1, 2, 4, 8]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for ii in range(args.files):
+            os.mkdir(os.path.join(directory, str(ii)))
+            paths.append(
+                scaled_csv(
+                    os.path.join(directory, str(ii)), args.scale * (ii + 1)
+                )
+            )
+        file_times = [load_time([path], 1, args.repeat) for path in paths]
+        print(
+            "{} files, {:.0f} MB, {} CPUs".format(
+                len(paths),
+                sum(os.path.getsize(path) for path in paths) / 2 ** 20,
+                os.cpu_count(),
+            )
+        )
+        print(
+            "sum of file loads {:.1f} ms, biggest file {:.1f} ms".format(
+                1000 * sum(file_times), 1000 * max(file_times)
+            )
+        )
+
+        print(
+            ROW_FORMAT.format(
+                "workers", "load ms", "x sum", "x biggest", "speedup"
+            )
+        )
+        baseline = None
+        for load_workers in args.load_workers:
+            dashboard_time = load_time(paths, load_workers, args.repeat)
+            baseline = baseline or dashboard_time
+            print(
+                ROW_FORMAT.format(
+                    load_workers,
+                    "{:.1f}".format(1000 * dashboard_time),
+                    "{:.2f}".format(dashboard_time / sum(file_times)),
+                    "{:.2f}".format(dashboard_time / max(file_times)),
+                    "{:.2f}x".format(baseline / dashboard_time),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
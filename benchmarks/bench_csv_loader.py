@@ -0,0 +1,101 @@
+""" Benchmarks loading a CSV into SQLite with pandas against the streaming
+    csv_to_sqlite loader.
+
+    The CSV is sample_data/bigfoot_sightings.csv repeated --scale times. Each
+    load runs in a fresh process, so the peak memory (max RSS) is the
+    load's own; the import of the loader is included in it but not in the
+    time.
+
+    Usage: python benchmarks/bench_csv_loader.py [--scale 50 200]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+
+from bench_shared_scans import scaled_csv
+
+ROW_FORMAT = "{:>7} {:>9} | {:>10} {:>12} {:>8}"
+
+# The loaders, as module:function, or "pandas" for read_csv and to_sql.
+LOADERS = {
+    "pandas": "pandas",
+    "streaming": "svl.data_sources.sqlite:csv_to_sqlite",
+}
+
+LOAD_SCRIPT = """
+import importlib
+import json
+import resource
+import sqlite3
+import sys
+import time
+
+if sys.argv[2] == "pandas":
+    import pandas
+
+    def loader(csv_filename, table_name, conn):
+        pandas.read_csv(csv_filename).to_sql(table_name, conn, index=False)
+
+else:
+    module, function = sys.argv[2].split(":")
+    loader = getattr(importlib.import_module(module), function)
+
+conn = sqlite3.connect(":memory:")
+start = time.perf_counter()
+loader(sys.argv[1], "bigfoot", conn)
+print(
+    json.dumps(
+        {
+            "seconds": time.perf_counter() - start,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    )
+)
+"""
+
+
+def load(path, loader):
+    """ Loads the CSV in a new process, returning its time and peak memory.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-c", LOAD_SCRIPT, path, loader],
+        check=True,
+        stdout=subprocess.PIPE,
+    )
+    return json.loads(completed.stdout.decode("utf-8"))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--scale", type=int, nargs="+", default=[50, 200]
+    )
+    args = arg_parser.parse_args()
+
+    print(
+        ROW_FORMAT.format(
+            "scale", "loader", "load ms", "max RSS MB", "speedup"
+        )
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scale:
+            path = scaled_csv(directory, scale)
+            baseline = None
+            for name, loader in LOADERS.items():
+                stats = load(path, loader)
+                baseline = baseline or stats["seconds"]
+                print(
+                    ROW_FORMAT.format(
+                        scale,
+                        name,
+                        "{:.1f}".format(1000 * stats["seconds"]),
+                        "{:.1f}".format(stats["max_rss_kb"] / 1024),
+                        "{:.2f}x".format(baseline / stats["seconds"]),
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+""" Benchmarks loading a dashboard's CSV without the dataset cache against
+    a warm dataset cache, as the file grows.
+
+    The CSV is sample_data/bigfoot_sightings.csv repeated --scale times, and
+    the cache is in a temporary directory (SVL_CACHE_DIR). The cold load is
+    the first one with the cache, which also stores the table in it, and
+    each warm load attaches the stored table instead of reading the file.
+    With --hash the cache identifies the file by a hash of its contents,
+    which means reading it, rather than by its modification time. The times
+    are the loads' own ("load_seconds" in the result's statistics); the
+    plots' queries take the same time either way.
+
+    Usage: python benchmarks/bench_dataset_cache.py [--scale 10 40 160]
+        [--hash] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+
+from bench_shared_scans import scaled_csv
+
+from svl.compiler.compiler import compile_program, execute_plan, plan_program
+
+ROW_FORMAT = "{:>7} {:>8} | {:>10} {:>10} {:>10} {:>8}"
+
+DASHBOARD = """
+DATASETS bigfoot "{}"
+BAR bigfoot X classification Y temperature_mid AVG
+HISTOGRAM bigfoot X humidity FILTER "humidity > 0.5"
+"""
+
+
+def load_time(plan, dataset_cache, dataset_cache_hash, repeat):
+    """ Runs the plan, returning the best time loading its datasets took.
+    """
+    return min(
+        execute_plan(
+            plan,
+            dataset_cache=dataset_cache,
+            dataset_cache_hash=dataset_cache_hash,
+        ).stats["load_seconds"]
+        for _ in range(repeat)
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--scale", type=int, nargs="+", default=[10, 40, 160]
+    )
+    arg_parser.add_argument("--hash", action="store_true")
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(
+        ROW_FORMAT.format(
+            "scale", "MB", "no cache", "cold ms", "warm ms", "speedup"
+        )
+    )
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["SVL_CACHE_DIR"] = os.path.join(directory, "cache")
+            path = scaled_csv(directory, scale)
+            plan = plan_program(compile_program(DASHBOARD.format(path)))
+
+            uncached_time = load_time(plan, False, args.hash, args.repeat)
+            cold_time = load_time(plan, True, args.hash, 1)
+            warm_time = load_time(plan, True, args.hash, args.repeat)
+            print(
+                ROW_FORMAT.format(
+                    scale,
+                    "{:.0f}".format(os.path.getsize(path) / 2 ** 20),
+                    "{:.1f}".format(1000 * uncached_time),
+                    "{:.1f}".format(1000 * cold_time),
+                    "{:.1f}".format(1000 * warm_time),
+                    "{:.1f}x".format(uncached_time / warm_time),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+""" Benchmarks loading a file dataset whole against loading it with a FILTER
+    on the dataset.
+
+    The dataset is sample_data/bigfoot_sightings.csv repeated --scale times,
+    with the filter keeping the recent sightings. Loading reads the file and
+    writes it to SQLite; the memory is the size of the loaded database.
+
+    Usage: python benchmarks/bench_dataset_filter.py [--scale 50 200]
+        [--repeat 3]
+"""
+import argparse
+import tempfile
+
+from bench_projection import database_bytes
+from bench_shared_scans import best_time, scaled_csv
+from svl.data_sources.sqlite import create_datasets
+
+ROW_FORMAT = "{:>7} {:>9} | {:>9} {:>10} {:>10} {:>8}"
+
+FILTER = "date > '2008-01-01'"
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--scale", type=int, nargs="+", default=[50, 200]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(
+        ROW_FORMAT.format(
+            "scale", "loading", "rows", "load ms", "db MB", "speedup"
+        )
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scale:
+            path = scaled_csv(directory, scale)
+            loadings = [
+                ("whole", {"bigfoot": {"file": path}}),
+                ("filtered", {"bigfoot": {"file": path, "filter": FILTER}}),
+            ]
+
+            baseline = None
+            for name, datasets in loadings:
+                load_time = best_time(
+                    lambda: create_datasets(datasets).close(), args.repeat
+                )
+                conn = create_datasets(datasets)
+                num_rows = conn.execute(
+                    "SELECT COUNT(*) FROM bigfoot"
+                ).fetchone()[0]
+                size = database_bytes(conn)
+                conn.close()
+                baseline = baseline or load_time
+                print(
+                    ROW_FORMAT.format(
+                        scale,
+                        name,
+                        num_rows,
+                        "{:.1f}".format(1000 * load_time),
+                        "{:.1f}".format(size / 2 ** 20),
+                        "{:.2f}x".format(baseline / load_time),
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
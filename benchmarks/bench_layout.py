@@ -0,0 +1,141 @@
+""" Benchmarks tree_to_grid against the original recursive layout on
+    generated plot trees.
+
+    Each tree is a balanced grid of nested CONCAT( ... ) / ( ... ) groups with
+    the given number of leaves, wrapped in a chain of single chart groups to
+    reach the given depth. The recursive layout copies every leaf once per
+    level above it, so it slows down with depth and eventually runs out of
+    stack.
+
+    Usage: python benchmarks/bench_layout.py [--leaves 100 1000 5000]
+        [--depth 10 100 300 2000] [--repeat 3]
+"""
+import argparse
+import itertools
+import time
+
+from functools import reduce
+from toolz import compose, concat, merge
+
+from svl.compiler.layout import (
+    START_POSITION,
+    lcm,
+    shift_node_position,
+    tree_to_grid,
+)
+
+ROW_FORMAT = "{:>7} {:>6} | {:>14} {:>14} {:>10}"
+
+listconcat = compose(list, concat)
+
+
+def recursive_tree_to_grid(tree):
+    """ The recursive layout tree_to_grid replaced.
+    """
+    if ("hcat" in tree) or ("vcat" in tree):
+        cat = "hcat" if "hcat" in tree else "vcat"
+        subtrees = [recursive_tree_to_grid(subtree) for subtree in tree[cat]]
+        row_breadths = [
+            reduce(max, [n["row_end"] for n in subtree])
+            for subtree in subtrees
+        ]
+        column_breadths = [
+            reduce(max, [n["column_end"] for n in subtree])
+            for subtree in subtrees
+        ]
+        row_length_unit = reduce(lcm, row_breadths)
+        column_length_unit = reduce(lcm, column_breadths)
+        row_shift = row_length_unit if cat == "vcat" else 0
+        column_shift = column_length_unit if cat == "hcat" else 0
+        return listconcat(
+            [
+                shift_node_position(
+                    node,
+                    row_shift * ii,
+                    column_shift * ii,
+                    int(row_length_unit / row_breadths[ii]),
+                    int(column_length_unit / column_breadths[ii]),
+                )
+                for node in subtree
+            ]
+            for ii, subtree in enumerate(subtrees)
+        )
+    else:
+        return [merge(tree, START_POSITION)]
+
+
+def generate_tree(leaves, depth, branching=4):
+    """ Generates a plot tree with the number of leaves and nesting depth.
+    """
+    nodes = [{"plot": ii} for ii in range(leaves)]
+    level = 0
+    while len(nodes) > 1:
+        cat = "hcat" if level % 2 == 0 else "vcat"
+        nodes = [
+            {cat: nodes[ii : ii + branching]}
+            for ii in range(0, len(nodes), branching)
+        ]
+        level += 1
+
+    tree = nodes[0]
+    for level in range(level, depth):
+        tree = {"hcat" if level % 2 == 0 else "vcat": [tree]}
+    return tree
+
+
+def best_time(function, repeat):
+    """ Runs the function repeat times, returning the fastest time in
+        seconds and the function's result.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--leaves", type=int, nargs="+", default=[100, 1000, 5000]
+    )
+    arg_parser.add_argument(
+        "--depth", type=int, nargs="+", default=[10, 100, 300, 2000]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(
+        ROW_FORMAT.format(
+            "leaves", "depth", "recursive ms", "iterative ms", "identical"
+        )
+    )
+    for leaves, depth in itertools.product(args.leaves, args.depth):
+        tree = generate_tree(leaves, depth)
+        iterative_time, grid = best_time(
+            lambda: tree_to_grid(tree), args.repeat
+        )
+        try:
+            recursive_time, recursive_grid = best_time(
+                lambda: recursive_tree_to_grid(tree), args.repeat
+            )
+            recursive = "{:14.2f}".format(1000 * recursive_time)
+            identical = str(grid == recursive_grid)
+        except RecursionError:
+            recursive = "RecursionError"
+            identical = "-"
+
+        print(
+            ROW_FORMAT.format(
+                leaves,
+                depth,
+                recursive,
+                "{:14.2f}".format(1000 * iterative_time),
+                identical,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
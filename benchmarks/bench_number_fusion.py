@@ -0,0 +1,98 @@
+""" Benchmarks executing a dashboard of NUMBER charts with one query per
+    chart against one fused query per dataset.
+
+    The charts aggregate different columns of one dataset, a couple of them
+    with their own FILTER. The dataset is sample_data/bigfoot_sightings.csv
+    repeated --scale times, loaded once; only the plan execution is timed.
+
+    Usage: python benchmarks/bench_number_fusion.py [--scale 200]
+        [--charts 2 5 10 20] [--repeat 3]
+"""
+import argparse
+import tempfile
+
+from bench_shared_scans import best_time, scaled_csv
+from svl.compiler.compiler import (
+    compile_program,
+    execute_plan,
+    load_datasets,
+    plan_program,
+)
+
+ROW_FORMAT = "{:>7} | {:>8} {:>8} | {:>13} {:>13} {:>8}"
+
+VALUES = [
+    "temperature_mid AVG",
+    "humidity MAX",
+    "number COUNT",
+    "temperature_high MIN",
+    "moon_phase AVG",
+]
+
+FILTERS = ["", ' FILTER "humidity > 0.5"', ""]
+
+
+def dashboard(path, charts):
+    """ Generates the dashboard, cycling through the values and filters.
+    """
+    return "DATASETS bigfoot \"{}\"\n{}\n".format(
+        path,
+        "\n".join(
+            "NUMBER bigfoot VALUE {}{}".format(
+                VALUES[ii % len(VALUES)], FILTERS[ii % len(FILTERS)]
+            )
+            for ii in range(charts)
+        ),
+    )
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--scale", type=int, default=200)
+    arg_parser.add_argument(
+        "--charts", type=int, nargs="+", default=[2, 5, 10, 20]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = scaled_csv(directory, args.scale)
+        conn = load_datasets(compile_program(dashboard(path, 1)))
+        num_rows = conn.execute("SELECT COUNT(*) FROM bigfoot").fetchone()[0]
+        print("{} rows".format(num_rows))
+
+        print(
+            ROW_FORMAT.format(
+                "charts",
+                "queries",
+                "fused",
+                "per-plot ms",
+                "fused ms",
+                "speedup",
+            )
+        )
+        for charts in args.charts:
+            program = compile_program(dashboard(path, charts))
+            per_plot = plan_program(program, fuse_numbers=False)
+            fused = plan_program(program)
+
+            per_plot_time = best_time(
+                lambda: execute_plan(per_plot, conn), args.repeat
+            )
+            fused_time = best_time(
+                lambda: execute_plan(fused, conn), args.repeat
+            )
+            print(
+                ROW_FORMAT.format(
+                    charts,
+                    execute_plan(per_plot, conn).stats["queries"],
+                    execute_plan(fused, conn).stats["queries"],
+                    "{:.1f}".format(1000 * per_plot_time),
+                    "{:.1f}".format(1000 * fused_time),
+                    "{:.2f}x".format(per_plot_time / fused_time),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
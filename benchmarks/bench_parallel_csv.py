@@ -0,0 +1,62 @@
+""" Benchmarks loading a big CSV into SQLite parsed by 1, 2, 4 and 8
+    processes.
+
+    The CSV is sample_data/bigfoot_sightings.csv repeated --scale times. With
+    one process the file is parsed in the calling process; with more it's
+    split into ranges of whole records, parsed by a pool of processes and
+    merged into the table. The speedup can't be more than the number of
+    CPUs (which is printed), and merging the parts into the table is still
+    done by one process.
+
+    Usage: python benchmarks/bench_parallel_csv.py [--scale 400]
+        [--processes 1 2 4 8] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+
+from bench_shared_scans import best_time, scaled_csv
+
+from svl.data_sources.sqlite import create_database, csv_to_sqlite
+
+ROW_FORMAT = "{:>9} | {:>10} {:>8}"
+
+
+def load(path, processes):
+    conn = create_database()
+    csv_to_sqlite(path, "bigfoot", conn, processes=processes)
+    conn.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--scale", type=int, default=400)
+    arg_parser.add_argument(
+        "--processes", type=int, nargs="+", default=[1, 2, 4, 8]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = scaled_csv(directory, args.scale)
+        print(
+            "{:.0f} MB, {} CPUs".format(
+                os.path.getsize(path) / 2 ** 20, os.cpu_count()
+            )
+        )
+        print(ROW_FORMAT.format("processes", "load ms", "speedup"))
+        baseline = None
+        for processes in args.processes:
+            load_time = best_time(lambda: load(path, processes), args.repeat)
+            baseline = baseline or load_time
+            print(
+                ROW_FORMAT.format(
+                    processes,
+                    "{:.1f}".format(1000 * load_time),
+                    "{:.2f}x".format(baseline / load_time),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+""" Benchmarks cold-start parse_svl latency with and without the serialized
+    LALR parser in the cache directory.
+
+    Each measurement is a fresh interpreter timing its first parse_svl call,
+    which includes obtaining the parser.
+
+    Usage: python benchmarks/bench_parser_cache.py [--runs 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, "..", "sample_scripts", "big_example.svl")
+
+COLD_PARSE = """
+import time
+from svl.compiler.ast import parse_svl
+source = open({script!r}).read()
+start = time.perf_counter()
+parse_svl(source)
+print(time.perf_counter() - start)
+"""
+
+
+def cold_parse_time(cache_dir):
+    """ Times the first parse_svl call in a new interpreter.
+    """
+    env = dict(os.environ, SVL_CACHE_DIR=cache_dir)
+    output = subprocess.run(
+        [sys.executable, "-c", COLD_PARSE.format(script=SCRIPT)],
+        env=env,
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    return float(output)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--runs", type=int, default=10)
+    args = arg_parser.parse_args()
+
+    # Every "build" run gets an empty cache, so the parse tables are
+    # constructed (and then written, which is included in the time).
+    build_times = []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory() as empty_cache:
+            build_times.append(cold_parse_time(empty_cache))
+
+    with tempfile.TemporaryDirectory() as warm_cache:
+        cold_parse_time(warm_cache)
+        cached_times = [cold_parse_time(warm_cache) for _ in range(args.runs)]
+
+    for label, times in [("build", build_times), ("cached", cached_times)]:
+        print(
+            "{:>6}: median {:7.1f} ms  min {:7.1f} ms".format(
+                label,
+                1000 * statistics.median(times),
+                1000 * min(times),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
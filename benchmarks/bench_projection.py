@@ -0,0 +1,87 @@
+""" Benchmarks loading a dashboard's datasets with and without column
+    projection.
+
+    The dashboard is sample_scripts/readme_example.svl's charts over
+    sample_data/bigfoot_sightings.csv repeated --scale times. Loading reads
+    the file and writes it to SQLite; the memory is the size of the loaded
+    database.
+
+    Usage: python benchmarks/bench_projection.py [--scale 50 200]
+        [--repeat 3]
+"""
+import argparse
+import tempfile
+
+from bench_shared_scans import best_time, scaled_csv
+from svl.compiler.compiler import compile_program
+from svl.compiler.dataset_graph import project_datasets
+from svl.data_sources.sqlite import create_datasets
+
+ROW_FORMAT = "{:>7} {:>9} | {:>8} {:>10} {:>10} {:>8}"
+
+CHARTS = """
+LINE bigfoot X date BY YEAR Y date COUNT SPLIT BY classification
+BAR bigfoot X classification Y temperature_mid AVG
+HISTOGRAM bigfoot X humidity STEP 0.1
+"""
+
+
+def database_bytes(conn):
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    return page_size * page_count
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument(
+        "--scale", type=int, nargs="+", default=[50, 200]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    print(
+        ROW_FORMAT.format(
+            "scale", "loading", "columns", "load ms", "db MB", "speedup"
+        )
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scale:
+            path = scaled_csv(directory, scale)
+            program = compile_program(
+                'DATASETS bigfoot "{}"\n{}'.format(path, CHARTS)
+            )
+            loadings = [
+                ("all", program.datasets),
+                (
+                    "projected",
+                    project_datasets(program.datasets, program.plots),
+                ),
+            ]
+
+            baseline = None
+            for name, datasets in loadings:
+                load_time = best_time(
+                    lambda: create_datasets(datasets).close(), args.repeat
+                )
+                conn = create_datasets(datasets)
+                num_columns = len(
+                    conn.execute("SELECT * FROM bigfoot LIMIT 1").description
+                )
+                size = database_bytes(conn)
+                conn.close()
+                baseline = baseline or load_time
+                print(
+                    ROW_FORMAT.format(
+                        scale,
+                        name,
+                        num_columns,
+                        "{:.1f}".format(1000 * load_time),
+                        "{:.1f}".format(size / 2 ** 20),
+                        "{:.2f}x".format(baseline / load_time),
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+""" Benchmarks executing a dashboard's queries with and without shared scans.
+
+    The dashboard is in the style of sample_scripts/big_example.svl: charts
+    over one dataset, split between a couple of FILTERs. The dataset is
+    sample_data/bigfoot_sightings.csv repeated --scale times, loaded once;
+    only the plan execution is timed.
+
+    Usage: python benchmarks/bench_shared_scans.py [--scale 200]
+        [--charts 5 20 50] [--repeat 3]
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from svl.compiler.compiler import (
+    compile_program,
+    execute_plan,
+    load_datasets,
+    plan_program,
+)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DATA = os.path.join(HERE, "..", "sample_data", "bigfoot_sightings.csv")
+
+ROW_FORMAT = "{:>7} {:>8} | {:>13} {:>13} {:>8}"
+
+FILTERS = [
+    "date > '1990-01-01' AND temperature_mid IS NOT NULL",
+    "classification = 'Class A' AND humidity > 0.5",
+]
+
+CHARTS = [
+    "BAR bigfoot X classification Y temperature_mid COUNT",
+    "LINE bigfoot X date BY YEAR Y temperature_mid AVG",
+    "HISTOGRAM bigfoot X temperature_high SPLIT BY classification",
+    "PIE bigfoot AXIS classification",
+    "NUMBER bigfoot VALUE temperature_mid AVG",
+    "SCATTER bigfoot X latitude Y moon_phase COLOR BY temperature_mid",
+    "BAR bigfoot X state Y humidity AVG",
+]
+
+
+def scaled_csv(directory, scale):
+    """ Writes the sample data repeated scale times to a CSV in the
+        directory.
+    """
+    path = os.path.join(directory, "bigfoot_sightings.csv")
+    with open(SAMPLE_DATA, newline="") as source, open(
+        path, "w", newline=""
+    ) as target:
+        reader = csv.reader(source)
+        writer = csv.writer(target)
+        writer.writerow(next(reader))
+        rows = list(reader)
+        for _ in range(scale):
+            writer.writerows(rows)
+    return path
+
+
+def dashboard(path, charts):
+    """ Generates the dashboard, cycling through the charts and filters.
+    """
+    return "DATASETS bigfoot \"{}\"\n{}\n".format(
+        path,
+        "\n".join(
+            '{} FILTER "{}"'.format(
+                CHARTS[ii % len(CHARTS)], FILTERS[ii % len(FILTERS)]
+            )
+            for ii in range(charts)
+        ),
+    )
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--scale", type=int, default=200)
+    arg_parser.add_argument(
+        "--charts", type=int, nargs="+", default=[5, 20, 50]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = scaled_csv(directory, args.scale)
+        conn = load_datasets(compile_program(dashboard(path, 1)))
+        num_rows = conn.execute("SELECT COUNT(*) FROM bigfoot").fetchone()[0]
+        print("{} rows".format(num_rows))
+
+        print(
+            ROW_FORMAT.format(
+                "charts", "scans", "per-plot ms", "shared ms", "speedup"
+            )
+        )
+        for charts in args.charts:
+            program = compile_program(dashboard(path, charts))
+            per_plot = plan_program(program, fuse_scans=False)
+            shared = plan_program(program)
+
+            per_plot_time = best_time(
+                lambda: execute_plan(per_plot, conn), args.repeat
+            )
+            shared_time = best_time(
+                lambda: execute_plan(shared, conn), args.repeat
+            )
+            print(
+                ROW_FORMAT.format(
+                    charts,
+                    len(shared.shared_scans),
+                    "{:.1f}".format(1000 * per_plot_time),
+                    "{:.1f}".format(1000 * shared_time),
+                    "{:.2f}x".format(per_plot_time / shared_time),
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
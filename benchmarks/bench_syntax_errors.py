@@ -0,0 +1,61 @@
+""" Benchmarks classifying a syntax error, matching the error against the
+    SVL_SYNTAX_ERRORS examples on every error versus looking it up in the
+    precomputed classifier.
+
+    Usage: python benchmarks/bench_syntax_errors.py [--repeat 200]
+"""
+import argparse
+import os
+import timeit
+
+from lark import UnexpectedInput
+
+from svl.compiler.ast import (
+    classify_syntax_error,
+    get_parser,
+    get_syntax_error_classifier,
+    parse_svl,
+)
+from svl.compiler.errors import SVL_SYNTAX_ERRORS, SvlSyntaxError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, "..", "sample_scripts", "bad_syntax.svl")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--repeat", type=int, default=200)
+    args = arg_parser.parse_args()
+
+    source = open(SCRIPT).read()
+    parser = get_parser()
+    classifier = get_syntax_error_classifier()
+
+    try:
+        parser.parse(source)
+    except UnexpectedInput as u:
+        error = u
+
+    timings = [
+        (
+            "match_examples",
+            lambda: error.match_examples(parser.parse, SVL_SYNTAX_ERRORS),
+        ),
+        ("classifier", lambda: classify_syntax_error(classifier, error)),
+    ]
+
+    def _parse_svl():
+        try:
+            parse_svl(source)
+        except SvlSyntaxError:
+            pass
+
+    timings.append(("parse_svl", _parse_svl))
+
+    for label, classify in timings:
+        seconds = timeit.timeit(classify, number=args.repeat) / args.repeat
+        print("{:>15}: {:10.1f} us".format(label, 1e6 * seconds))
+
+
+if __name__ == "__main__":
+    main()
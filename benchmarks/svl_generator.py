@@ -0,0 +1,156 @@
+""" Generates synthetic SVL programs for benchmarking.
+
+    The programs are syntactically and semantically valid, and every chart
+    refers to columns of bigfoot_sightings.csv so the programs can also be run
+    against (copies of) that file.
+"""
+import itertools
+
+# Each chart template has its required declarations, followed by optional
+# properties in the order they're added. Properties are chosen so any prefix
+# of them still passes plot validation.
+CHARTS = [
+    (
+        "LINE {data} X date BY YEAR Y date COUNT",
+        [
+            'LABEL "Sightings"',
+            'TITLE "Sightings by year"',
+            "SPLIT BY classification",
+            "FILTER \"date > '1990-01-01'\"",
+        ],
+    ),
+    (
+        "BAR {data} X classification Y temperature_mid AVG",
+        [
+            'LABEL "Temperature"',
+            "SORT DESC",
+            'TITLE "Average temperature"',
+            'FILTER "temperature_mid IS NOT NULL"',
+        ],
+    ),
+    (
+        "SCATTER {data} X latitude Y longitude",
+        [
+            'LABEL "Longitude"',
+            "COLOR BY temperature_mid",
+            'TITLE "Sighting locations"',
+            'FILTER "latitude IS NOT NULL"',
+        ],
+    ),
+    (
+        "HISTOGRAM {data} X temperature_mid",
+        [
+            'LABEL "Temperature"',
+            "BINS 25",
+            "SPLIT BY classification",
+            'TITLE "Temperature"',
+            'FILTER "temperature_mid > 0"',
+        ],
+    ),
+    (
+        "PIE {data} AXIS classification",
+        [
+            "HOLE 0.3",
+            'TITLE "Classification"',
+            "FILTER \"date > '2000-01-01'\"",
+        ],
+    ),
+    (
+        "NUMBER {data} VALUE temperature_mid AVG",
+        ['TITLE "Average temperature"', 'FILTER "humidity > 0.5"'],
+    ),
+]
+
+
+def generate_chart(index, datasets, properties):
+    """ Generates the index-th chart of a program.
+
+        Parameters
+        ----------
+        index : int
+            The position of the chart in the program. Determines the chart
+            type and dataset.
+        datasets : list[str]
+            The dataset names to choose from.
+        properties : int
+            The number of optional properties to add to the chart.
+
+        Returns
+        -------
+        str
+            The chart's SVL source.
+    """
+    template, optional_properties = CHARTS[index % len(CHARTS)]
+    data = datasets[index % len(datasets)]
+    return " ".join(
+        [template.format(data=data)] + optional_properties[:properties]
+    )
+
+
+def generate_datasets(datasets, file_path):
+    """ Generates the DATASETS block of a program with the first dataset
+        loaded from the file and the others derived from it with SQL.
+
+        Returns
+        -------
+        Tuple[str, list[str]]
+            The DATASETS declarations and the dataset names.
+    """
+    names = ["bigfoot{}".format(ii) for ii in range(datasets)]
+    declarations = ['{} "{}"'.format(names[0], file_path)] + [
+        '{} SQL "SELECT * FROM {}"'.format(name, names[0])
+        for name in names[1:]
+    ]
+    return "DATASETS\n    " + "\n    ".join(declarations), names
+
+
+def generate_svl(
+    charts=10,
+    depth=1,
+    datasets=1,
+    properties=0,
+    file_path="bigfoot_sightings.csv",
+):
+    """ Generates a synthetic SVL program.
+
+        The charts are spread evenly over a chain of nested groups, with
+        CONCAT( ... ) and ( ... ) alternating at each level.
+
+        Parameters
+        ----------
+        charts : int
+            The number of charts. Default: 10.
+        depth : int
+            The number of nested groups. Default: 1.
+        datasets : int
+            The number of datasets. Default: 1.
+        properties : int
+            The number of optional properties on each chart. Default: 0.
+        file_path : str
+            The location of the file dataset.
+
+        Returns
+        -------
+        str
+            The SVL program.
+    """
+    datasets_block, names = generate_datasets(datasets, file_path)
+    chart_sources = [
+        generate_chart(ii, names, properties) for ii in range(charts)
+    ]
+
+    # Every level of nesting gets the same share of the charts and the
+    # innermost group gets the rest, which is always at least one chart.
+    per_level = (charts - 1) // (depth + 1)
+    chart_iter = iter(chart_sources)
+    level_charts = [
+        list(itertools.islice(chart_iter, per_level)) for _ in range(depth)
+    ]
+    innermost = list(chart_iter)
+
+    body = "\n".join(innermost)
+    for level in reversed(range(depth)):
+        opener = "CONCAT(" if level % 2 == 0 else "("
+        body = "\n".join(level_charts[level] + [opener, body, ")"])
+
+    return datasets_block + "\n" + body + "\n"
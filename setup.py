@@ -17,6 +17,7 @@ setup(
             "sample_data",
             "sample_scripts",
             "sample_visualizations",
+            "benchmarks",
             "build",
             "dist",
             "graffle",
@@ -42,9 +43,13 @@ setup(
         # and upgrade with caution.
         "lark-parser==0.6.6",
         "Jinja2>=2.10.1",
-        "pandas>=0.25.0,<1.0.0",
         "importlib-resources>=1.0.2,<2",
     ],
-    extras_require={"parquet": ["pyarrow>=0.12.0, <0.16.0"]},
-    entry_points={"console_scripts": ["svl=svl.cli:cli"]},
+    extras_require={
+        # Files are loaded without pandas; parquet files need pyarrow.
+        "parquet": ["pyarrow>=0.12.0, <0.16.0"]
+    },
+    entry_points={
+        "console_scripts": ["svl=svl.cli:cli", "svl-lsp=svl.lsp:main"]
+    },
 )
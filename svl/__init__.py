@@ -1,8 +1,47 @@
-from .compiler import svl
+import sys
 
-__all__ = ["svl"]
+from .compiler import (
+    Plan,
+    Program,
+    Result,
+    compile_program,
+    execute_plan,
+    load_datasets,
+    plan_program,
+    render_result,
+    svl,
+)
 
-from ._version import get_versions
+__all__ = [
+    "Plan",
+    "Program",
+    "Result",
+    "compile_program",
+    "execute_plan",
+    "load_datasets",
+    "plan_program",
+    "render_result",
+    "svl",
+]
 
-__version__ = get_versions()["version"]
-del get_versions
+
+def __getattr__(name):
+    # Resolving the version shells out to git in source checkouts and editable
+    # installs, so it's deferred until __version__ is actually accessed.
+    # Built distributions have the version stamped into _version.py by
+    # versioneer and don't touch git either way.
+    if name == "__version__":
+        from ._version import get_versions
+
+        global __version__
+        __version__ = get_versions()["version"]
+        return __version__
+
+    raise AttributeError(
+        "module {!r} has no attribute {!r}".format(__name__, name)
+    )
+
+
+if sys.version_info < (3, 7):
+    # Module level __getattr__ requires Python 3.7.
+    __version__ = __getattr__("__version__")
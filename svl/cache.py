@@ -0,0 +1,61 @@
+import os
+import tempfile
+
+
+def cache_dir(*path):
+    """ Locates a directory in the SVL cache, creating it if it doesn't exist.
+
+        The cache root is the SVL_CACHE_DIR environment variable if it's set,
+        otherwise "svl" in XDG_CACHE_HOME (defaulting to ~/.cache).
+
+        Parameters
+        ----------
+        path : str
+            Path components of the directory relative to the cache root.
+
+        Returns
+        -------
+        str
+            The absolute path to the cache directory.
+
+        Raises
+        ------
+        OSError
+            If the directory can't be created.
+    """
+    root = os.environ.get("SVL_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "svl",
+    )
+    directory = os.path.abspath(os.path.join(root, *path))
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def write_atomic(path, write):
+    """ Writes a cache file such that concurrent readers never observe a
+        partially written file.
+
+        Parameters
+        ----------
+        path : str
+            The destination of the file.
+        write : Callable[[file], None]
+            A function that writes the contents to the binary file object it's
+            given.
+
+        Raises
+        ------
+        OSError
+            If the file can't be written.
+    """
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -30,8 +30,30 @@ def _extract_cli_datasets(datasets):
 @click.option("--dataset", "-d", multiple=True)
 @click.option("--no-browser", is_flag=True)
 @click.option("--offline-js", is_flag=True)
+@click.option("--compile-cache", is_flag=True)
+@click.option(
+    "--layout", type=click.Choice(["grid", "compact"]), default="grid"
+)
+@click.option("--chunk-rows", type=click.IntRange(min=1), default=None)
+@click.option("--memory-budget", type=click.IntRange(min=1), default=None)
+@click.option("--load-workers", type=click.IntRange(min=1), default=None)
+@click.option("--dataset-cache", is_flag=True)
+@click.option("--dataset-cache-hash", is_flag=True)
 def cli(
-    svl_source, debug, backend, output_file, dataset, no_browser, offline_js
+    svl_source,
+    debug,
+    backend,
+    output_file,
+    dataset,
+    no_browser,
+    offline_js,
+    compile_cache,
+    layout,
+    chunk_rows,
+    memory_budget,
+    load_workers,
+    dataset_cache,
+    dataset_cache_hash,
 ):
 
     svl_source = svl_source.read()
@@ -43,6 +65,13 @@ def cli(
             datasets=dataset,
             offline_js=offline_js,
             debug=debug,
+            compile_cache=compile_cache,
+            layout=layout,
+            chunk_rows=chunk_rows,
+            memory_budget=memory_budget,
+            load_workers=load_workers,
+            dataset_cache=dataset_cache,
+            dataset_cache_hash=dataset_cache_hash,
         )
     except ValueError as e:
         print("Dataset specification error:")
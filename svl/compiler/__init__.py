@@ -1,3 +1,23 @@
-from .compiler import svl
+from .compiler import (
+    Plan,
+    Program,
+    Result,
+    compile_program,
+    execute_plan,
+    load_datasets,
+    plan_program,
+    render_result,
+    svl,
+)
 
-__all__ = ["svl"]
+__all__ = [
+    "Plan",
+    "Program",
+    "Result",
+    "compile_program",
+    "execute_plan",
+    "load_datasets",
+    "plan_program",
+    "render_result",
+    "svl",
+]
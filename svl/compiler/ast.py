@@ -1,9 +1,17 @@
+import hashlib
+import io
 import lark
-import pkg_resources
+import os
+import pickle
+import pkgutil
+import sys
+import threading
 
 from toolz import merge, get
 from lark import UnexpectedInput, UnexpectedCharacters
+from lark.parsers.lalr_analysis import Shift, Reduce
 
+from svl.cache import cache_dir, write_atomic
 from svl.compiler.errors import SVL_SYNTAX_ERRORS, SvlSyntaxError
 
 
@@ -15,7 +23,7 @@ class SVLTransformer(lark.Transformer):
         return {"datasets": merge(*items)}
 
     def file_dataset(self, items):
-        return {items[0]: {"file": items[1][1:-1]}}
+        return {items[0]: merge({"file": items[1][1:-1]}, *items[2:])}
 
     def sql_dataset(self, items):
         return {items[0]: {"sql": items[1][1:-1]}}
@@ -110,27 +118,311 @@ class SVLTransformer(lark.Transformer):
         return {"color_scale": str(items[0][1:-1])}
 
 
-debug_parser = lark.Lark(
-    pkg_resources.resource_string("resources", "svl.lark").decode("utf-8")
-)
-
-
-parser = lark.Lark(
-    pkg_resources.resource_string("resources", "svl.lark").decode("utf-8"),
-    parser="lalr",
-    transformer=SVLTransformer(),
-)
+# Lark options for each parser in the registry. The parsers themselves are
+# built on first use by get_parser - the LALR table construction isn't free,
+# and the Earley parser is only needed for --debug.
+PARSER_OPTIONS = {
+    "debug": {},
+    "lalr": {"parser": "lalr", "transformer": SVLTransformer()},
+}
+
+# The LALR parser is serialized into the cache directory after it's built,
+# so subsequent processes load the parse tables instead of constructing them.
+# Lark compares parse table actions by identity, so the two action singletons
+# are pickled by reference.
+PARSER_ACTIONS = {"Shift": Shift, "Reduce": Reduce}
+
+
+class _ParserPickler(pickle.Pickler):
+    def persistent_id(self, obj):
+        for name, action in PARSER_ACTIONS.items():
+            if obj is action:
+                return name
+        return None
+
+
+class _ParserUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid):
+        return PARSER_ACTIONS[pid]
+
+
+# Lark's LALR parser isn't reentrant - its contextual lexer tracks the parser
+# state on the lexer instance - so every thread gets its own parsers.
+# The serialized LALR parser and the syntax error classifier are loaded once
+# per process and shared; each thread deserializes its own copy of the
+# parser from the same data, so the classifier's states apply to all of them.
+_PARSERS = threading.local()
+_LALR_PARSER = {}
+_LALR_PARSER_LOCK = threading.Lock()
+
+
+def _svl_grammar():
+    """ Reads the SVL grammar from the resources package.
+
+        Returns
+        -------
+        str
+            The grammar for the SVL language in lark's EBNF format.
+    """
+    return pkgutil.get_data("resources", "svl.lark").decode("utf-8")
+
+
+def _parser_cache_path(grammar):
+    """ Builds the location of the serialized LALR parser for the grammar.
+
+        The file name is a hash of everything that determines the contents of
+        the serialized parser, so changing the grammar, the syntax error
+        examples, lark or Python invalidates it.
+
+        Parameters
+        ----------
+        grammar : str
+            The SVL grammar.
+
+        Returns
+        -------
+        str
+            The path to the serialized parser in the cache directory.
+
+        Raises
+        ------
+        OSError
+            If the cache directory can't be created.
+    """
+    grammar_hash = hashlib.sha256(
+        "\n".join(
+            [
+                grammar,
+                repr(
+                    [
+                        (label.__name__, examples)
+                        for label, examples in SVL_SYNTAX_ERRORS.items()
+                    ]
+                ),
+                lark.__version__,
+                "{}.{}".format(*sys.version_info[:2]),
+                str(pickle.HIGHEST_PROTOCOL),
+            ]
+        ).encode("utf-8")
+    ).hexdigest()
+
+    return os.path.join(
+        cache_dir("parsers"), "svl_lalr_{}.pickle".format(grammar_hash[:32])
+    )
+
+
+def build_syntax_error_classifier(parse, examples):
+    """ Precomputes the classification of syntax errors from examples of
+        malformed programs.
+
+        This is equivalent to lark's UnexpectedInput.match_examples, but the
+        examples are parsed once up front instead of on every syntax error.
+        An error gets the label of the first example that failed in the same
+        parser state on the same token, falling back to the first example
+        that failed in the same parser state.
+
+        Parameters
+        ----------
+        parse : Callable[[str], Any]
+            The parse function of the parser the errors come from.
+        examples : dict
+            A mapping from the label to a list of malformed programs.
+
+        Returns
+        -------
+        dict
+            The classifier, with "token" mapping (state, token type, token
+            value) to a label and "state" mapping a parser state to a label.
+    """
+    classifier = {"token": {}, "state": {}}
+
+    for label, malformed_examples in examples.items():
+        for malformed in malformed_examples:
+            try:
+                parse(malformed)
+            except UnexpectedInput as u:
+                classifier["state"].setdefault(u.state, label)
+                # Lexer errors have no token.
+                token = getattr(u, "token", None)
+                if token is not None:
+                    classifier["token"].setdefault(
+                        (u.state, token.type, str(token)), label
+                    )
+
+    return classifier
+
+
+def classify_syntax_error(classifier, u):
+    """ Classifies a syntax error from the parser with a precomputed
+        classifier.
+
+        Parameters
+        ----------
+        classifier : dict
+            The classifier produced by build_syntax_error_classifier.
+        u : lark.UnexpectedInput
+            The syntax error.
+
+        Returns
+        -------
+        The label of the best matching example, or None if no example
+        matches.
+    """
+    token = getattr(u, "token", None)
+    if token is not None:
+        label = classifier["token"].get((u.state, token.type, str(token)))
+        if label is not None:
+            return label
+
+    return classifier["state"].get(u.state)
+
+
+def _load_lalr_parser():
+    """ Loads the serialized LALR parser and its syntax error classifier from
+        the cache, building and caching them if they aren't there. A cache
+        that can't be read or written is skipped.
+
+        The classifier refers to the parser's states, which are only stable
+        for one construction of the parse tables. That's why the two are
+        always built and cached together.
+
+        Returns
+        -------
+        Tuple[bytes, dict]
+            The serialized LALR parser and its syntax error classifier.
+    """
+    grammar = _svl_grammar()
+
+    try:
+        cache_path = _parser_cache_path(grammar)
+    except OSError:
+        cache_path = None
+
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            # Make sure the parser itself can be loaded before trusting it.
+            _deserialize_parser(cached["parser"])
+            return cached["parser"], cached["syntax_errors"]
+        except Exception:
+            # A truncated or incompatible cache entry gets rebuilt and
+            # overwritten below.
+            pass
+
+    parser = lark.Lark(grammar, **PARSER_OPTIONS["lalr"])
+    syntax_errors = build_syntax_error_classifier(
+        parser.parse, SVL_SYNTAX_ERRORS
+    )
+
+    parser_buffer = io.BytesIO()
+    _ParserPickler(parser_buffer, pickle.HIGHEST_PROTOCOL).dump(parser)
+    parser_data = parser_buffer.getvalue()
+
+    if cache_path:
+        try:
+            write_atomic(
+                cache_path,
+                lambda f: pickle.dump(
+                    {"parser": parser_data, "syntax_errors": syntax_errors},
+                    f,
+                    pickle.HIGHEST_PROTOCOL,
+                ),
+            )
+        except (OSError, pickle.PicklingError):
+            pass
+
+    return parser_data, syntax_errors
+
+
+def _deserialize_parser(parser_data):
+    return _ParserUnpickler(io.BytesIO(parser_data)).load()
+
+
+def _shared_lalr_parser():
+    """ Loads the serialized LALR parser and syntax error classifier once per
+        process.
+
+        Returns
+        -------
+        dict
+            The serialized parser under "parser" and the syntax error
+            classifier under "syntax_errors".
+    """
+    if not _LALR_PARSER:
+        with _LALR_PARSER_LOCK:
+            # Check again - another thread may have loaded it while this one
+            # was waiting on the lock.
+            if not _LALR_PARSER:
+                parser_data, syntax_errors = _load_lalr_parser()
+                _LALR_PARSER["syntax_errors"] = syntax_errors
+                _LALR_PARSER["parser"] = parser_data
+
+    return _LALR_PARSER
+
+
+def get_parser(debug=False):
+    """ Obtains the calling thread's SVL parser, building it on first use.
+
+        Parsers are memoized per thread. Lark parsers aren't reentrant, so a
+        parser must not be shared between threads; with one parser per thread
+        any number of threads can parse concurrently. The LALR parser is
+        serialized to the cache directory, so only the first process to use a
+        grammar constructs its parse tables. Every other thread and process
+        loads them from the serialized parser.
+
+        Parameters
+        ----------
+        debug : bool
+            If true, return the Earley parser that produces a parse tree
+            rather than the LALR parser that transforms into the SVL AST.
+            Default: False.
+
+        Returns
+        -------
+        lark.Lark
+            The parser.
+    """
+    parser_type = "debug" if debug else "lalr"
+    parsers = getattr(_PARSERS, "parsers", None)
+    if parsers is None:
+        parsers = _PARSERS.parsers = {}
+
+    parser = parsers.get(parser_type)
+
+    if parser is None:
+        if debug:
+            parser = lark.Lark(_svl_grammar(), **PARSER_OPTIONS[parser_type])
+        else:
+            parser = _deserialize_parser(_shared_lalr_parser()["parser"])
+        parsers[parser_type] = parser
+
+    return parser
+
+
+def get_syntax_error_classifier():
+    """ Obtains the syntax error classifier for the LALR parsers.
+
+        Returns
+        -------
+        dict
+            The classifier, as produced by build_syntax_error_classifier.
+    """
+    return _shared_lalr_parser()["syntax_errors"]
 
 
 def parse_svl(svl_string, debug=False, **kwargs):
     if debug:
-        return debug_parser.parse(svl_string)
+        return get_parser(debug=True).parse(svl_string)
     else:
+        parser = get_parser()
 
         try:
             parsed_svl = parser.parse(svl_string)
         except (UnexpectedInput, UnexpectedCharacters) as u:
-            exception_class = u.match_examples(parser.parse, SVL_SYNTAX_ERRORS)
+            exception_class = classify_syntax_error(
+                get_syntax_error_classifier(), u
+            )
             if not exception_class:
                 raise SvlSyntaxError(
                     u.get_context(svl_string), u.line, u.column
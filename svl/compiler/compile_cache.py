@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import pkgutil
+
+from svl.cache import cache_dir, write_atomic
+
+# Bump this when the structure of a cached entry changes.
+COMPILE_CACHE_FORMAT = 1
+
+# The maximum total size of the compile cache. The least recently used entries
+# are evicted when a new entry pushes the cache over this size.
+COMPILE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# Everything that determines the compiled program besides the source: the
+# grammar, the front-end modules that turn the parse into the validated plot
+# list, and the compiler's own checks and their error messages.
+FRONT_END_RESOURCES = [
+    ("resources", "svl.lark"),
+    ("svl.compiler", "ast.py"),
+    ("svl.compiler", "layout.py"),
+    ("svl.compiler", "plot_validators.py"),
+    ("svl.compiler", "compiler.py"),
+    ("svl.compiler", "errors.py"),
+]
+
+
+def _front_end_hash():
+    """ Hashes the grammar and front-end sources of the compiler.
+
+        Returns
+        -------
+        str
+            The hex digest of the hash.
+    """
+    front_end_hash = hashlib.sha256()
+    for package, resource in FRONT_END_RESOURCES:
+        front_end_hash.update(pkgutil.get_data(package, resource))
+    return front_end_hash.hexdigest()
+
+
+def compiled_key(svl_source, additional_datasets):
+    """ Constructs the compile cache key for the SVL program.
+
+        Parameters
+        ----------
+        svl_source : str
+            The SVL source code.
+        additional_datasets : dict
+            The additional datasets injected into the program, as a mapping
+            from dataset name to file location.
+
+        Returns
+        -------
+        str
+            The cache key.
+    """
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "format": COMPILE_CACHE_FORMAT,
+                "front_end": _front_end_hash(),
+                "source": svl_source,
+                "datasets": sorted(additional_datasets.items()),
+            }
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(cache_dir("compiled"), "{}.json".format(key))
+
+
+def load_compiled(key):
+    """ Loads the compiled program for the key from the compile cache,
+        marking it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The compile cache key.
+
+        Returns
+        -------
+        dict or None
+            The compiled program with the "datasets" and grid positioned
+            "plots" of the SVL program, or None if it isn't in the cache.
+    """
+    try:
+        path = _entry_path(key)
+        with open(path, "r") as f:
+            compiled = json.load(f)
+        # The modification time is the recency for LRU eviction.
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+
+    return compiled
+
+
+def store_compiled(key, compiled, max_bytes=COMPILE_CACHE_MAX_BYTES):
+    """ Stores the compiled program in the compile cache, evicting the least
+        recently used entries if the cache exceeds its maximum size. A cache
+        that can't be written is skipped.
+
+        Parameters
+        ----------
+        key : str
+            The compile cache key.
+        compiled : dict
+            The compiled program with the "datasets" and "plots".
+        max_bytes : int
+            The maximum total size of the cache in bytes. Default: 32MB.
+    """
+    try:
+        path = _entry_path(key)
+        write_atomic(
+            path, lambda f: f.write(json.dumps(compiled).encode("utf-8"))
+        )
+        evict_compiled(max_bytes)
+    except OSError:
+        pass
+
+
+def evict_compiled(max_bytes=COMPILE_CACHE_MAX_BYTES):
+    """ Evicts the least recently used entries of the compile cache until
+        its total size is at most max_bytes.
+
+        Parameters
+        ----------
+        max_bytes : int
+            The maximum total size of the cache in bytes. Default: 32MB.
+    """
+    directory = cache_dir("compiled")
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            # Evicted by another process.
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+        total_bytes -= size
@@ -1,20 +1,68 @@
 import os
 import sqlite3
+import time
+
+from collections import namedtuple
 
-from svl.compiler.ast import parse_svl
 from svl.compiler.errors import (
-    SvlSyntaxError,
     SvlMissingFileError,
     SvlMissingDatasetError,
     SvlDataLoadError,
     SvlPlotError,
     SvlDataProcessingError,
 )
+from svl.compiler.dataset_graph import (
+    critical_path,
+    dataset_columns,
+    dataset_graph,
+    live_datasets,
+    project_datasets,
+    push_down_filters,
+)
 from svl.compiler.layout import tree_to_grid
+from svl.compiler.logical_plan import (
+    common_subplans,
+    fuse_number_aggregates,
+    fuse_shared_scans,
+    optimize,
+    output_aliases,
+    plot_to_plan,
+    query_plan,
+)
 from svl.compiler.plot_validators import validate_plot
-from svl.data_sources.sqlite import create_datasets, get_svl_data
+from svl.data_sources.schema import missing_fields
+from svl.data_sources.sqlite import (
+    create_database,
+    logical_plan_to_sql,
+    drop_scan,
+    materialize_datasets,
+    materialize_scan,
+    rows_to_svl_data,
+    run_query,
+)
 from svl.plotly import plotly_template, plotly_template_vars
 
+LAYOUTS = ["grid", "compact"]
+
+# The stages of the compiler. Each holds everything the next stage needs, so
+# any of them can be kept around and the later stages rerun from it.
+#
+# The validated plots with their grid positions and the datasets they use.
+Program = namedtuple("Program", ["datasets", "plots"])
+# The program with the optimized logical plan and SQL query for each of its
+# plots, and the scans shared between plots.
+Plan = namedtuple(
+    "Plan", ["program", "logical_plans", "shared_scans", "queries"]
+)
+# The plan, the data for each of its plots and statistics on the execution:
+# the number of "queries" run, the number of "queries_saved" by running
+# identical queries once and the number of "shared_scans". If the datasets
+# were loaded for the execution, also the number of "datasets_loaded" and
+# "datasets_skipped" (no plot reads them), the number attached from the dataset
+# cache ("datasets_cached"), the "load_seconds" it took and the
+# "load_critical_path_seconds" of the longest chain of dependent loads.
+Result = namedtuple("Result", ["plan", "data", "stats"])
+
 
 def _extract_additional_datasets(datasets):
     """ Converts the additional datasets from the name=location format into
@@ -23,32 +71,99 @@ def _extract_additional_datasets(datasets):
     return dict(map(lambda x: x.split("="), datasets))
 
 
-def svl(
-    svl_source, backend="plotly", datasets=[], offline_js=False, debug=False
-):
-    """ Compiles the SVL source into a rendered plot template.
+def _check_files(svl_datasets):
+    """ Validates that all of the files exist that need to exist.
+    """
+    for _, dataset in svl_datasets.items():
+        if ("file" in dataset) and (not os.path.exists(dataset["file"])):
+            raise SvlMissingFileError(
+                "File {} does not exist.".format(dataset["file"])
+            )
+
+
+def _check_fields(svl_datasets, svl_plots):
+    """ Validates that the fields of the plots are columns of their datasets,
+        from the datasets' headers, before any data is loaded.
+    """
+    columns = dataset_columns(live_datasets(svl_datasets, svl_plots))
+    for plot in svl_plots:
+        if columns.get(plot["data"]) is None:
+            continue
+        for _, field in missing_fields(plot, columns[plot["data"]]):
+            raise SvlPlotError(
+                "Plot error: Field {} is not a column of {}.".format(
+                    field, plot["data"]
+                )
+            )
+
+
+def _check_layout(layout):
+    if layout not in LAYOUTS:
+        raise ValueError(
+            "layout {} needs to be one of {}".format(
+                layout, ", ".join(LAYOUTS)
+            )
+        )
+
+
+def _compile(svl_source, additional_datasets):
+    """ Parses the SVL source, then lays out and validates its plots.
+
+        Returns
+        -------
+        dict
+            The SVL datasets under "datasets" and the validated plots, as a
+            flat list with grid coordinates, under "plots".
+    """
+    # The parser (and lark with it) is imported here rather than with the
+    # module so the CLI can start without it.
+    from svl.compiler.ast import parse_svl
+
+    svl_ast = parse_svl(svl_source, **additional_datasets)
+
+    _check_files(svl_ast["datasets"])
+
+    # Flatten the AST plot representation into a list with grid coordinates.
+    svl_plots = tree_to_grid(svl_ast)
+
+    # Validate the plots.
+    for plot in svl_plots:
+        # Each plot must point to a dataset that exists.
+        if plot["data"] not in svl_ast["datasets"]:
+            existing_dataset = ", ".join(list(svl_ast["datasets"].keys()))
+            raise SvlMissingDatasetError(
+                "Dataset {} is not in provided datasets {}.".format(
+                    plot["data"], existing_dataset
+                )
+            )
+        # Each plot must be a valid specification.
+        ok, msg = validate_plot(plot)
+        if not ok:
+            raise SvlPlotError("Plot error: {}".format(msg))
+
+    return {"datasets": svl_ast["datasets"], "plots": svl_plots}
+
+
+def compile_program(svl_source, datasets=[], compile_cache=False):
+    """ Parses the SVL source, then lays out and validates its plots.
 
     Parameters
-    -----------
+    ----------
     svl_source : str
         The SVL source code.
-    backend : str
-        Which plotting backend to render the plots with. Default: "plotly".
     datasets : list[str]
         A list of additional datasets to inject into the ast, for datasets not
         present in the SVL source code. Each dataset specifier must be of the
         form "dataset_name=dataset_location".
-    offline_js : bool
-        Whether to embed the javascript into the final HTML directly.
+    compile_cache : bool
+        Whether to reuse the program from the on-disk compile cache if the
+        same source was compiled with the same additional datasets before.
         Default: False.
-    debug : bool
-        If this flag is true, return the pretty-printed parse tree instead of
-        the compiled program.
 
     Returns
     -------
-    str
-        The rendered HTML template for the plots.
+    Program
+        The compiled program.
 
     Raises
     ------
@@ -62,17 +177,9 @@ def svl(
         If there is a dataset specified in a plot that isn't in the dataset
         specifiers for the SVL program.
     SvlPlotError
-        If there is an error in any of the SVL plots.
-    SvlDataLoadError
-        If there is an error loading the data into sqlite.
-    SvlDataProcessingError
-        If there is an error processing the plot data.
-    NotImplementedError
-        If a backend is selected that hasn't been implemented.
+        If there is an error in any of the SVL plots, including a field that
+        isn't a column of the plot's dataset.
     """
-    if debug:
-        return parse_svl(svl_source, debug=True).pretty()
-
     for dataset in datasets:
         if len(dataset.split("=")) != 2:
             raise ValueError(
@@ -81,55 +188,389 @@ def svl(
 
     additional_datasets = _extract_additional_datasets(datasets)
 
-    try:
-        svl_ast = parse_svl(svl_source, **additional_datasets)
-    except SvlSyntaxError as e:
-        raise e
+    compiled = None
+    if compile_cache:
+        # Imported here so runs without the compile cache don't import
+        # hashlib, json and pkgutil with it.
+        from svl.compiler.compile_cache import (
+            compiled_key,
+            load_compiled,
+            store_compiled,
+        )
 
-    # Validate that all of the files exist that need to exist.
-    for _, dataset in svl_ast["datasets"].items():
-        if ("file" in dataset) and (not os.path.exists(dataset["file"])):
-            raise SvlMissingFileError(
-                "File {} does not exist.".format(dataset["file"])
-            )
+        cache_key = compiled_key(svl_source, additional_datasets)
+        compiled = load_compiled(cache_key)
 
-    # Flatten the AST plot representation into a list with grid coordinates.
-    svl_plots = tree_to_grid(svl_ast)
+    if compiled is None:
+        compiled = _compile(svl_source, additional_datasets)
+        if compile_cache:
+            store_compiled(cache_key, compiled)
+    else:
+        # The files may have moved since the program was cached.
+        _check_files(compiled["datasets"])
 
-    # Validate the plots.
-    for plot in svl_plots:
-        # Each plot must point to a dataset that exists.
-        if plot["data"] not in svl_ast["datasets"]:
-            existing_dataset = ", ".join(list(svl_ast["datasets"].keys()))
-            raise SvlMissingDatasetError(
-                "Dataset {} is not in provided datasets {}.".format(
-                    plot["data"], existing_dataset
-                )
-            )
-        # Each plot must be a valid specification.
-        ok, msg = validate_plot(plot)
-        if not ok:
-            raise SvlPlotError("Plot error: {}".format(msg))
+    # The files may have changed since the program was cached too, so this
+    # isn't part of what's cached. It only reads the headers, so it's quick.
+    _check_fields(compiled["datasets"], compiled["plots"])
+
+    return Program(datasets=compiled["datasets"], plots=compiled["plots"])
+
+
+def plan_program(program, fuse_scans=True, fuse_numbers=True):
+    """ Builds the logical plan for each plot of the program, optimizes them
+        together and lowers them to SQL.
+
+    Parameters
+    ----------
+    program : Program
+        The compiled program.
+    fuse_scans : bool
+        Whether plots over the same dataset and filter read one shared,
+        pre-filtered scan instead of each filtering the dataset.
+        Default: True.
+    fuse_numbers : bool
+        Whether the aggregates of NUMBER plots over the same dataset are
+        computed in a single query. Default: True.
+
+    Returns
+    -------
+    Plan
+        The query plan, with one logical plan and query per plot in the order
+        of the plots. Each shared scan has the "name" of the temporary table
+        to materialize it in, its logical "plan" and its "query".
+    """
+    logical_plans = optimize([plot_to_plan(plot) for plot in program.plots])
+
+    if fuse_numbers:
+        logical_plans = fuse_number_aggregates(logical_plans)
 
-    # Set up the connection to sqlite. Eventually this will be abstracted since
-    # in principle we could have other data sources but for now sqlite is what
-    # we've got.
+    shared_scans = []
+    if fuse_scans:
+        logical_plans, shared_scans = fuse_shared_scans(logical_plans)
+
+    return Plan(
+        program=program,
+        logical_plans=logical_plans,
+        shared_scans=[
+            dict(scan, query=logical_plan_to_sql(scan["plan"]))
+            for scan in shared_scans
+        ],
+        queries=[logical_plan_to_sql(plan) for plan in logical_plans],
+    )
+
+
+def _attach_cached_datasets(conn, datasets, content_hash):
+    """ Attaches the file datasets that are in the dataset cache, returning
+        the cache key of each file dataset and the time each attached one
+        took.
+    """
+    # Imported here so runs without the dataset cache don't import hashlib,
+    # json and pkgutil with it.
+    from svl.data_sources.dataset_cache import (
+        attach_dataset,
+        cached_dataset,
+        dataset_key,
+    )
+
+    keys = {}
+    for name, spec in datasets.items():
+        if "file" in spec:
+            try:
+                keys[name] = dataset_key(spec, content_hash)
+            except OSError:
+                # The file's error is reported when it's loaded.
+                pass
+
+    durations = {}
+    for name, key in keys.items():
+        start = time.perf_counter()
+        path = cached_dataset(key)
+        if path is not None and attach_dataset(conn, name, path):
+            durations[name] = time.perf_counter() - start
+    return keys, durations
+
+
+def _store_datasets(conn, keys, cached):
+    """ Stores the loaded file datasets that weren't attached from the
+        dataset cache in it.
+    """
+    from svl.data_sources.dataset_cache import store_dataset
+
+    for name, key in keys.items():
+        if name not in cached:
+            store_dataset(key, conn, name)
+
+
+def _load_datasets(
+    program,
+    chunk_rows=None,
+    memory_budget=None,
+    load_workers=None,
+    dataset_cache=False,
+    dataset_cache_hash=False,
+):
+    """ Loads the datasets the program's plots read from, returning the
+        connection and the loading statistics.
+    """
+    datasets = project_datasets(
+        push_down_filters(
+            live_datasets(program.datasets, program.plots), program.plots
+        ),
+        program.plots,
+    )
+    start = time.perf_counter()
+    # Eventually this will be abstracted since in principle we could have
+    # other data sources but for now sqlite is what we've got.
+    conn = create_database()
+    keys, cached = {}, {}
+    if dataset_cache:
+        keys, cached = _attach_cached_datasets(
+            conn, datasets, dataset_cache_hash
+        )
     try:
-        sqlite_conn = create_datasets(svl_ast["datasets"])
+        # SQL datasets over the cached datasets are created straight away,
+        # since the datasets are already there.
+        durations = materialize_datasets(
+            {
+                name: spec
+                for name, spec in datasets.items()
+                if name not in cached
+            },
+            conn,
+            chunk_rows=chunk_rows,
+            memory_budget=memory_budget,
+            processes=load_workers,
+        )
     except sqlite3.DatabaseError as e:
         raise SvlDataLoadError("Error loading data: {}.".format(e))
+    if dataset_cache:
+        _store_datasets(conn, keys, cached)
+
+    stats = {
+        "datasets_loaded": len(datasets),
+        "datasets_skipped": len(program.datasets) - len(datasets),
+        "datasets_cached": len(cached),
+        "load_seconds": time.perf_counter() - start,
+        "load_critical_path_seconds": critical_path(
+            dataset_graph(datasets), dict(durations, **cached)
+        ),
+    }
+    return conn, stats
+
+
+def load_datasets(
+    program,
+    chunk_rows=None,
+    memory_budget=None,
+    load_workers=None,
+    dataset_cache=False,
+    dataset_cache_hash=False,
+):
+    """ Loads the datasets of the program into an in-memory SQLite database.
+
+    Only the datasets the plots read from, directly or through SQL datasets,
+    are loaded, and only the columns of the files they refer to. When all of
+    the plots over a file share a FILTER, only the rows matching it are
+    loaded. Files are read concurrently a batch of rows at a time, and SQL
+    datasets are created once the datasets they refer to are loaded. With
+    load_workers, files are parsed by a pool of processes, shared by all of
+    the files.
+    With the dataset cache, files loaded before are attached from the cache
+    instead of being read again.
+
+    Parameters
+    ----------
+    program : Program
+        The compiled program.
+    chunk_rows : int
+        The number of rows of a file loaded at a time.
+    memory_budget : int
+        The number of bytes a batch of rows may take up while loading, if
+        chunk_rows isn't given. Default: 1000 rows a batch.
+    load_workers : int
+        The number of processes parsing the files. More than 1 parses them in
+        a pool of spawned processes, so a script using it needs an
+        ``if __name__ == "__main__":`` guard. Default: 1, which parses them in
+        threads of this process.
+    dataset_cache : bool
+        Whether to attach the files' tables from the on-disk dataset cache if
+        the same columns and rows of the same version of the file were loaded
+        before, and to store the files that aren't. Default: False.
+    dataset_cache_hash : bool
+        Whether the dataset cache identifies the version of a file by a hash
+        of its contents rather than its modification time. Default: False.
+
+    Returns
+    -------
+    sqlite3.Connection
+        The connection to the database.
+
+    Raises
+    ------
+    SvlDataLoadError
+        If there is an error loading the data into sqlite.
+    """
+    conn, _ = _load_datasets(
+        program,
+        chunk_rows=chunk_rows,
+        memory_budget=memory_budget,
+        load_workers=load_workers,
+        dataset_cache=dataset_cache,
+        dataset_cache_hash=dataset_cache_hash,
+    )
+    return conn
+
+
+def _plot_rows(logical_plan, rows, query_aliases):
+    """ Gives a plot the rows of the query it shares, under its own column
+        names.
+    """
+    if logical_plan["node"] == "pick":
+        return [
+            {logical_plan["alias"]: row[logical_plan["column"]]}
+            for row in rows
+        ]
+
+    aliases = output_aliases(logical_plan)
+    if aliases == query_aliases:
+        return rows
+    return [dict(zip(aliases, row)) for row in rows]
+
+
+def execute_plan(
+    plan,
+    conn=None,
+    chunk_rows=None,
+    memory_budget=None,
+    load_workers=None,
+    dataset_cache=False,
+    dataset_cache_hash=False,
+):
+    """ Runs the plan's queries and collects the data for each plot.
+
+    Parameters
+    ----------
+    plan : Plan
+        The query plan.
+    conn : sqlite3.Connection
+        The connection to a database with the program's datasets loaded, as
+        returned by load_datasets. If it isn't provided, the datasets are
+        loaded into a new database and the statistics include the loading.
+    chunk_rows : int
+        The number of rows of a file loaded at a time, if the datasets are
+        loaded.
+    memory_budget : int
+        The number of bytes a batch of rows may take up while loading, if the
+        datasets are loaded and chunk_rows isn't given. Default: 1000 rows a
+        batch.
+    load_workers : int
+        The number of processes parsing the files, if the datasets are
+        loaded, see load_datasets. Default: 1.
+    dataset_cache : bool
+        Whether to use the on-disk dataset cache, if the datasets are loaded.
+        Default: False.
+    dataset_cache_hash : bool
+        Whether the dataset cache hashes the contents of the files, see
+        load_datasets. Default: False.
+
+    Returns
+    -------
+    Result
+        The plan, the data for each of its plots and the query statistics.
+        Identical queries are only run once.
 
-    # Get the data for the plots.
+    Raises
+    ------
+    SvlDataLoadError
+        If there is an error loading the data into sqlite.
+    SvlDataProcessingError
+        If there is an error processing the plot data.
+    """
+    load_stats = {}
+    if conn is None:
+        conn, load_stats = _load_datasets(
+            plan.program,
+            chunk_rows=chunk_rows,
+            memory_budget=memory_budget,
+            load_workers=load_workers,
+            dataset_cache=dataset_cache,
+            dataset_cache_hash=dataset_cache_hash,
+        )
+
+    plots = plan.program.plots
+    data = [None] * len(plots)
+    # Plots that compute the same rows (or values in the same row) share one
+    # query, and each gets the rows under its own column names.
+    shared_plans = common_subplans(plan.logical_plans)["plans"]
     try:
-        svl_plot_data = [get_svl_data(plot, sqlite_conn) for plot in svl_plots]
+        for scan in plan.shared_scans:
+            materialize_scan(scan["name"], scan["query"], conn)
+        for indices in shared_plans:
+            rows = run_query(plan.queries[indices[0]], conn)
+            query_aliases = output_aliases(
+                query_plan(plan.logical_plans[indices[0]])
+            )
+            for ii in indices:
+                data[ii] = rows_to_svl_data(
+                    plots[ii],
+                    _plot_rows(plan.logical_plans[ii], rows, query_aliases),
+                )
     except sqlite3.DatabaseError as e:
         raise SvlDataProcessingError(
             "Error processing plot data: {}".format(e)
         )
+    finally:
+        # The shared scans are only needed by this execution.
+        for scan in plan.shared_scans:
+            drop_scan(scan["name"], conn)
+
+    stats = {
+        "queries": len(shared_plans),
+        "queries_saved": len(plots) - len(shared_plans),
+        "shared_scans": len(plan.shared_scans),
+        **load_stats,
+    }
+
+    return Result(plan=plan, data=data, stats=stats)
+
+
+def render_result(result, backend="plotly", offline_js=False, layout="grid"):
+    """ Renders the plots of the result with their data.
+
+    Parameters
+    ----------
+    result : Result
+        The executed plan.
+    backend : str
+        Which plotting backend to render the plots with. Default: "plotly".
+    offline_js : bool
+        Whether to embed the javascript into the final HTML directly.
+        Default: False.
+    layout : str
+        How to arrange the plots on the page. "grid" uses one grid row and
+        column per layout unit, "compact" merges the units no plot starts or
+        ends in, which gives the same proportions with fewer CSS grid tracks.
+        Default: "grid".
+
+    Returns
+    -------
+    str
+        The rendered HTML template for the plots.
+
+    Raises
+    ------
+    ValueError
+        If the layout isn't supported.
+    NotImplementedError
+        If a backend is selected that hasn't been implemented.
+    """
+    _check_layout(layout)
 
     # Select and render the template.
     if backend == "plotly":
-        template_vars = plotly_template_vars(svl_plots, svl_plot_data)
+        template_vars = plotly_template_vars(
+            result.plan.program.plots, result.data, layout=layout
+        )
         template = plotly_template()
 
         # If offline is selected, use the offline plotly in the template.
@@ -140,3 +581,115 @@ def svl(
         )
 
     return template.render(**template_vars)
+
+
+def svl(
+    svl_source,
+    backend="plotly",
+    datasets=[],
+    offline_js=False,
+    debug=False,
+    compile_cache=False,
+    layout="grid",
+    chunk_rows=None,
+    memory_budget=None,
+    load_workers=None,
+    dataset_cache=False,
+    dataset_cache_hash=False,
+):
+    """ Compiles the SVL source into a rendered plot template.
+
+    This runs each stage of the compiler in turn: compile_program,
+    plan_program, execute_plan and render_result. Use those directly to reuse
+    the output of a stage.
+
+    Parameters
+    -----------
+    svl_source : str
+        The SVL source code.
+    backend : str
+        Which plotting backend to render the plots with. Default: "plotly".
+    datasets : list[str]
+        A list of additional datasets to inject into the ast, for datasets not
+        present in the SVL source code. Each dataset specifier must be of the
+        form "dataset_name=dataset_location".
+    offline_js : bool
+        Whether to embed the javascript into the final HTML directly.
+        Default: False.
+    debug : bool
+        If this flag is true, return the pretty-printed parse tree instead of
+        the compiled program.
+    compile_cache : bool
+        Whether to reuse the parsed, laid out and validated plots from the
+        on-disk compile cache if the same source was compiled with the same
+        additional datasets before. Default: False.
+    layout : str
+        How to arrange the plots on the page. "grid" uses one grid row and
+        column per layout unit, "compact" merges the units no plot starts or
+        ends in, which gives the same proportions with fewer CSS grid tracks.
+        Default: "grid".
+    chunk_rows : int
+        The number of rows of a data file loaded at a time.
+    memory_budget : int
+        The number of bytes a batch of rows may take up while loading, if
+        chunk_rows isn't given. Default: 1000 rows a batch.
+    load_workers : int
+        The number of processes parsing the data files, see load_datasets.
+        Default: 1, which parses them in threads of this process.
+    dataset_cache : bool
+        Whether to attach the data files' tables from the on-disk dataset
+        cache if the files were loaded the same way before, rather than
+        loading them again. Default: False.
+    dataset_cache_hash : bool
+        Whether the dataset cache identifies the version of a file by a hash
+        of its contents rather than its modification time. Default: False.
+
+    Returns
+    -------
+    str
+        The rendered HTML template for the plots.
+
+    Raises
+    ------
+    ValueError
+        If there is a malformed additional dataset specifier or the layout
+        isn't supported.
+    SvlSyntaxError
+        If there is a syntax error in the SVL source.
+    SvlMissingFileError
+        If there is a missing file in the SVL source or additional datasets.
+    SvlMissingDatasetError
+        If there is a dataset specified in a plot that isn't in the dataset
+        specifiers for the SVL program.
+    SvlPlotError
+        If there is an error in any of the SVL plots.
+    SvlDataLoadError
+        If there is an error loading the data into sqlite.
+    SvlDataProcessingError
+        If there is an error processing the plot data.
+    NotImplementedError
+        If a backend is selected that hasn't been implemented.
+    """
+    if debug:
+        from svl.compiler.ast import parse_svl
+
+        return parse_svl(svl_source, debug=True).pretty()
+
+    # Fail on the arguments before any of the (slow) data is loaded.
+    _check_layout(layout)
+
+    program = compile_program(
+        svl_source, datasets=datasets, compile_cache=compile_cache
+    )
+    result = execute_plan(
+        plan_program(program),
+        chunk_rows=chunk_rows,
+        memory_budget=memory_budget,
+        load_workers=load_workers,
+        dataset_cache=dataset_cache,
+        dataset_cache_hash=dataset_cache_hash,
+    )
+
+    return render_result(
+        result, backend=backend, offline_js=offline_js, layout=layout
+    )
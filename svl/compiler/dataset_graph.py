@@ -0,0 +1,413 @@
+import re
+import sqlite3
+
+from collections import OrderedDict
+
+from svl.data_sources.schema import file_columns, plot_fields
+
+# The tokens of a SQL statement that can't name a table or column (string
+# literals and comments), the ones that can (bare, quoted and bracketed
+# identifiers) and wildcards.
+SQL_TOKEN = re.compile(
+    r"""'(?:[^']|'')*'"""
+    r"|--[^\n]*"
+    r"|/\*.*?\*/"
+    r'|"((?:[^"]|"")*)"'
+    r"|`((?:[^`]|``)*)`"
+    r"|\[([^\]]*)\]"
+    r"|([A-Za-z_][A-Za-z0-9_]*)"
+    r"|\*",
+    re.DOTALL,
+)
+WILDCARD_KEYWORDS = {"select", "distinct", "all"}
+
+
+def sql_identifiers(sql):
+    """ Lists the identifiers in a SQL statement, lower cased since SQLite
+        identifiers are case insensitive.
+
+        Parameters
+        ----------
+        sql : str
+            The SQL statement.
+
+        Returns
+        -------
+        set[str]
+            The identifiers, with "*" if the statement selects all columns.
+    """
+    identifiers = set()
+    previous = ""
+    for match in SQL_TOKEN.finditer(sql):
+        groups = [group for group in match.groups() if group is not None]
+        if groups:
+            identifiers.add(groups[0].lower())
+        elif match.group(0) == "*":
+            # A * is a wildcard where a column could go (SELECT *, a, * and
+            # t.*), as opposed to COUNT(*) or a multiplication.
+            before = sql[: match.start()].rstrip()
+            if before.endswith((",", ".")) or previous in WILDCARD_KEYWORDS:
+                identifiers.add("*")
+        if not match.group(0).startswith(("--", "/*")):
+            previous = match.group(0).lower()
+    return identifiers
+
+
+def table_references(sql, names):
+    """ Finds the datasets a SQL statement refers to.
+
+        This matches the identifiers in the statement against the dataset
+        names rather than parsing the SQL, so a column with the same name as
+        a dataset counts as a reference too. That only ever adds a
+        dependency, which is safe.
+
+        Parameters
+        ----------
+        sql : str
+            The SQL statement.
+        names : list[str]
+            The names of the datasets.
+
+        Returns
+        -------
+        list[str]
+            The names of the datasets the statement refers to, in the order
+            of names.
+    """
+    identifiers = sql_identifiers(sql)
+    return [name for name in names if name.lower() in identifiers]
+
+
+def dataset_graph(svl_datasets):
+    """ Builds the dependency graph of the datasets.
+
+        File datasets don't depend on anything; SQL datasets depend on the
+        datasets their statement refers to.
+
+        Parameters
+        ----------
+        svl_datasets : dict
+            The SVL dataset specifier.
+
+        Returns
+        -------
+        OrderedDict
+            The names of the datasets each dataset depends on, keyed by
+            dataset name in declaration order.
+    """
+    names = list(svl_datasets)
+    return OrderedDict(
+        (
+            name,
+            [
+                dependency
+                for dependency in table_references(spec["sql"], names)
+                if dependency != name
+            ]
+            if "sql" in spec
+            else [],
+        )
+        for name, spec in svl_datasets.items()
+    )
+
+
+def live_datasets(svl_datasets, svl_plots):
+    """ Drops the datasets no plot reads from, directly or through a SQL
+        dataset.
+
+        Parameters
+        ----------
+        svl_datasets : dict
+            The SVL dataset specifier.
+        svl_plots : list[dict]
+            The SVL plots.
+
+        Returns
+        -------
+        dict
+            The datasets the plots need, in declaration order.
+    """
+    graph = dataset_graph(svl_datasets)
+    live = set()
+    stack = [plot["data"] for plot in svl_plots if plot["data"] in graph]
+    while stack:
+        name = stack.pop()
+        if name not in live:
+            live.add(name)
+            stack.extend(graph[name])
+
+    return {
+        name: spec for name, spec in svl_datasets.items() if name in live
+    }
+
+
+def load_order(graph):
+    """ Orders the datasets so each comes after the datasets it depends on.
+
+        Datasets that don't depend on each other keep their declaration
+        order. Datasets in a dependency cycle can't be ordered; they go last,
+        in declaration order, which is how they were always loaded.
+
+        Parameters
+        ----------
+        graph : OrderedDict
+            The dependency graph, as returned by dataset_graph.
+
+        Returns
+        -------
+        list[str]
+            The names of the datasets in load order.
+    """
+    order = []
+    done = set()
+    remaining = list(graph)
+    progress = True
+    while remaining and progress:
+        ready = [
+            name
+            for name in remaining
+            if all(dependency in done for dependency in graph[name])
+        ]
+        progress = len(ready) > 0
+        order.extend(ready)
+        done.update(ready)
+        remaining = [name for name in remaining if name not in done]
+
+    return order + remaining
+
+
+def critical_path(graph, durations):
+    """ Computes the time loading the datasets takes with every dataset
+        loaded as soon as the datasets it depends on are: the longest chain
+        of dependent loads.
+
+        Parameters
+        ----------
+        graph : OrderedDict
+            The dependency graph, as returned by dataset_graph.
+        durations : dict
+            The time each dataset took to load, keyed by dataset name.
+
+        Returns
+        -------
+        float
+            The time along the critical path.
+    """
+    finish = {}
+    for name in load_order(graph):
+        finish[name] = durations.get(name, 0.0) + max(
+            [finish.get(dependency, 0.0) for dependency in graph[name]],
+            default=0.0,
+        )
+    return max(finish.values(), default=0.0)
+
+
+def _plot_identifiers(svl_plot):
+    identifiers = {field.lower() for _, field in plot_fields(svl_plot)}
+    sql = [
+        svl_plot[axis]["transform"]
+        for axis in svl_plot
+        if isinstance(svl_plot[axis], dict) and "transform" in svl_plot[axis]
+    ]
+    if "filter" in svl_plot:
+        sql.append(svl_plot["filter"])
+    for statement in sql:
+        identifiers |= sql_identifiers(statement)
+    # A plot's SQL is an expression, where * multiplies or counts rows.
+    return identifiers - {"*"}
+
+
+def project_datasets(svl_datasets, svl_plots):
+    """ Records on each file dataset the columns of the file the plots and
+        SQL datasets read, so only those need to be loaded.
+
+        A column is read if a plot over the dataset has it as a field, or
+        its name appears in a plot's FILTER or TRANSFORM, in the dataset's
+        FILTER or in the query of a SQL dataset over the dataset. SQL with a
+        wildcard (like SELECT *) reads all of them.
+
+        Parameters
+        ----------
+        svl_datasets : dict
+            The SVL dataset specifier.
+        svl_plots : list[dict]
+            The SVL plots.
+
+        Returns
+        -------
+        dict
+            The datasets, with the file datasets' columns in file order under
+            "columns". Datasets that need all of their columns, or whose
+            columns can't be read from the file, are left alone.
+    """
+    graph = dataset_graph(svl_datasets)
+    identifiers = {name: set() for name in svl_datasets}
+
+    for plot in svl_plots:
+        if plot["data"] in identifiers:
+            identifiers[plot["data"]] |= _plot_identifiers(plot)
+    for name, spec in svl_datasets.items():
+        if "sql" in spec:
+            for dependency in graph[name]:
+                identifiers[dependency] |= sql_identifiers(spec["sql"])
+        if "filter" in spec:
+            identifiers[name] |= sql_identifiers(spec["filter"]) - {"*"}
+
+    projected = {}
+    for name, spec in svl_datasets.items():
+        columns = (
+            file_columns(spec["file"])
+            if "file" in spec and "*" not in identifiers[name]
+            else None
+        )
+        if columns is not None:
+            used = [
+                column
+                for column in columns
+                if column.lower() in identifiers[name]
+            ]
+            if len(used) < len(columns):
+                # A table needs at least one column, even just to count rows.
+                spec = dict(spec, columns=used or columns[:1])
+        projected[name] = spec
+
+    return projected
+
+
+def _create_empty_table(conn, name, columns):
+    conn.execute(
+        'CREATE TABLE "{}" ({});'.format(
+            name,
+            ", ".join(
+                '"{}"'.format(column.replace('"', '""')) for column in columns
+            ),
+        )
+    )
+
+
+def _valid_filter(predicate, name, columns):
+    """ Checks the predicate is valid SQL over the dataset of the name with
+        the columns, without any data. Unknown columns (None) can't be
+        checked.
+    """
+    if columns is None:
+        return False
+
+    conn = sqlite3.connect(":memory:")
+    try:
+        _create_empty_table(conn, "data", columns)
+        # The filter is run against the dataset's name when it's loaded too,
+        # so it can qualify the columns with it.
+        conn.execute(
+            'SELECT * FROM data AS "{}" WHERE {} LIMIT 0;'.format(
+                name.replace('"', '""'), predicate
+            )
+        )
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+
+def push_down_filters(svl_datasets, svl_plots):
+    """ Moves a FILTER shared by all of the plots over a file dataset onto
+        the dataset, so the rows no plot uses aren't loaded.
+
+        The plots keep their filter, which is then true of every row. A file
+        dataset with a SQL dataset built on it is left alone, since the SQL
+        dataset may need the rows the plots don't. So is a filter that isn't
+        valid against the file's columns, so its error is reported with the
+        plot's query rather than while loading.
+
+        Parameters
+        ----------
+        svl_datasets : dict
+            The SVL dataset specifier.
+        svl_plots : list[dict]
+            The SVL plots.
+
+        Returns
+        -------
+        dict
+            The datasets, with the shared plot filters added to the file
+            datasets' "filter".
+    """
+    graph = dataset_graph(svl_datasets)
+    dependents = {
+        dependency
+        for dependencies in graph.values()
+        for dependency in dependencies
+    }
+
+    pushed = {}
+    for name, spec in svl_datasets.items():
+        filters = {
+            plot.get("filter") for plot in svl_plots if plot["data"] == name
+        }
+        if (
+            "file" in spec
+            and name not in dependents
+            and len(filters) == 1
+            and None not in filters
+            and _valid_filter(
+                next(iter(filters)), name, file_columns(spec["file"])
+            )
+        ):
+            (plot_filter,) = filters
+            spec = dict(
+                spec,
+                filter=plot_filter
+                if "filter" not in spec
+                else "({}) AND ({})".format(spec["filter"], plot_filter),
+            )
+        pushed[name] = spec
+
+    return pushed
+
+
+def dataset_columns(svl_datasets):
+    """ Works out the columns of each dataset without loading any data.
+
+        File datasets get their columns from the file's header (or footer).
+        SQL datasets get theirs by creating them as views over empty tables
+        with the files' columns.
+
+        Parameters
+        ----------
+        svl_datasets : dict
+            The SVL dataset specifier.
+
+        Returns
+        -------
+        dict
+            The columns of each dataset, keyed by dataset name. The columns
+            are None if they can't be worked out - the file can't be read,
+            or the SQL fails (its error is reported when it's loaded).
+    """
+    columns = {}
+    conn = sqlite3.connect(":memory:")
+    try:
+        for name in load_order(dataset_graph(svl_datasets)):
+            spec = svl_datasets[name]
+            try:
+                if "file" in spec:
+                    columns[name] = file_columns(spec["file"])
+                    if columns[name] is not None:
+                        _create_empty_table(conn, name, columns[name])
+                else:
+                    conn.execute(
+                        'CREATE VIEW "{}" AS {};'.format(name, spec["sql"])
+                    )
+                    columns[name] = [
+                        description[0]
+                        for description in conn.execute(
+                            'SELECT * FROM "{}" LIMIT 0;'.format(name)
+                        ).description
+                    ]
+            except sqlite3.Error:
+                columns[name] = None
+    finally:
+        conn.close()
+
+    return columns
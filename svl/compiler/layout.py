@@ -1,8 +1,6 @@
-from toolz import compose, merge, concat
+from toolz import merge
 from functools import reduce
 
-listconcat = compose(list, concat)
-
 START_POSITION = {
     "row_start": 0,
     "row_end": 1,
@@ -15,16 +13,15 @@ def gcd(a, b):
     """ Computes the greatest common divisor between the two numbers using
         Euclid's algorithm.
     """
-    if b == 0:
-        return a
-    else:
-        return gcd(b, a % b)
+    while b != 0:
+        a, b = b, a % b
+    return a
 
 
 def lcm(a, b):
     """ Computes the least common multiple between the two numbers.
     """
-    return (a * b) / gcd(a, b)
+    return (a * b) // gcd(a, b)
 
 
 def shift_node_position(
@@ -73,6 +70,67 @@ def shift_node_position(
     )
 
 
+def _cat(tree):
+    """ Returns the concatenation direction of the node, or None for a leaf.
+    """
+    if "hcat" in tree:
+        return "hcat"
+    elif "vcat" in tree:
+        return "vcat"
+    else:
+        return None
+
+
+def _tree_breadths(tree):
+    """ Computes the number of rows and columns each node of the tree spans
+        in its own length units.
+
+        Parameters
+        ----------
+        tree : dict
+            A parsed SVL tree.
+
+        Returns
+        -------
+        dict
+            The (row breadth, column breadth) of each node, keyed by the id of
+            the node.
+    """
+    # Nodes in pre-order, so reversing them puts every child before its
+    # parent.
+    nodes = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        cat = _cat(node)
+        if cat:
+            stack.extend(node[cat])
+
+    breadths = {}
+    for node in reversed(nodes):
+        cat = _cat(node)
+        if not cat:
+            breadths[id(node)] = (1, 1)
+            continue
+
+        # The length unit of a node is the lcm of its children's breadths,
+        # so every child can be stretched to fill it exactly.
+        row_length_unit = reduce(
+            lcm, [breadths[id(child)][0] for child in node[cat]]
+        )
+        column_length_unit = reduce(
+            lcm, [breadths[id(child)][1] for child in node[cat]]
+        )
+        num_children = len(node[cat])
+        breadths[id(node)] = (
+            row_length_unit * (num_children if cat == "vcat" else 1),
+            column_length_unit * (num_children if cat == "hcat" else 1),
+        )
+
+    return breadths
+
+
 def tree_to_grid(tree):
     """ Transforms a parsed SVL tree without position information into a list
         of nodes with the grid positions.
@@ -88,57 +146,123 @@ def tree_to_grid(tree):
             The nodes in the tree with their associated positions in a flat
             list.
     """
-    if ("hcat" in tree) or ("vcat" in tree):
-        cat = "hcat" if "hcat" in tree else "vcat"
-
-        # Obtain subtrees. Note this flattens them.
-        subtrees = [tree_to_grid(subtree) for subtree in tree[cat]]
-
-        # Calculate the breadths in horizonal and vertical dimensions.
-        # This is done by examining the maximum row and column end points of
-        # each of the subtrees.
-        row_breadths = [
-            reduce(max, [n["row_end"] for n in subtree])
-            for subtree in subtrees
-        ]
-
-        column_breadths = [
-            reduce(max, [n["column_end"] for n in subtree])
-            for subtree in subtrees
-        ]
-
-        # Use the breadths to determine the row / column length units. This
-        # is the "final" length unit of the current tree.
-        row_length_unit = reduce(lambda a, x: lcm(a, x), row_breadths)
-        column_length_unit = reduce(lambda a, x: lcm(a, x), column_breadths)
-
-        # Set the shift axis to vertical or horizontal.
-        # vcat causes a row shift, hcat causes a column one.
-        row_shift = row_length_unit if cat == "vcat" else 0
-        column_shift = column_length_unit if cat == "hcat" else 0
-
-        # Shift the positions of each of the subtrees.
-        shifted_subtrees = [
-            # Map the shift_node_position function to each subtree's nodes.
-            [
-                shift_node_position(
+    breadths = _tree_breadths(tree)
+
+    # Walk down the tree carrying the transform from the node's positions to
+    # the grid's: (row_stretch, row_shift, column_stretch, column_shift).
+    # Children are pushed in reverse so the leaves come out in order.
+    grid = []
+    stack = [(tree, (1, 0, 1, 0))]
+    while stack:
+        node, (row_stretch, row_shift, column_stretch, column_shift) = (
+            stack.pop()
+        )
+        cat = _cat(node)
+
+        if not cat:
+            # For a leaf node, the start position of (0 / 1, 0 / 1) is
+            # placed on the grid.
+            grid.append(
+                merge(
                     node,
-                    row_shift * ii,
-                    column_shift * ii,
-                    # The stretch factor of the subtree depends on the breadth
-                    # and the length unit of the total tree.
-                    int(row_length_unit / row_breadths[ii]),
-                    int(column_length_unit / column_breadths[ii]),
+                    shift_node_position(
+                        START_POSITION,
+                        row_shift,
+                        column_shift,
+                        row_stretch,
+                        column_stretch,
+                    ),
                 )
-                for node in subtree
-            ]
-            for ii, subtree in enumerate(subtrees)
-        ]
+            )
+            continue
 
-        # Concatenate all of the shifted subtrees into a single list.
-        return listconcat(shifted_subtrees)
+        row_breadth, column_breadth = breadths[id(node)]
+        num_children = len(node[cat])
+        # vcat splits the rows between the children, hcat the columns.
+        row_length_unit = (
+            row_breadth // num_children if cat == "vcat" else row_breadth
+        )
+        column_length_unit = (
+            column_breadth // num_children
+            if cat == "hcat"
+            else column_breadth
+        )
 
-    else:
-        # For a leaf node, inject the start position of (0 / 1, 0 / 1) and
-        # wrap into a list.
-        return [merge(tree, START_POSITION)]
+        for ii in reversed(range(num_children)):
+            child = node[cat][ii]
+            child_row_breadth, child_column_breadth = breadths[id(child)]
+            # Stretch the child to the length unit, then shift it into
+            # place.
+            child_row_stretch = row_length_unit // child_row_breadth
+            child_column_stretch = column_length_unit // child_column_breadth
+            child_row_shift = row_length_unit * ii if cat == "vcat" else 0
+            child_column_shift = (
+                column_length_unit * ii if cat == "hcat" else 0
+            )
+
+            stack.append(
+                (
+                    child,
+                    (
+                        row_stretch * child_row_stretch,
+                        row_stretch * child_row_shift + row_shift,
+                        column_stretch * child_column_stretch,
+                        column_stretch * child_column_shift + column_shift,
+                    ),
+                )
+            )
+
+    return grid
+
+
+def _tracks(boundaries):
+    """ Numbers the boundaries and computes the size of the tracks between
+        them.
+    """
+    boundaries = sorted(boundaries)
+    index = {boundary: ii for ii, boundary in enumerate(boundaries)}
+    sizes = [end - start for start, end in zip(boundaries, boundaries[1:])]
+    return index, sizes
+
+
+def compact_grid(svl_plots):
+    """ Merges grid rows and columns that no plot starts or ends in into
+        single tracks, so the plots sit on as few tracks as possible with the
+        same proportions.
+
+        Parameters
+        ----------
+        svl_plots : list
+            The plots with their grid positions, as produced by tree_to_grid.
+
+        Returns
+        -------
+        Tuple[list, list[int], list[int]]
+            The plots positioned on the tracks, and the number of grid rows
+            and columns each row track and column track spans.
+    """
+    row_index, row_tracks = _tracks(
+        {0}
+        | {plot["row_start"] for plot in svl_plots}
+        | {plot["row_end"] for plot in svl_plots}
+    )
+    column_index, column_tracks = _tracks(
+        {0}
+        | {plot["column_start"] for plot in svl_plots}
+        | {plot["column_end"] for plot in svl_plots}
+    )
+
+    compacted_plots = [
+        merge(
+            plot,
+            {
+                "row_start": row_index[plot["row_start"]],
+                "row_end": row_index[plot["row_end"]],
+                "column_start": column_index[plot["column_start"]],
+                "column_end": column_index[plot["column_end"]],
+            },
+        )
+        for plot in svl_plots
+    ]
+
+    return compacted_plots, row_tracks, column_tracks
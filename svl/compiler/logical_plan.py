@@ -0,0 +1,554 @@
+import json
+
+from collections import OrderedDict
+
+# The axes of each plot type that become output columns, in column order.
+XY_AXES = ["x", "y", "split_by", "color_by"]
+HISTOGRAM_AXES = ["x", "y", "split_by"]
+
+
+def expression(svl_axis):
+    """ Extracts the expression computed for an SVL axis, leaving out the
+        presentation (labels, sorting, color scales).
+
+        Temporal bucketing is folded into a single "bucket" expression with
+        the time unit and field, so plans compare (and report the columns
+        they use) without knowing how a backend buckets time.
+
+        Parameters
+        ----------
+        svl_axis : dict
+            The SVL axis specifier.
+
+        Returns
+        -------
+        dict
+            The expression. One of {"transform": sql}, {"bucket": unit,
+            "field": field}, {"field": field} or {} (all rows, as in
+            COUNT(*)), with the aggregation function under "agg" if there is
+            one.
+    """
+    if "transform" in svl_axis:
+        expr = {"transform": svl_axis["transform"]}
+    elif "temporal" in svl_axis:
+        expr = {"bucket": svl_axis["temporal"], "field": svl_axis["field"]}
+    elif "field" in svl_axis:
+        expr = {"field": svl_axis["field"]}
+    else:
+        expr = {}
+
+    if "agg" in svl_axis:
+        expr["agg"] = svl_axis["agg"]
+
+    return expr
+
+
+def _without_agg(expr):
+    return {k: v for k, v in expr.items() if k != "agg"}
+
+
+def scan_node(table):
+    return {"node": "scan", "table": table}
+
+
+def filter_node(predicate, node):
+    return {"node": "filter", "predicate": predicate, "input": node}
+
+
+def project_node(columns, node):
+    return {"node": "project", "columns": columns, "input": node}
+
+
+def aggregate_node(groups, columns, node):
+    return {
+        "node": "aggregate",
+        "groups": groups,
+        "columns": columns,
+        "input": node,
+    }
+
+
+def sort_node(keys, direction, node):
+    return {
+        "node": "sort",
+        "keys": keys,
+        "direction": direction,
+        "input": node,
+    }
+
+
+def pick_node(column, alias, node):
+    return {"node": "pick", "column": column, "alias": alias, "input": node}
+
+
+def _columns(svl_plot, axes):
+    return [
+        {"expr": expression(svl_plot[axis]), "alias": axis}
+        for axis in axes
+        if axis in svl_plot
+    ]
+
+
+def _xy_plan(svl_plot, node):
+    columns = _columns(svl_plot, XY_AXES)
+
+    # An aggregation on one axis groups by the other.
+    group_axis = None
+    if "agg" in svl_plot["x"]:
+        group_axis = "y"
+    elif "agg" in svl_plot["y"]:
+        group_axis = "x"
+
+    if group_axis:
+        groups = [_without_agg(expression(svl_plot[group_axis]))]
+        # The color_by field can't be grouped by. If there's an aggregation
+        # on x or y, then there must be an aggregation on color_by.
+        if "split_by" in svl_plot:
+            groups.append(_without_agg(expression(svl_plot["split_by"])))
+        node = aggregate_node(groups, columns, node)
+    else:
+        node = project_node(columns, node)
+
+    # Each SPLIT BY value becomes its own trace, so it's sorted on first.
+    split_by_keys = ["split_by"] if "split_by" in svl_plot else []
+    for axis in ["x", "y"]:
+        if "sort" in svl_plot[axis]:
+            return sort_node(
+                split_by_keys + [axis], svl_plot[axis]["sort"], node
+            )
+
+    return node
+
+
+def plot_to_plan(svl_plot):
+    """ Builds the logical plan computing the data for an SVL plot.
+
+        Plans are trees of dicts, each with its kind of operation under
+        "node" and its input under "input": a "scan" of a dataset, a "filter"
+        with a SQL predicate, a "project" or an "aggregate" (with its group
+        by expressions) of output columns, and a "sort" on output columns.
+        The optimizer may also add a "pick" of one column of a query shared
+        by several plots.
+
+        Parameters
+        ----------
+        svl_plot : dict
+            The SVL plot specifier.
+
+        Returns
+        -------
+        dict
+            The root node of the plan.
+    """
+    node = scan_node(svl_plot["data"])
+    if "filter" in svl_plot:
+        node = filter_node(svl_plot["filter"], node)
+
+    if svl_plot["type"] in {"line", "scatter", "bar"}:
+        return _xy_plan(svl_plot, node)
+    elif svl_plot["type"] == "histogram":
+        return project_node(_columns(svl_plot, HISTOGRAM_AXES), node)
+    elif svl_plot["type"] == "pie":
+        axis = expression(svl_plot["axis"])
+        return aggregate_node(
+            [axis],
+            [
+                {"expr": axis, "alias": "label"},
+                {"expr": {"agg": "COUNT"}, "alias": "value"},
+            ],
+            node,
+        )
+    elif svl_plot["type"] == "number":
+        value = [{"expr": expression(svl_plot["value"]), "alias": "value"}]
+        if "agg" in svl_plot["value"]:
+            return aggregate_node([], value, node)
+        else:
+            return project_node(value, node)
+
+
+def _rebuild(node, function):
+    """ Applies the function to every node of the plan from the scan up,
+        rebuilding the nodes above each rewritten one.
+    """
+    # Plans are chains, so walk down to the scan and back up again.
+    chain = [node]
+    while "input" in chain[-1]:
+        chain.append(chain[-1]["input"])
+
+    rebuilt = function(chain[-1])
+    for parent in reversed(chain[:-1]):
+        rebuilt = function(dict(parent, input=rebuilt))
+    return rebuilt
+
+
+def push_down_predicates(plan):
+    """ Merges each filter into the scan beneath it, so the plan reads the
+        dataset already filtered, and plots with the same dataset and filter
+        share the same scan.
+
+        Parameters
+        ----------
+        plan : dict
+            The logical plan.
+
+        Returns
+        -------
+        dict
+            The plan with filters pushed into the scans.
+    """
+
+    def _push(node):
+        if node["node"] == "filter" and node["input"]["node"] == "scan":
+            scan = node["input"]
+            predicates = scan.get("predicates", []) + [node["predicate"]]
+            return dict(scan, predicates=predicates)
+        return node
+
+    return _rebuild(plan, _push)
+
+
+def _expression_columns(expr):
+    """ The columns an expression reads, or None if it's SQL that could
+        read anything.
+    """
+    if "transform" in expr or "when" in expr:
+        return None
+    elif "field" in expr:
+        return {expr["field"]}
+    else:
+        return set()
+
+
+def plan_columns(plan, predicates=True):
+    """ Finds the columns of the scanned dataset the plan reads.
+
+        Parameters
+        ----------
+        plan : dict
+            The logical plan.
+        predicates : bool
+            Whether to include the columns the filters read. Default: True.
+
+        Returns
+        -------
+        set[str] or None
+            The columns, or None if the plan has SQL (a transform or a filter)
+            that could read any column.
+    """
+    columns = set()
+    node = plan
+    while True:
+        if predicates and (
+            node["node"] == "filter" or node.get("predicates")
+        ):
+            return None
+
+        expressions = []
+        if node["node"] in {"project", "aggregate"}:
+            expressions = [column["expr"] for column in node["columns"]]
+            expressions += node.get("groups", [])
+        for expr in expressions:
+            expr_columns = _expression_columns(expr)
+            if expr_columns is None:
+                return None
+            columns |= expr_columns
+
+        if "input" not in node:
+            return columns
+        node = node["input"]
+
+
+def push_down_projections(plan):
+    """ Records the columns the plan reads on its scan, so only those need
+        to be read from the dataset.
+
+        Parameters
+        ----------
+        plan : dict
+            The logical plan.
+
+        Returns
+        -------
+        dict
+            The plan with the sorted columns (or None for all of them) under
+            "columns" on the scan.
+    """
+    columns = plan_columns(plan)
+    scan_columns = None if columns is None else sorted(columns)
+
+    def _project(node):
+        if node["node"] == "scan":
+            return dict(node, columns=scan_columns)
+        return node
+
+    return _rebuild(plan, _project)
+
+
+def optimize(plans):
+    """ Optimizes the logical plans for a dashboard.
+
+        Parameters
+        ----------
+        plans : list[dict]
+            The logical plan of each plot.
+
+        Returns
+        -------
+        list[dict]
+            The optimized plans, in the same order.
+    """
+    return [push_down_projections(push_down_predicates(p)) for p in plans]
+
+
+def plan_key(plan):
+    """ Produces a canonical key for a plan (or any part of one) - equal plans
+        have equal keys.
+    """
+    return json.dumps(plan, sort_keys=True)
+
+
+def scan_of(plan):
+    """ Finds the scan at the bottom of the plan.
+    """
+    node = plan
+    while "input" in node:
+        node = node["input"]
+    return node
+
+
+def query_plan(plan):
+    """ Strips the pick of a column from a shared query, if the plan has one,
+        leaving the plan for the query.
+    """
+    return plan["input"] if plan["node"] == "pick" else plan
+
+
+def output_aliases(plan):
+    """ Lists the names of the plan's output columns, in order.
+    """
+    if plan["node"] == "pick":
+        return [plan["alias"]]
+
+    node = plan
+    while node["node"] not in {"project", "aggregate"}:
+        node = node["input"]
+    return [column["alias"] for column in node["columns"]]
+
+
+def canonical_plan(plan):
+    """ Renames the plan's output columns by position, so plans that compute
+        the same rows under different column names are equal.
+
+        Parameters
+        ----------
+        plan : dict
+            The logical plan.
+
+        Returns
+        -------
+        dict
+            The plan with output columns (and the sort keys referring to
+            them) named "_0", "_1", ...
+    """
+    positions = {
+        alias: "_{}".format(ii)
+        for ii, alias in enumerate(output_aliases(plan))
+    }
+
+    def _canonical(node):
+        if node["node"] in {"project", "aggregate"}:
+            return dict(
+                node,
+                columns=[
+                    dict(column, alias=positions[column["alias"]])
+                    for column in node["columns"]
+                ],
+            )
+        elif node["node"] == "sort":
+            return dict(node, keys=[positions[key] for key in node["keys"]])
+        return node
+
+    return _rebuild(plan, _canonical)
+
+
+def common_subplans(plans):
+    """ Finds the plots that compute the same thing.
+
+        Parameters
+        ----------
+        plans : list[dict]
+            The optimized logical plans of the plots.
+
+        Returns
+        -------
+        dict
+            Under "plans", the indices of the plots for each distinct query
+            (ignoring the names of the output columns), and under "scans",
+            the indices of the plots for each distinct (filtered) scan. Both
+            are in order of first appearance.
+    """
+    shared_plans = OrderedDict()
+    shared_scans = OrderedDict()
+    for ii, plan in enumerate(plans):
+        shared_plans.setdefault(
+            plan_key(canonical_plan(query_plan(plan))), []
+        ).append(ii)
+        # The scan's columns are what this plan needs, not the scan itself.
+        scan = {
+            k: v for k, v in scan_of(plan).items() if k != "columns"
+        }
+        shared_scans.setdefault(plan_key(scan), []).append(ii)
+
+    return {
+        "plans": list(shared_plans.values()),
+        "scans": list(shared_scans.values()),
+    }
+
+
+def _read_shared(plan, name):
+    """ Replaces the plan's filtered scan with a scan of the shared scan.
+    """
+    columns = sorted(plan_columns(plan, predicates=False))
+
+    def _read(node):
+        if node["node"] == "scan":
+            return {
+                "node": "scan",
+                "table": node["table"],
+                "source": name,
+                "columns": columns,
+            }
+        return node
+
+    return _rebuild(plan, _read)
+
+
+def fuse_shared_scans(plans):
+    """ Reads each filtered scan shared by plots computing different things
+        once. The scan is materialized with the columns all of the plots
+        need, and the plots read that instead of filtering the dataset again.
+        Scans of plots with a TRANSFORM aren't shared.
+
+        Parameters
+        ----------
+        plans : list[dict]
+            The optimized logical plans of the plots.
+
+        Returns
+        -------
+        Tuple[list[dict], list[dict]]
+            The plans reading from the shared scans, and the shared scans,
+            each with the "name" to materialize it under and the scan "plan"
+            to materialize.
+    """
+    fused_plans = list(plans)
+    shared_scans = []
+    for indices in common_subplans(plans)["scans"]:
+        scan = scan_of(plans[indices[0]])
+        distinct_plans = {
+            plan_key(canonical_plan(query_plan(plans[ii])))
+            for ii in indices
+        }
+        # Unfiltered scans read the dataset as is, so there's nothing to
+        # share.
+        if not scan.get("predicates") or len(distinct_plans) < 2:
+            continue
+
+        # The filter is applied when the scan is materialized, so only the
+        # columns the plots read past it are kept. If a TRANSFORM could read
+        # any column, the whole filtered dataset would have to be copied,
+        # which costs more than filtering it again.
+        shared_columns = [
+            plan_columns(plans[ii], predicates=False) for ii in indices
+        ]
+        if any(c is None for c in shared_columns):
+            continue
+        columns = sorted(set().union(*shared_columns))
+        name = "_svl_scan_{}".format(len(shared_scans))
+        shared_scans.append(
+            {"name": name, "plan": dict(scan, columns=columns)}
+        )
+
+        for ii in indices:
+            fused_plans[ii] = _read_shared(plans[ii], name)
+
+    return fused_plans, shared_scans
+
+
+def _is_number_aggregate(plan):
+    # Only NUMBER plots aggregate without grouping.
+    return (
+        plan["node"] == "aggregate"
+        and not plan["groups"]
+        and plan["input"]["node"] == "scan"
+        and "source" not in plan["input"]
+    )
+
+
+def fuse_number_aggregates(plans):
+    """ Computes the aggregates of NUMBER plots over the same dataset in one
+        query, each plot picking its value out of the query's single row.
+
+        If the plots have different filters, each aggregate only takes the
+        rows matching its plot's filter, by aggregating a conditional
+        expression, so the dataset is still read once.
+
+        Parameters
+        ----------
+        plans : list[dict]
+            The optimized logical plans of the plots.
+
+        Returns
+        -------
+        list[dict]
+            The plans, with those of the fused NUMBER plots picking from the
+            shared query.
+    """
+    tables = OrderedDict()
+    for ii, plan in enumerate(plans):
+        if _is_number_aggregate(plan):
+            tables.setdefault(plan["input"]["table"], []).append(ii)
+
+    fused_plans = list(plans)
+    for table, indices in tables.items():
+        # Identical plots share a column.
+        values = OrderedDict()
+        for ii in indices:
+            values.setdefault(plan_key(canonical_plan(plans[ii])), ii)
+        if len(values) < 2:
+            continue
+
+        scans = [plans[ii]["input"] for ii in values.values()]
+        predicates = [scan.get("predicates", []) for scan in scans]
+        shared_predicates = predicates[0] if all(
+            p == predicates[0] for p in predicates
+        ) else []
+
+        columns = []
+        for column_index, (scan, plan) in enumerate(
+            zip(scans, [plans[ii] for ii in values.values()])
+        ):
+            expr = plan["columns"][0]["expr"]
+            plot_predicates = scan.get("predicates", [])
+            if plot_predicates and not shared_predicates:
+                expr = dict(expr, when=plot_predicates)
+            columns.append(
+                {"expr": expr, "alias": "_{}".format(column_index)}
+            )
+
+        fused_scan = {"node": "scan", "table": table}
+        if shared_predicates:
+            fused_scan["predicates"] = shared_predicates
+        fused = push_down_projections(aggregate_node([], columns, fused_scan))
+
+        column_names = {
+            key: "_{}".format(column_index)
+            for column_index, key in enumerate(values)
+        }
+        for ii in indices:
+            key = plan_key(canonical_plan(plans[ii]))
+            fused_plans[ii] = pick_node(
+                column_names[key], output_aliases(plans[ii])[0], fused
+            )
+
+    return fused_plans
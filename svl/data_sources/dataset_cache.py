@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+import pkgutil
+import sqlite3
+import tempfile
+
+from svl.cache import cache_dir
+from svl.data_sources.schema import file_fingerprint
+
+# Bump this when the structure of a cached entry changes.
+DATASET_CACHE_FORMAT = 1
+
+# The maximum total size of the dataset cache. The least recently used entries
+# are evicted when a new entry pushes the cache over this size.
+DATASET_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Everything that determines the loaded table besides the file and the dataset
+# specifier: the loaders, which infer the column types.
+LOADER_RESOURCES = [("svl.data_sources", "sqlite.py")]
+
+# The name of the table in each cached database.
+CACHED_TABLE = "data"
+
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def _loader_hash():
+    """ Hashes the sources of the file loaders.
+
+        Returns
+        -------
+        str
+            The hex digest of the hash.
+    """
+    loader_hash = hashlib.sha256()
+    for package, resource in LOADER_RESOURCES:
+        loader_hash.update(pkgutil.get_data(package, resource))
+    return loader_hash.hexdigest()
+
+
+def _content_hash(filename):
+    content_hash = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            content_hash.update(block)
+    return content_hash.hexdigest()
+
+
+def _quote(identifier):
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def dataset_key(svl_dataset, content_hash=False):
+    """ Constructs the dataset cache key for a file dataset.
+
+        The file is identified by its absolute path, size and modification
+        time, which doesn't take reading it. With content_hash the
+        modification time is replaced by a hash of the contents, so a file
+        that's rewritten with the same contents (a fresh checkout, say) is
+        still a hit, and an edit that keeps the size and modification time
+        isn't.
+
+        Parameters
+        ----------
+        svl_dataset : dict
+            The SVL file dataset specifier, with its "columns" and "filter"
+            if only some of the file is loaded.
+        content_hash : bool
+            Whether to hash the contents of the file. Default: False.
+
+        Returns
+        -------
+        str
+            The cache key.
+
+        Raises
+        ------
+        OSError
+            If the file can't be read.
+    """
+    path, size, mtime_ns = file_fingerprint(svl_dataset["file"])
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "format": DATASET_CACHE_FORMAT,
+                "loader": _loader_hash(),
+                "file": [path, size],
+                "version": _content_hash(path) if content_hash else mtime_ns,
+                "columns": svl_dataset.get("columns"),
+                "filter": svl_dataset.get("filter"),
+            }
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def _entry_path(key):
+    return os.path.join(cache_dir("datasets"), "{}.sqlite".format(key))
+
+
+def cached_dataset(key):
+    """ Locates the cached database for the key, marking it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The dataset cache key.
+
+        Returns
+        -------
+        str or None
+            The path to the cached database, or None if it isn't in the
+            cache.
+    """
+    try:
+        path = _entry_path(key)
+        # The modification time is the recency for LRU eviction.
+        os.utime(path)
+    except OSError:
+        return None
+
+    return path
+
+
+def attach_dataset(conn, table_name, path):
+    """ Attaches a cached database and makes its table available as the
+        dataset, through a temporary view. Nothing is copied, so this takes
+        about as long for a big table as a small one.
+
+        Parameters
+        ----------
+        conn : sqlite3.Connection
+            The connection to the sqlite database, outside of a transaction.
+        table_name : str
+            The name of the dataset.
+        path : str
+            The cached database, as returned by cached_dataset.
+
+        Returns
+        -------
+        bool
+            Whether the dataset was attached. It isn't if the connection has
+            as many databases attached as SQLite allows, or the entry is gone
+            or isn't a cached table.
+    """
+    schema = _quote("svl_dataset_{}".format(table_name))
+    try:
+        conn.execute("ATTACH DATABASE ? AS {};".format(schema), (path,))
+    except sqlite3.Error:
+        return False
+
+    try:
+        # Attaching a file that's since been evicted creates an empty one.
+        if (
+            conn.execute(
+                "SELECT 1 FROM {}.sqlite_master WHERE name = ?;".format(
+                    schema
+                ),
+                (CACHED_TABLE,),
+            ).fetchone()
+            is None
+        ):
+            raise sqlite3.DatabaseError("Not a cached dataset.")
+        conn.execute(
+            "CREATE TEMP VIEW {} AS SELECT * FROM {}.{};".format(
+                _quote(table_name), schema, CACHED_TABLE
+            )
+        )
+    except sqlite3.Error:
+        conn.execute("DETACH DATABASE {};".format(schema))
+        return False
+
+    return True
+
+
+def _copy_table(conn, table_name, database):
+    """ Copies the table, with its column types, into the cached table of the
+        (empty) database.
+    """
+    columns = [
+        (name, column_type)
+        for _, name, column_type, _, _, _ in conn.execute(
+            "PRAGMA main.table_info({});".format(_quote(table_name))
+        )
+    ]
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS svl_cache_entry;", (database,))
+    try:
+        # The file is thrown away if this fails, so it needs no journal.
+        conn.execute("PRAGMA svl_cache_entry.journal_mode = OFF;")
+        conn.execute(
+            "CREATE TABLE svl_cache_entry.{} ({});".format(
+                CACHED_TABLE,
+                ", ".join(
+                    "{} {}".format(_quote(name), column_type)
+                    for name, column_type in columns
+                ),
+            )
+        )
+        with conn:
+            conn.execute(
+                "INSERT INTO svl_cache_entry.{} SELECT * FROM main.{};".format(
+                    CACHED_TABLE, _quote(table_name)
+                )
+            )
+    finally:
+        conn.execute("DETACH DATABASE svl_cache_entry;")
+
+
+def store_dataset(key, conn, table_name, max_bytes=DATASET_CACHE_MAX_BYTES):
+    """ Copies a loaded dataset into the dataset cache, evicting the least
+        recently used entries if the cache exceeds its maximum size. A cache
+        that can't be written is skipped.
+
+        Parameters
+        ----------
+        key : str
+            The dataset cache key.
+        conn : sqlite3.Connection
+            The connection to the sqlite database with the dataset.
+        table_name : str
+            The name of the dataset's table.
+        max_bytes : int
+            The maximum total size of the cache in bytes. Default: 1GB.
+    """
+    try:
+        path = _entry_path(key)
+        # Written next to the entry and moved into place, so concurrent
+        # readers never attach a partially written database.
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path), prefix=".", suffix=".tmp"
+        )
+        os.close(fd)
+        try:
+            _copy_table(conn, table_name, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        evict_datasets(max_bytes)
+    except (OSError, sqlite3.Error):
+        pass
+
+
+def evict_datasets(max_bytes=DATASET_CACHE_MAX_BYTES):
+    """ Evicts the least recently used entries of the dataset cache until its
+        total size is at most max_bytes.
+
+        Parameters
+        ----------
+        max_bytes : int
+            The maximum total size of the cache in bytes. Default: 1GB.
+    """
+    directory = cache_dir("datasets")
+    entries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".sqlite"):
+            continue
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            # Evicted by another process.
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            # A database that's attached somewhere stays readable there
+            # (on POSIX, elsewhere it's skipped).
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+        total_bytes -= size
@@ -0,0 +1,168 @@
+import csv
+import os
+import threading
+
+from collections import OrderedDict
+
+# The axes of a plot that can refer to a field of the dataset.
+FIELD_AXES = ["x", "y", "axis", "value", "split_by", "color_by"]
+
+# Schemas are cached by file fingerprint, so an edited file is re-read.
+SCHEMA_CACHE_SIZE = 256
+
+_SCHEMAS = OrderedDict()
+_SCHEMAS_LOCK = threading.Lock()
+
+
+def file_fingerprint(filename):
+    """ Identifies the current version of a file without reading it.
+
+        Parameters
+        ----------
+        filename : str
+            The file.
+
+        Returns
+        -------
+        Tuple[str, int, int]
+            The absolute path, size and modification time in nanoseconds.
+
+        Raises
+        ------
+        OSError
+            If the file can't be accessed.
+    """
+    stat = os.stat(filename)
+    return os.path.abspath(filename), stat.st_size, stat.st_mtime_ns
+
+
+def unique_names(header):
+    """ Renames the duplicates in a CSV header the way the loader does: like
+        pandas, repeats of a name get a ".1", ".2", ... suffix.
+
+        Parameters
+        ----------
+        header : list[str]
+            The column names in the header.
+
+        Returns
+        -------
+        list[str]
+            The names of the loaded columns, in the same order.
+    """
+    seen = {}
+    names = []
+    for name in header:
+        if name in seen:
+            seen[name] += 1
+            name = "{}.{}".format(name, seen[name])
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def _csv_columns(csv_filename):
+    # pandas takes the column names from the first row, so do the same.
+    with open(csv_filename, "r", newline="", encoding="utf-8-sig") as f:
+        return unique_names(next(csv.reader(f), []))
+
+
+def _parquet_columns(parquet_filename):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+
+    return [
+        name
+        for name in pq.read_schema(parquet_filename).names
+        # Index columns written by pandas aren't loaded as columns.
+        if not name.startswith("__index_level_")
+    ]
+
+
+def file_columns(filename):
+    """ Reads the column names of a file dataset from the CSV header or the
+        parquet footer, without loading any data.
+
+        Parameters
+        ----------
+        filename : str
+            The CSV or parquet file.
+
+        Returns
+        -------
+        list[str] or None
+            The column names, or None if they can't be determined.
+    """
+    try:
+        fingerprint = file_fingerprint(filename)
+    except OSError:
+        return None
+
+    with _SCHEMAS_LOCK:
+        if fingerprint in _SCHEMAS:
+            _SCHEMAS.move_to_end(fingerprint)
+            return _SCHEMAS[fingerprint]
+
+    try:
+        if filename.endswith("parquet"):
+            columns = _parquet_columns(filename)
+        else:
+            columns = _csv_columns(filename)
+    except (OSError, UnicodeDecodeError, csv.Error, ValueError):
+        # Anything that goes wrong here will go wrong when loading, where the
+        # error is reported properly.
+        columns = None
+
+    with _SCHEMAS_LOCK:
+        _SCHEMAS[fingerprint] = columns
+        while len(_SCHEMAS) > SCHEMA_CACHE_SIZE:
+            _SCHEMAS.popitem(last=False)
+
+    return columns
+
+
+def plot_fields(svl_plot):
+    """ Lists the fields the plot refers to directly. TRANSFORM expressions
+        aren't included.
+
+        Parameters
+        ----------
+        svl_plot : dict
+            The SVL plot specifier.
+
+        Returns
+        -------
+        list[Tuple[str, str]]
+            The axis and field name for each field.
+    """
+    return [
+        (axis, svl_plot[axis]["field"])
+        for axis in FIELD_AXES
+        if axis in svl_plot and "field" in svl_plot[axis]
+    ]
+
+
+def missing_fields(svl_plot, columns):
+    """ Finds the fields the plot refers to that aren't in the columns of its
+        dataset. Like SQLite, field names are compared case insensitively.
+
+        Parameters
+        ----------
+        svl_plot : dict
+            The SVL plot specifier.
+        columns : list[str]
+            The columns of the plot's dataset.
+
+        Returns
+        -------
+        list[Tuple[str, str]]
+            The axis and field name for each missing field.
+    """
+    known_columns = {column.lower() for column in columns}
+    return [
+        (axis, field)
+        for axis, field in plot_fields(svl_plot)
+        if field.lower() not in known_columns
+    ]
@@ -1,12 +1,91 @@
-try:
-    import pandas as pd
+import csv
+import importlib.util
+import io
+import itertools
+import os
+import re
+import sqlite3
+import sys
+import time
 
-    PANDAS = True
-except ImportError:
-    PANDAS = False
+from collections import deque, namedtuple
 
-import sqlite3
+from svl.compiler.dataset_graph import dataset_graph, load_order
 from svl.compiler.errors import SvlNumberValueError
+from svl.compiler.logical_plan import optimize, plot_to_plan
+from svl.data_sources.schema import unique_names
+
+PYARROW = importlib.util.find_spec("pyarrow") is not None
+# Files are parsed in a pool of spawned processes when more than one is asked
+# for, which takes the mp_context of a ProcessPoolExecutor (Python 3.7 and
+# up). Otherwise they're parsed in the calling process.
+PROCESS_POOLS = sys.version_info >= (3, 7)
+
+# The number of rows of a file the column types (and the size of a row) are
+# inferred from, and the number inserted at a time by default.
+LOAD_SAMPLE_ROWS = 1000
+LOAD_BATCH_ROWS = 1000
+
+# The number of batches of rows read ahead of the database while loading.
+LOAD_QUEUE_BATCHES = 8
+
+# Files parsed by a pool of processes are split into CSV ranges of at most
+# CSV_RANGE_BYTES and parquet row groups. The CSV record boundaries are found
+# reading CSV_SCAN_BYTES at a time.
+CSV_RANGE_BYTES = 8 * 1024 * 1024
+CSV_SCAN_BYTES = 1024 * 1024
+
+# The record appended to each range of a CSV parsed in parallel, which only
+# parses as a row of its own if the range ends at the end of a record.
+CSV_RANGE_SENTINEL = "svl-range-end"
+
+# The CSV values read as NULL - pandas' defaults.
+CSV_NULL_VALUES = {
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+}
+BOOLEAN_VALUES = {"true": 1, "false": 0}
+INTEGER_PATTERN = re.compile(r"\s*[-+]?\d+\s*")
+
+# The columns of a file dataset as (name, SQLite type) pairs, and an iterator
+# over its rows in lists of at most a batch's worth.
+FileBatches = namedtuple("FileBatches", ["columns", "batches"])
+
+# The columns of a CSV dataset parsed in parallel, and an iterator over the
+# database files each range of it is loaded into.
+FileParts = namedtuple("FileParts", ["columns", "parts"])
+
+# Where the rows of a CSV start, how to convert them and how many to insert
+# at a time.
+CsvLayout = namedtuple(
+    "CsvLayout",
+    ["header_end", "indices", "types", "width", "columns", "batch_rows"],
+)
+
+
+class CsvRangeError(ValueError):
+    """ Raised when a range of a CSV split by csv_byte_ranges doesn't end at
+        the end of a record, which a stray quote in an unquoted value can
+        do. The file has to be parsed in one go instead.
+    """
+
 
 TEMPORAL_CONVERTERS = {
     "YEAR": "STRFTIME('%Y', {})",
@@ -18,49 +97,1119 @@ TEMPORAL_CONVERTERS = {
 }
 
 
-def _csv_to_sqlite_pandas(csv_filename, table_name, conn):
-    """ Loads an SVL dataset from CSV to SQLite using pandas.
+def _quote(identifier):
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def _infer_type(values):
+    """ Infers the SQLite type of a CSV column from a sample of its values:
+        INTEGER, REAL, BOOLEAN (stored as integers) or TEXT. Columns with no
+        values are REAL, as pandas makes them.
+    """
+    values = [value for value in values if value not in CSV_NULL_VALUES]
+    if all(INTEGER_PATTERN.fullmatch(value) for value in values) and values:
+        return "INTEGER"
+    try:
+        for value in values:
+            float(value)
+        return "REAL"
+    except ValueError:
+        pass
+    if all(value.lower() in BOOLEAN_VALUES for value in values):
+        return "BOOLEAN"
+    return "TEXT"
+
+
+def _row_converter(indices, types, width):
+    """ Builds the function turning a CSV row into the values to insert.
+
+        Numbers are inserted as text and converted by the column's type
+        affinity, which is quicker than converting them here.
+    """
+    booleans = [
+        position
+        for position, column_type in enumerate(types)
+        if column_type == "BOOLEAN"
+    ]
+    all_columns = indices == list(range(width))
+
+    def convert(row):
+        if len(row) < width:
+            row = row + [""] * (width - len(row))
+        values = (
+            [None if value in CSV_NULL_VALUES else value for value in row]
+            if all_columns
+            else [
+                None if row[ii] in CSV_NULL_VALUES else row[ii]
+                for ii in indices
+            ]
+        )
+        for position in booleans:
+            value = values[position]
+            if value is not None:
+                values[position] = BOOLEAN_VALUES.get(value.lower(), value)
+        return values
+
+    return convert
+
+
+def _row_size(row):
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+
+
+def _batch_rows(sample, chunk_rows=None, memory_budget=None):
+    """ Works out how many rows to load at a time: chunk_rows if it's given,
+        otherwise as many rows like the sample as fit in the memory budget
+        (in bytes), otherwise LOAD_BATCH_ROWS.
+    """
+    if chunk_rows is not None:
+        return chunk_rows
+    if memory_budget is not None and sample:
+        row_size = sum(_row_size(row) for row in sample) / len(sample)
+        return max(1, int(memory_budget // row_size))
+    return LOAD_BATCH_ROWS
+
+
+def _record_ends(f, targets):
+    """ Finds the end of the CSV record each of the targets (ascending byte
+        offsets from the current position of the binary file, which has to
+        be at the start of a record) is in: the byte after the first newline
+        at or after it that isn't inside quotes.
+
+        A newline is inside quotes if an odd number of quotes come before
+        it, since a quote in a quoted value is doubled. Counting them is
+        much quicker than parsing the CSV.
+    """
+    ends = []
+    quotes = 0
+    offset = f.tell()
+    block = f.read(CSV_SCAN_BYTES)
+    while block and len(ends) < len(targets):
+        start = 0
+        while len(ends) < len(targets):
+            if ends and ends[-1] >= targets[len(ends)]:
+                ends.append(ends[-1])
+                continue
+            target = max(targets[len(ends)] - offset, start)
+            newline = block.find(b"\n", target) if target < len(block) else -1
+            if newline < 0:
+                break
+            quotes += block.count(b'"', start, newline)
+            start = newline + 1
+            if quotes % 2 == 0:
+                ends.append(offset + start)
+        quotes += block.count(b'"', start)
+        offset += len(block)
+        block = f.read(CSV_SCAN_BYTES)
+
+    # The targets past the last record end at the end of the file.
+    return ends + [offset] * (len(targets) - len(ends))
+
+
+def csv_byte_ranges(csv_filename, start, range_bytes):
+    """ Splits a CSV file into ranges of bytes of whole records.
+
+        Quoted values with newlines in them are kept whole, as long as
+        quotes only appear around values (and doubled in them), as the csv
+        module writes them. A stray quote in an unquoted value can split a
+        record, which parsing the range raises a CsvRangeError for.
+
+        Parameters
+        ----------
+        csv_filename : str
+            The name of the CSV file.
+
+        start : int
+            The byte offset of the first record to split from, like the
+            first one after the header.
+
+        range_bytes : int
+            The number of bytes each range should have. Ranges end at the
+            end of the record this many bytes in.
+
+        Returns
+        -------
+        list[tuple[int, int]]
+            The start and end byte offsets of each range.
+    """
+    with open(csv_filename, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(start)
+        ends = _record_ends(
+            f, list(range(start + range_bytes, size, range_bytes))
+        )
+    offsets = [start] + ends + [size]
+    return [
+        (range_start, range_end)
+        for range_start, range_end in zip(offsets, offsets[1:])
+        if range_end > range_start
+    ]
+
+
+def _range_rows(text):
+    """ Parses the CSV rows of a range, checking that it ends at the end of
+        a record: the sentinel record after it would be read into a quoted
+        value otherwise.
+
+        Ranges only end at a record csv_byte_ranges thinks is whole, so with
+        each range starting where the one before ended (the first at the
+        start of a record), checking the ends checks the starts too.
+    """
+    if not text.endswith("\n"):
+        # Only the last range can, and it ends where the file does.
+        yield from csv.reader(io.StringIO(text, newline=""))
+        return
+
+    last = None
+    for row in csv.reader(
+        io.StringIO(text + CSV_RANGE_SENTINEL + "\n", newline="")
+    ):
+        if last is not None:
+            yield last
+        last = row
+    if last != [CSV_RANGE_SENTINEL]:
+        raise CsvRangeError("A range of the CSV ends inside a quoted value.")
+
+
+def _csv_rows(csv_filename, start, end=None):
+    # Reads the CSV rows between two byte offsets at the start of records.
+    with open(csv_filename, "rb") as f:
+        f.seek(start)
+        if end is None:
+            yield from csv.reader(
+                io.TextIOWrapper(f, encoding="utf-8", newline="")
+            )
+            return
+        text = f.read(end - start).decode("utf-8")
+    yield from _range_rows(text)
+
+
+def _csv_layout(
+    csv_filename, columns=None, chunk_rows=None, memory_budget=None
+):
+    """ Reads the header and the first LOAD_SAMPLE_ROWS rows of a CSV, to
+        work out where its rows start and the types of its columns.
+    """
+    with open(csv_filename, "rb") as f:
+        (header_end,) = _record_ends(f, [0])
+        f.seek(0)
+        header = next(
+            csv.reader(
+                io.StringIO(
+                    f.read(header_end).decode("utf-8-sig"), newline=""
+                )
+            ),
+            None,
+        )
+    if not header:
+        raise ValueError("No columns in {}.".format(csv_filename))
+    sample = list(
+        itertools.islice(_csv_rows(csv_filename, header_end), LOAD_SAMPLE_ROWS)
+    )
+
+    names = unique_names(header)
+    indices = (
+        list(range(len(names)))
+        if columns is None
+        else [names.index(column) for column in columns]
+    )
+    types = [
+        _infer_type([row[ii] for row in sample if ii < len(row)])
+        for ii in indices
+    ]
+    convert = _row_converter(indices, types, len(names))
+    return CsvLayout(
+        header_end=header_end,
+        indices=indices,
+        types=types,
+        width=len(names),
+        columns=[
+            (
+                names[ii],
+                "INTEGER" if column_type == "BOOLEAN" else column_type,
+            )
+            for ii, column_type in zip(indices, types)
+        ],
+        batch_rows=_batch_rows(
+            [convert(row) for row in sample], chunk_rows, memory_budget
+        ),
+    )
+
+
+def _csv_range_batches(csv_filename, layout, start, end=None):
+    convert = _row_converter(layout.indices, layout.types, layout.width)
+    rows = _csv_rows(csv_filename, start, end)
+    while True:
+        batch = [
+            convert(row) for row in itertools.islice(rows, layout.batch_rows)
+        ]
+        if not batch:
+            return
+        yield batch
+
+
+def csv_batches(
+    csv_filename, columns=None, chunk_rows=None, memory_budget=None
+):
+    """ Opens a CSV dataset for loading in batches, without pandas.
+
+        The column types are inferred from the first LOAD_SAMPLE_ROWS rows.
+        The rows are only read as the batches are.
+
+        Parameters
+        ----------
+        csv_filename : str
+            The name of the CSV file with the data.
+
+        columns : list[str]
+            The columns to load, in file order. Default: all of them.
+
+        chunk_rows : int
+            The number of rows in a batch.
+
+        memory_budget : int
+            The number of bytes a batch may take up, if chunk_rows isn't
+            given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        Returns
+        -------
+        FileBatches
+            The columns and the batches of rows.
+    """
+    layout = _csv_layout(csv_filename, columns, chunk_rows, memory_budget)
+    return FileBatches(
+        columns=layout.columns,
+        batches=_csv_range_batches(
+            csv_filename, layout, layout.header_end
+        ),
+    )
+
+
+def _load_csv_range(
+    csv_filename, layout, start, end, predicate, alias, database
+):
+    """ Loads the CSV rows in a range of bytes into the "data" table of a new
+        database file. This runs in a worker process.
+    """
+    conn = sqlite3.connect(database)
+    try:
+        # The file is thrown away as soon as it's merged, so don't bother
+        # making it durable.
+        conn.execute("PRAGMA journal_mode = OFF;")
+        conn.execute("PRAGMA synchronous = OFF;")
+        write_batches(
+            conn,
+            "data",
+            FileBatches(
+                columns=layout.columns,
+                batches=_csv_range_batches(csv_filename, layout, start, end),
+            ),
+            predicate,
+            alias,
+        )
+    finally:
+        conn.close()
+    return database
+
+
+def load_processes(processes=None):
+    """ Works out how many processes to parse files with.
+
+        A pool of processes is only used when it's asked for: its processes
+        are spawned, which re-imports the caller's main module, and a script
+        without an ``if __name__ == "__main__":`` guard can't take that.
+
+        Parameters
+        ----------
+        processes : int
+            The number of processes asked for. Default: just the calling
+            process.
+
+        Returns
+        -------
+        int
+            The number of processes. 1 means the files are parsed in the
+            calling process, which they always are without PROCESS_POOLS.
+    """
+    if not PROCESS_POOLS or processes is None:
+        return 1
+    return max(processes, 1)
+
+
+def process_pool(processes):
+    """ Creates the pool of processes files are parsed in.
+
+        The processes are spawned rather than forked: files are read in
+        threads, and forking a process with threads running can deadlock.
+
+        Parameters
+        ----------
+        processes : int
+            The number of processes.
+
+        Returns
+        -------
+        concurrent.futures.ProcessPoolExecutor
+            The pool.
+    """
+    # These are imported here rather than with the module, since they take
+    # longer to import than the rest of svl and only load_workers uses them.
+    import multiprocessing
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    )
+
+
+def _load_parts(executor, processes, directory, loads):
+    """ Runs the loads (functions and their arguments, less the name of the
+        database file to load into) in the pool, at most two per process
+        ahead of the ones taken, and yields the database files in order.
+    """
+    import tempfile
+
+    pending = deque()
+    try:
+        for function, args in loads:
+            fd, database = tempfile.mkstemp(suffix=".db", dir=directory)
+            os.close(fd)
+            pending.append(executor.submit(function, *args, database))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def csv_parts(
+    csv_filename,
+    directory,
+    executor,
+    columns=None,
+    predicate=None,
+    processes=None,
+    chunk_rows=None,
+    memory_budget=None,
+    alias=None,
+):
+    """ Parses a CSV dataset in parallel, in a pool of processes.
+
+        The file is split into ranges of whole records, of at most
+        CSV_RANGE_BYTES bytes, and each process loads a range at a time into
+        a database file of its own, which only takes the file name to hand
+        back. The parts are made at most two per process ahead of the ones
+        merged.
 
         Parameters
-        -----------
+        ----------
         csv_filename : str
             The name of the CSV file with the data.
+
+        directory : str
+            The directory to make the database files in.
+
+        executor : concurrent.futures.ProcessPoolExecutor
+            The pool of processes, as created by process_pool.
+
+        columns : list[str]
+            The columns to load, in file order. Default: all of them.
+
+        predicate : str
+            A SQL predicate the rows have to match to be loaded. Default:
+            load all the rows.
+
+        processes : int
+            The number of processes in the pool. Default: one per CPU.
+
+        chunk_rows : int
+            The number of rows each process inserts at a time.
+
+        memory_budget : int
+            The number of bytes a batch of rows may take up in each process,
+            if chunk_rows isn't given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        alias : str
+            The name the predicate can qualify the columns with, like the
+            name of the dataset. Default: the name of the parts' table.
+
+        Returns
+        -------
+        FileParts
+            The columns, and the names of the database files with the rows
+            of each range in a "data" table, in file order. Each file is
+            deleted once it's merged with merge_part. Iterating over them
+            raises a CsvRangeError if the ranges don't split the file into
+            whole records.
+    """
+    processes = processes or os.cpu_count() or 1
+    layout = _csv_layout(csv_filename, columns, chunk_rows, memory_budget)
+    body_bytes = os.path.getsize(csv_filename) - layout.header_end
+    ranges = csv_byte_ranges(
+        csv_filename,
+        layout.header_end,
+        max(1, min(CSV_RANGE_BYTES, -(-body_bytes // processes))),
+    )
+
+    return FileParts(
+        columns=layout.columns,
+        parts=_load_parts(
+            executor,
+            processes,
+            directory,
+            (
+                (
+                    _load_csv_range,
+                    (csv_filename, layout, start, end, predicate, alias),
+                )
+                for start, end in ranges
+            ),
+        ),
+    )
+
+
+def merge_part(conn, table_name, database):
+    """ Appends the rows of a database file made by csv_parts or
+        parquet_parts to a table, then deletes the file.
+
+        Parameters
+        ----------
+        conn : sqlite3.Connection
+            The connection to the sqlite database.
+
         table_name : str
-            The name of the table to output.
+            The name of the table to append to.
+
+        database : str
+            The name of the database file.
     """
-    pd.read_csv(csv_filename).to_sql(table_name, conn, index=False)
+    # A database can't be attached in a transaction.
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS svl_part;", (database,))
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO {} SELECT * FROM svl_part.data;".format(
+                    _quote(table_name)
+                )
+            )
+    finally:
+        conn.execute("DETACH DATABASE svl_part;")
+        os.remove(database)
 
 
-def _parquet_to_sqlite_pandas(parquet_filename, table_name, conn):
-    """ Loads an SVL dataset from parquet to SQLite using pandas.
+def _is_arrow_type(name, arrow_type):
+    """ Checks the arrow type with the pyarrow.types function of the name,
+        which is false if this pyarrow doesn't have it (the large types only
+        came in with pyarrow 0.15).
+    """
+    import pyarrow.types as pat
+
+    is_type = getattr(pat, name, None)
+    return is_type is not None and is_type(arrow_type)
+
+
+def _arrow_sql_type(arrow_type):
+    import pyarrow.types as pat
+
+    if pat.is_integer(arrow_type) or pat.is_boolean(arrow_type):
+        return "INTEGER"
+    elif pat.is_floating(arrow_type) or pat.is_decimal(arrow_type):
+        return "REAL"
+    elif pat.is_timestamp(arrow_type):
+        # What pandas declares them as.
+        return "TIMESTAMP"
+    elif pat.is_date(arrow_type):
+        return "DATE"
+    elif pat.is_binary(arrow_type) or _is_arrow_type(
+        "is_large_binary", arrow_type
+    ):
+        return "BLOB"
+    return "TEXT"
+
+
+def _arrow_converter(arrow_type):
+    """ Builds the function turning a column of a record batch into the
+        values to insert.
+    """
+    import pyarrow.types as pat
+
+    if pat.is_timestamp(arrow_type):
+        return lambda values: [
+            None if value is None else value.isoformat(" ")
+            for value in values.to_pylist()
+        ]
+    elif pat.is_date(arrow_type):
+        return lambda values: [
+            None if value is None else value.isoformat()
+            for value in values.to_pylist()
+        ]
+    elif pat.is_decimal(arrow_type):
+        return lambda values: [
+            None if value is None else float(value)
+            for value in values.to_pylist()
+        ]
+    elif _arrow_sql_type(arrow_type) == "TEXT" and not (
+        pat.is_string(arrow_type)
+        or _is_arrow_type("is_large_string", arrow_type)
+    ):
+        return lambda values: [
+            None if value is None else str(value)
+            for value in values.to_pylist()
+        ]
+    return lambda values: values.to_pylist()
+
+
+def _parquet_schema(parquet_filename, columns=None):
+    # The columns to load (all of them by default) and their arrow types.
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(parquet_filename)
+    if columns is None:
+        # Index columns written by pandas aren't loaded as columns.
+        columns = [
+            name
+            for name in schema.names
+            if not name.startswith("__index_level_")
+        ]
+    types = dict(zip(schema.names, schema.types))
+    return columns, [types[name] for name in columns]
+
+
+def parquet_batches(
+    parquet_filename,
+    columns=None,
+    chunk_rows=None,
+    memory_budget=None,
+    row_groups=None,
+):
+    """ Opens a parquet dataset for loading in batches, a row group at a
+        time. Needs pyarrow.
 
         Parameters
         ----------
         parquet_filename : str
             The name of the parquet file with the data.
-        table_name : str
-            The name of the table to output.
+
+        columns : list[str]
+            The columns to load, in file order. Default: all of them.
+
+        chunk_rows : int
+            The number of rows in a batch.
+
+        memory_budget : int
+            The number of bytes a batch may take up, if chunk_rows isn't
+            given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        row_groups : list[int]
+            The row groups to load. Default: all of them.
+
+        Returns
+        -------
+        FileBatches
+            The columns and the batches of rows.
+    """
+    import pyarrow.parquet as pq
+
+    columns, arrow_types = _parquet_schema(parquet_filename, columns)
+    converters = [_arrow_converter(arrow_type) for arrow_type in arrow_types]
+
+    def rows(record_batch):
+        return list(
+            zip(
+                *[
+                    convert(values)
+                    for convert, values in zip(
+                        converters, record_batch.columns
+                    )
+                ]
+            )
+        )
+
+    parquet_file = pq.ParquetFile(parquet_filename)
+    sample = (
+        parquet_file.read_row_group(0, columns=columns)
+        .slice(0, LOAD_SAMPLE_ROWS)
+        .to_batches()
+        if parquet_file.num_row_groups > 0
+        else []
+    )
+    batch_rows = _batch_rows(
+        [row for record_batch in sample for row in rows(record_batch)],
+        chunk_rows,
+        memory_budget,
+    )
+
+    def batches():
+        # Only one row group is read at a time, as the batches are.
+        for ii in (
+            range(parquet_file.num_row_groups)
+            if row_groups is None
+            else row_groups
+        ):
+            row_group = parquet_file.read_row_group(ii, columns=columns)
+            for record_batch in row_group.to_batches(batch_rows):
+                yield rows(record_batch)
+
+    return FileBatches(
+        columns=[
+            (name, _arrow_sql_type(arrow_type))
+            for name, arrow_type in zip(columns, arrow_types)
+        ],
+        batches=batches(),
+    )
+
+
+def _load_parquet_row_group(
+    parquet_filename,
+    columns,
+    row_group,
+    chunk_rows,
+    memory_budget,
+    predicate,
+    alias,
+    database,
+):
+    """ Loads a row group of a parquet file into the "data" table of a new
+        database file. This runs in a worker process.
+    """
+    conn = sqlite3.connect(database)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF;")
+        conn.execute("PRAGMA synchronous = OFF;")
+        write_batches(
+            conn,
+            "data",
+            parquet_batches(
+                parquet_filename,
+                columns,
+                chunk_rows,
+                memory_budget,
+                row_groups=[row_group],
+            ),
+            predicate,
+            alias,
+        )
+    finally:
+        conn.close()
+    return database
+
+
+def parquet_parts(
+    parquet_filename,
+    directory,
+    executor,
+    columns=None,
+    predicate=None,
+    processes=None,
+    chunk_rows=None,
+    memory_budget=None,
+    alias=None,
+):
+    """ Reads a parquet dataset in parallel, a row group per process at a
+        time, into database files like csv_parts. Needs pyarrow.
+
+        Parameters
+        ----------
+        parquet_filename : str
+            The name of the parquet file with the data.
+
+        directory : str
+            The directory to make the database files in.
+
+        executor : concurrent.futures.ProcessPoolExecutor
+            The pool of processes, as created by process_pool.
+
+        columns : list[str]
+            The columns to load, in file order. Default: all of them.
+
+        predicate : str
+            A SQL predicate the rows have to match to be loaded. Default:
+            load all the rows.
+
+        processes : int
+            The number of processes in the pool. Default: one per CPU.
+
+        chunk_rows : int
+            The number of rows each process inserts at a time.
+
+        memory_budget : int
+            The number of bytes a batch of rows may take up in each process,
+            if chunk_rows isn't given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        alias : str
+            The name the predicate can qualify the columns with, like the
+            name of the dataset. Default: the name of the parts' table.
+
+        Returns
+        -------
+        FileParts
+            The columns, and the names of the database files with the rows
+            of each row group in a "data" table, in file order.
     """
-    pd.read_parquet(parquet_filename).to_sql(table_name, conn, index=False)
+    import pyarrow.parquet as pq
+
+    processes = processes or os.cpu_count() or 1
+    columns, arrow_types = _parquet_schema(parquet_filename, columns)
+
+    return FileParts(
+        columns=[
+            (name, _arrow_sql_type(arrow_type))
+            for name, arrow_type in zip(columns, arrow_types)
+        ],
+        parts=_load_parts(
+            executor,
+            processes,
+            directory,
+            (
+                (
+                    _load_parquet_row_group,
+                    (
+                        parquet_filename,
+                        columns,
+                        row_group,
+                        chunk_rows,
+                        memory_budget,
+                        predicate,
+                        alias,
+                    ),
+                )
+                for row_group in range(
+                    pq.ParquetFile(parquet_filename).num_row_groups
+                )
+            ),
+        ),
+    )
+
+
+def file_batches(
+    filename, columns=None, chunk_rows=None, memory_budget=None
+):
+    """ Opens a CSV or parquet dataset for loading in batches.
+
+        Parameters
+        ----------
+        filename : str
+            The file with the data.
+
+        columns : list[str]
+            The columns to load, in file order. Default: all of them.
+
+        chunk_rows : int
+            The number of rows in a batch.
 
+        memory_budget : int
+            The number of bytes a batch may take up, if chunk_rows isn't
+            given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        Returns
+        -------
+        FileBatches
+            The columns and the batches of rows.
 
-def _get_field(svl_axis):
-    if "transform" in svl_axis:
-        return svl_axis["transform"]
-    elif "temporal" in svl_axis:
-        return TEMPORAL_CONVERTERS[svl_axis["temporal"]].format(
-            svl_axis["field"]
+        Raises
+        ------
+        NotImplementedError
+            If the file is a parquet file and pyarrow isn't installed.
+    """
+    if not filename.endswith("parquet"):
+        return csv_batches(filename, columns, chunk_rows, memory_budget)
+    elif PYARROW:
+        return parquet_batches(filename, columns, chunk_rows, memory_budget)
+    else:
+        raise NotImplementedError(
+            "Reading {} needs pyarrow to be installed.".format(filename)
         )
-    elif "field" in svl_axis:
-        return svl_axis["field"]
+
+
+def file_parts(
+    filename,
+    directory,
+    executor,
+    columns=None,
+    predicate=None,
+    processes=None,
+    chunk_rows=None,
+    memory_budget=None,
+    alias=None,
+):
+    """ Parses a CSV or parquet dataset in parallel, in a pool of processes,
+        with csv_parts or parquet_parts.
+
+        Parameters
+        ----------
+        filename : str
+            The file with the data.
+
+        directory : str
+            The directory to make the database files in.
+
+        executor : concurrent.futures.ProcessPoolExecutor
+            The pool of processes, as created by process_pool.
+
+        columns : list[str]
+            The columns to load, in file order. Default: all of them.
+
+        predicate : str
+            A SQL predicate the rows have to match to be loaded. Default:
+            load all the rows.
+
+        processes : int
+            The number of processes in the pool. Default: one per CPU.
+
+        chunk_rows : int
+            The number of rows each process inserts at a time.
+
+        memory_budget : int
+            The number of bytes a batch of rows may take up in each process,
+            if chunk_rows isn't given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        alias : str
+            The name the predicate can qualify the columns with, like the
+            name of the dataset. Default: the name of the parts' table.
+
+        Returns
+        -------
+        FileParts
+            The columns and the database files with the parts.
+
+        Raises
+        ------
+        NotImplementedError
+            If the file is a parquet file and pyarrow isn't installed.
+    """
+    if not filename.endswith("parquet"):
+        load_parts = csv_parts
+    elif PYARROW:
+        load_parts = parquet_parts
     else:
-        return "*"
+        raise NotImplementedError(
+            "Reading {} needs pyarrow to be installed.".format(filename)
+        )
+    return load_parts(
+        filename,
+        directory,
+        executor,
+        columns,
+        predicate,
+        processes,
+        chunk_rows,
+        memory_budget,
+        alias,
+    )
+
+
+def _staging_table(table_name):
+    return _quote("_svl_load_{}".format(table_name))
+
+
+def _create_load_tables(conn, table_name, columns, predicate=None):
+    """ Creates the table for a file dataset, and the temporary table its
+        batches are filtered in if it has a predicate.
+    """
+    definition = ", ".join(
+        "{} {}".format(_quote(name), column_type)
+        for name, column_type in columns
+    )
+    conn.execute(
+        "CREATE TABLE {} ({});".format(_quote(table_name), definition)
+    )
+    if predicate is not None:
+        conn.execute(
+            "CREATE TEMP TABLE {} ({});".format(
+                _staging_table(table_name), definition
+            )
+        )
+
+
+def _insert_batch(conn, table_name, batch, predicate=None, alias=None):
+    insert_into = (
+        _quote(table_name) if predicate is None else _staging_table(table_name)
+    )
+    conn.executemany(
+        "INSERT INTO {} VALUES ({});".format(
+            insert_into, ", ".join("?" * len(batch[0]))
+        ),
+        batch,
+    )
+    if predicate is not None:
+        conn.execute(
+            "INSERT INTO {} SELECT * FROM {} AS {} WHERE {};".format(
+                _quote(table_name),
+                insert_into,
+                _quote(alias or table_name),
+                predicate,
+            )
+        )
+        conn.execute("DELETE FROM {};".format(insert_into))
+
+
+def _drop_load_tables(conn, table_name, predicate=None):
+    if predicate is not None:
+        conn.execute(
+            "DROP TABLE IF EXISTS temp.{};".format(_staging_table(table_name))
+        )
+
+
+def write_batches(conn, table_name, batches, predicate=None, alias=None):
+    """ Creates a table and inserts the batches of rows into it, in a single
+        transaction, so only a batch of rows is in memory at a time.
+
+        Parameters
+        ----------
+        conn : sqlite3.Connection
+            The connection to the sqlite database.
+
+        table_name : str
+            The name of the table to output.
+
+        batches : FileBatches
+            The columns and the batches of rows.
+
+        predicate : str
+            A SQL predicate the rows have to match to be inserted. Each
+            batch is filtered in a temporary table before it's inserted.
+            Default: insert all the rows.
+
+        alias : str
+            The name the predicate can qualify the columns with, like the
+            name of the dataset the rows are a part of. Default: table_name.
+    """
+    _create_load_tables(conn, table_name, batches.columns, predicate)
+    try:
+        with conn:
+            for batch in batches.batches:
+                _insert_batch(conn, table_name, batch, predicate, alias)
+    finally:
+        _drop_load_tables(conn, table_name, predicate)
+
+
+def write_parts(conn, table_name, parts):
+    """ Creates a table and merges the parts of a CSV parsed in parallel into
+        it, in file order.
+
+        Parameters
+        ----------
+        conn : sqlite3.Connection
+            The connection to the sqlite database.
+
+        table_name : str
+            The name of the table to output.
+
+        parts : FileParts
+            The columns and the database files with the parts, as returned
+            by csv_parts.
+    """
+    _create_load_tables(conn, table_name, parts.columns)
+    for database in parts.parts:
+        merge_part(conn, table_name, database)
+
+
+def csv_to_sqlite(
+    csv_filename,
+    table_name,
+    conn,
+    columns=None,
+    predicate=None,
+    chunk_rows=None,
+    memory_budget=None,
+    processes=None,
+):
+    """ Streams an SVL dataset from CSV to SQLite, without pandas.
+
+        The column types are inferred from the first LOAD_SAMPLE_ROWS rows,
+        then the rows are inserted a batch at a time in a single
+        transaction, so only a batch of rows is ever in memory. Big files
+        are parsed by a pool of processes instead, with csv_parts.
+
+        Parameters
+        ----------
+        csv_filename : str
+            The name of the CSV file with the data.
+
+        table_name : str
+            The name of the table to output.
+
+        conn : sqlite3.Connection
+            The connection to the sqlite database.
+
+        columns : list[str]
+            The columns to load, in file order. Default: all of them.
+
+        predicate : str
+            A SQL predicate the rows have to match to be loaded. Each batch
+            is filtered in a temporary table before it's inserted. Default:
+            load all the rows.
+
+        chunk_rows : int
+            The number of rows in a batch.
+
+        memory_budget : int
+            The number of bytes a batch may take up, if chunk_rows isn't
+            given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        processes : int
+            The number of processes parsing the file. Default: the file is
+            parsed in the calling process (as it is if it can't be split
+            into ranges of whole records, or the pool breaks).
+    """
+    processes = load_processes(processes)
+    if processes > 1:
+        import tempfile
+
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            with tempfile.TemporaryDirectory() as directory, process_pool(
+                processes
+            ) as executor:
+                write_parts(
+                    conn,
+                    table_name,
+                    csv_parts(
+                        csv_filename,
+                        directory,
+                        executor,
+                        columns,
+                        predicate,
+                        processes,
+                        chunk_rows,
+                        memory_budget,
+                        table_name,
+                    ),
+                )
+            return
+        except (CsvRangeError, BrokenProcessPool):
+            # Throw away the parts merged so far and parse it in one go.
+            conn.commit()
+            conn.execute(
+                "DROP TABLE IF EXISTS {};".format(_quote(table_name))
+            )
 
+    write_batches(
+        conn,
+        table_name,
+        csv_batches(csv_filename, columns, chunk_rows, memory_budget),
+        predicate,
+    )
 
-def file_to_sqlite(filename, table_name, conn):
+
+def file_to_sqlite(
+    filename,
+    table_name,
+    conn,
+    chunk_rows=None,
+    memory_budget=None,
+    processes=None,
+):
     """ Loads SVL dataset from a file to SQLite.
 
-        Uses pandas if available.
+        The file is streamed in a batch of rows at a time, a row group at a
+        time for parquet files, which need pyarrow. Big CSVs are parsed in
+        parallel.
 
         Parameters
         ----------
@@ -73,14 +1222,35 @@ def file_to_sqlite(filename, table_name, conn):
         conn : sqlite3.Connection
             The connection to the sqlite database.
 
+        chunk_rows : int
+            The number of rows in a batch.
+
+        memory_budget : int
+            The number of bytes a batch may take up, if chunk_rows isn't
+            given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        processes : int
+            The number of processes parsing a CSV. Default: the file is
+            parsed in the calling process.
+
     """
-    if PANDAS:
-        if filename.endswith("parquet"):
-            return _parquet_to_sqlite_pandas(filename, table_name, conn)
-        else:
-            return _csv_to_sqlite_pandas(filename, table_name, conn)
+    if filename.endswith("parquet"):
+        write_batches(
+            conn,
+            table_name,
+            file_batches(
+                filename, chunk_rows=chunk_rows, memory_budget=memory_budget
+            ),
+        )
     else:
-        raise NotImplementedError("Haven't implement non-pandas csv->sqlite.")
+        csv_to_sqlite(
+            filename,
+            table_name,
+            conn,
+            chunk_rows=chunk_rows,
+            memory_budget=memory_budget,
+            processes=processes,
+        )
 
 
 def sqlite_table(sql_statement, table_name, conn):
@@ -100,241 +1270,480 @@ def sqlite_table(sql_statement, table_name, conn):
     conn.execute("CREATE TABLE {} AS {};".format(table_name, sql_statement))
 
 
-def create_datasets(svl_datasets):
-    """ Creates the SVL datasets.
+def materialize_scan(name, query, conn):
+    """ Materializes a scan shared by several plots into a temporary table,
+        replacing any previous one with the same name.
 
         Parameters
         ----------
-        svl_datasets : dict
-            The SVL dataset specifier.
+        name : str
+            The name of the temporary table.
+
+        query : str
+            The query for the scan.
 
-        Returns
-        -------
         conn : sqlite3.Connection
-            The connection to the sqlite3 database.
+            The connection to the sqlite database.
     """
-    conn = sqlite3.connect(":memory:")
-    files = list(
-        filter(lambda items: "file" in items[1], svl_datasets.items())
-    )
-    queries = list(
-        filter(lambda items: "sql" in items[1], svl_datasets.items())
-    )
+    drop_scan(name, conn)
+    conn.execute("CREATE TEMP TABLE {} AS {};".format(name, query))
 
-    # Do the files first.
-    for table_name, table_spec in files:
-        file_to_sqlite(table_spec["file"], table_name, conn)
 
-    # Now do the queries.
-    for table_name, table_spec in queries:
-        sqlite_table(table_spec["sql"], table_name, conn)
+def drop_scan(name, conn):
+    """ Drops the temporary table of a materialized scan.
 
-    return conn
+        Parameters
+        ----------
+        name : str
+            The name of the temporary table.
 
+        conn : sqlite3.Connection
+            The connection to the sqlite database.
+    """
+    conn.execute("DROP TABLE IF EXISTS temp.{};".format(name))
 
-def svl_to_sql_hist(svl_plot):
-    """ Constructs a SQL query for histogram plots.
 
-        Parameters
-        -----------
-        svl_plot : dict
-            The SVL plot definition.
+def create_database():
+    """ Creates the in-memory database the SVL datasets are loaded into.
 
         Returns
         -------
-        str
-            The SQL query for the dataset required for the plot.
+        conn : sqlite3.Connection
+            The connection to the sqlite3 database.
     """
-    select_fields = []
-
-    for axis in ["x", "y", "split_by"]:
-        # Skip if the axis isn't in the plot.
-        if axis not in svl_plot:
-            continue
-
-        field = _get_field(svl_plot[axis])
-        select_fields.append("{} AS {}".format(field, axis))
-
-    query = "SELECT {} FROM {}".format(
-        ", ".join(select_fields), svl_plot["data"]
-    )
-
-    if "filter" in svl_plot:
-        query = "{} WHERE {}".format(query, svl_plot["filter"])
+    conn = sqlite3.connect(":memory:")
+    # The database is in memory, so keep shared scans there too.
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    return conn
 
-    return query
 
+def _timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def _read_batches(
+    name,
+    spec,
+    loading,
+    stop,
+    directory,
+    executor,
+    processes,
+    chunk_rows,
+    memory_budget,
+):
+    """ Reads a file dataset onto the loading queue: its columns and the
+        predicate to filter its batches with, then its batches of rows (or
+        the parts of it parsed in the pool of processes, already filtered),
+        then that it's done (or the error reading it). Gives up as soon as
+        stop is set.
+
+        A CSV that can't be split into ranges of whole records, or a file
+        whose parts the pool can't parse because it broke (a process died),
+        is reset (with the predicate to filter its batches with from then
+        on) and read in batches after all.
+    """
 
-def svl_to_sql_pie(svl_plot):
-    """ Constructs a SQL query for pie charts.
+    import queue
+
+    def put(message):
+        while not stop.is_set():
+            try:
+                loading.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    start = time.perf_counter()
+    items = iter([])
+    in_parts = executor is not None
+    try:
+        if in_parts:
+            from concurrent.futures.process import BrokenProcessPool
+
+            parts = file_parts(
+                spec["file"],
+                directory,
+                executor,
+                spec.get("columns"),
+                spec.get("filter"),
+                processes,
+                chunk_rows,
+                memory_budget,
+                name,
+            )
+            if not put((name, "columns", (parts.columns, None, start))):
+                return
+            items = parts.parts
+            try:
+                for item in items:
+                    if not put((name, "part", item)):
+                        return
+                put((name, "done", None))
+                return
+            except (CsvRangeError, BrokenProcessPool):
+                items.close()
+                if not put((name, "reset", spec.get("filter"))):
+                    return
+
+        batches = file_batches(
+            spec["file"], spec.get("columns"), chunk_rows, memory_budget
+        )
+        if not in_parts and not put(
+            (name, "columns", (batches.columns, spec.get("filter"), start))
+        ):
+            return
+        items = batches.batches
+        for item in items:
+            if not put((name, "batch", item)):
+                return
+    except Exception as e:
+        put((name, "error", e))
+        return
+    finally:
+        # Cancels the parts of the file not parsed yet.
+        if hasattr(items, "close"):
+            items.close()
+    put((name, "done", None))
+
+
+def _write_loading(conn, loading, files):
+    """ Writes what the files' threads put on the loading queue to the
+        database, yielding each file's name and the time it took once it's
+        loaded.
+    """
+    starts = {}
+    columns = {}
+    predicates = {}
+    loaded = 0
+    try:
+        while loaded < len(files):
+            name, kind, payload = loading.get()
+            if kind == "columns":
+                columns[name], predicates[name], starts[name] = payload
+                _create_load_tables(
+                    conn, name, columns[name], predicates[name]
+                )
+            elif kind == "reset":
+                # Throw away the parts merged so far.
+                conn.commit()
+                _drop_load_tables(conn, name, predicates[name])
+                conn.execute("DROP TABLE {};".format(_quote(name)))
+                predicates[name] = payload
+                _create_load_tables(conn, name, columns[name], payload)
+            elif kind == "batch":
+                _insert_batch(conn, name, payload, predicates[name])
+            elif kind == "part":
+                merge_part(conn, name, payload)
+            elif kind == "done":
+                conn.commit()
+                _drop_load_tables(conn, name, predicates[name])
+                loaded += 1
+                yield name, time.perf_counter() - starts.pop(name)
+            else:
+                raise payload
+    finally:
+        for name in starts:
+            _drop_load_tables(conn, name, predicates[name])
+
+
+def materialize_datasets(
+    svl_datasets,
+    conn,
+    workers=None,
+    chunk_rows=None,
+    memory_budget=None,
+    processes=None,
+):
+    """ Loads the SVL datasets into the database, in dependency order.
+
+        The files are read concurrently, a batch of rows at a time, and the
+        batches are written to the database as they're read. At most
+        LOAD_QUEUE_BATCHES batches are waiting to be written at any time, so
+        the memory taken up by loading doesn't grow with the size of the
+        files. With more than one process, the files are parsed by a pool of
+        them instead, in parts (ranges of a CSV, row groups of a parquet
+        file) which are merged into the database in order as they're made,
+        so independent files load at the same time. A file dataset with
+        "columns" only has those columns read, and one with a "filter" only
+        has the rows matching it written. Each SQL dataset is created as soon
+        as the datasets it refers to are there. The database itself is only
+        ever written to from the calling thread.
 
         Parameters
         ----------
-        svl_plot : dict
-            The SVL plot definition.
-
-        Returns
-        -------
-        str
-            The SQL query for the dataset required for the plot.
-    """
-    query = "SELECT {} AS label, COUNT(*) AS value FROM {}".format(
-        _get_field(svl_plot["axis"]), svl_plot["data"]
-    )
-
-    if "filter" in svl_plot:
-        query = "{} WHERE {}".format(query, svl_plot["filter"])
+        svl_datasets : dict
+            The SVL dataset specifier.
 
-    query = "{} GROUP BY {}".format(query, _get_field(svl_plot["axis"]))
+        conn : sqlite3.Connection
+            The connection to the sqlite database.
 
-    return query
+        workers : int
+            The number of threads reading files. Default: the
+            concurrent.futures default.
 
+        chunk_rows : int
+            The number of rows in a batch.
 
-def svl_to_sql_number(svl_plot):
-    """ Constructs a SQL query for number charts.
+        memory_budget : int
+            The number of bytes a batch may take up, if chunk_rows isn't
+            given. Default: LOAD_BATCH_ROWS rows a batch.
 
-    Parameters
-    ----------
-    svl_plot : dict
-        The SVL plot definition.
+        processes : int
+            The number of processes parsing the files. Default: each file is
+            parsed in the thread reading it.
 
-    Returns
-    -------
-    str
-        The SQL query for the dataset required for the plot.
+        Returns
+        -------
+        dict
+            The time in seconds each dataset took to read and write, keyed
+            by dataset name.
     """
-    if "agg" not in svl_plot["value"]:
-        query = "SELECT {} AS value FROM {}".format(
-            _get_field(svl_plot["value"]), svl_plot["data"]
-        )
-    else:
-        query = "SELECT {}({}) AS value FROM {}".format(
-            svl_plot["value"]["agg"],  # Agg function.
-            _get_field(svl_plot["value"]),  # The value or transform.
-            svl_plot["data"],  # The dataset.
+    graph = dataset_graph(svl_datasets)
+    order = load_order(graph)
+    durations = {}
+    pending = [name for name in order if "sql" in svl_datasets[name]]
+
+    def create_ready_tables():
+        for name in list(pending):
+            if all(dependency in durations for dependency in graph[name]):
+                _, durations[name] = _timed(
+                    sqlite_table, svl_datasets[name]["sql"], name, conn
+                )
+                pending.remove(name)
+
+    import queue
+    import tempfile
+    import threading
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    files = [name for name in order if "file" in svl_datasets[name]]
+    processes = load_processes(processes)
+    loading = queue.Queue(maxsize=LOAD_QUEUE_BATCHES)
+    stop = threading.Event()
+    create_ready_tables()
+    # All the files share the pool, so there are only ever processes of
+    # them parsing.
+    pool = process_pool(processes) if processes > 1 and files else None
+    try:
+        with tempfile.TemporaryDirectory() as directory, ThreadPoolExecutor(
+            max_workers=workers
+        ) as executor:
+            for name in files:
+                executor.submit(
+                    _read_batches,
+                    name,
+                    svl_datasets[name],
+                    loading,
+                    stop,
+                    directory,
+                    pool,
+                    processes,
+                    chunk_rows,
+                    memory_budget,
+                )
+            try:
+                for name, duration in _write_loading(conn, loading, files):
+                    durations[name] = duration
+                    create_ready_tables()
+            finally:
+                # Stop the other files' threads if one of them failed.
+                stop.set()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # Whatever is left is in a dependency cycle (or refers to itself), so
+    # load it in order and let SQLite complain if it has to.
+    for name in pending:
+        _, durations[name] = _timed(
+            sqlite_table, svl_datasets[name]["sql"], name, conn
         )
-    if "filter" in svl_plot:
-        query = "{} WHERE {}".format(query, svl_plot["filter"])
 
-    return query
+    return durations
 
 
-def svl_to_sql_xy(svl_plot):
-    """ Takes an SVL plot specification and produces a SQL query to retrieve
-        the data.
+def create_datasets(
+    svl_datasets,
+    workers=None,
+    chunk_rows=None,
+    memory_budget=None,
+    processes=None,
+):
+    """ Creates the SVL datasets.
 
         Parameters
         ----------
-        svl_plot : dict
-            The SVL plot specifier.
+        svl_datasets : dict
+            The SVL dataset specifier.
+
+        workers : int
+            The number of threads reading files. Default: the
+            concurrent.futures default.
+
+        chunk_rows : int
+            The number of rows of a file loaded at a time.
+
+        memory_budget : int
+            The number of bytes a batch of rows may take up while loading, if
+            chunk_rows isn't given. Default: LOAD_BATCH_ROWS rows a batch.
+
+        processes : int
+            The number of processes parsing the files. Default: they're
+            parsed in this process.
 
         Returns
         -------
-        str
-            The query to execute.
+        conn : sqlite3.Connection
+            The connection to the sqlite3 database.
     """
-    # TODO this is a very big function with a lot of redundant conditionals
-    # Step 1: Process the selects.
-
-    select_fields = []
+    conn = create_database()
+    materialize_datasets(
+        svl_datasets,
+        conn,
+        workers=workers,
+        chunk_rows=chunk_rows,
+        memory_budget=memory_budget,
+        processes=processes,
+    )
+    return conn
 
-    for axis in ["x", "y", "split_by", "color_by"]:
 
-        # Skip if the axis isn't in the plot.
-        if axis not in svl_plot:
-            continue
+def _predicate_sql(predicates):
+    if len(predicates) == 1:
+        return predicates[0]
+    return " AND ".join("({})".format(p) for p in predicates)
 
-        field = _get_field(svl_plot[axis])
 
-        if "agg" in svl_plot[axis]:
-            # NOTE: Split by axis will not take aggregations.
-            select_fields.append(
-                "{}({}) AS {}".format(svl_plot[axis]["agg"], field, axis)
-            )
-        else:
-            select_fields.append("{} AS {}".format(field, axis))
+def _expression_sql(expr):
+    if "transform" in expr:
+        sql = expr["transform"]
+    elif "bucket" in expr:
+        sql = TEMPORAL_CONVERTERS[expr["bucket"]].format(expr["field"])
+    elif "field" in expr:
+        sql = expr["field"]
+    else:
+        sql = "*"
 
-    # Step 2: Process the aggregations.
-    group_fields = []
+    if "when" in expr:
+        # Rows not matching are NULL, which aggregates skip.
+        sql = "CASE WHEN {} THEN {} END".format(
+            _predicate_sql(expr["when"]), "1" if sql == "*" else sql
+        )
 
-    group_axis = None
+    if "agg" in expr:
+        sql = "{}({})".format(expr["agg"], sql)
 
-    if "agg" in svl_plot["x"]:
-        group_axis = "y"
-    elif "agg" in svl_plot["y"]:
-        group_axis = "x"
+    return sql
 
-    if group_axis:
-        group_fields.append(_get_field(svl_plot[group_axis]))
 
-    split_by_field = "" if "split_by" not in svl_plot else "split_by"
-    # Only add the split by to the group by if there's already a group axis.
-    # Empty strings are falsey ... I mean Falsey.
-    if group_axis and split_by_field:
-        group_fields.append(_get_field(svl_plot["split_by"]))
+def logical_plan_to_sql(plan):
+    """ Lowers a logical plan to a SQLite query.
 
-    # NOTE: the color_by field cannot appear in a GROUP BY. If there's an
-    # aggregation on x or y, then there must be an aggregation on color_by.
+        Parameters
+        ----------
+        plan : dict
+            The logical plan, as built by the logical_plan module.
 
-    # Step 3: Build the query.
-    query = "SELECT {} FROM {}".format(
-        ", ".join(select_fields), svl_plot["data"]
+        Returns
+        -------
+        str
+            The query.
+    """
+    # Plans are chains, so collect the nodes by kind.
+    nodes = {}
+    node = plan
+    while True:
+        nodes[node["node"]] = node
+        if "input" not in node:
+            break
+        node = node["input"]
+
+    scan = nodes["scan"]
+    output = nodes.get("aggregate", nodes.get("project"))
+    if output:
+        select = ", ".join(
+            "{} AS {}".format(_expression_sql(column["expr"]), column["alias"])
+            for column in output["columns"]
+        )
+    else:
+        # A bare scan reads the columns it needs, or all of them.
+        select = ", ".join(scan.get("columns") or ["*"])
+        output = {}
+
+    # A scan of a shared scan keeps the dataset's name, so SQL referring to
+    # the dataset by name still works.
+    source = (
+        "{} AS {}".format(scan["source"], scan["table"])
+        if "source" in scan
+        else scan["table"]
     )
+    query = "SELECT {} FROM {}".format(select, source)
 
-    if "filter" in svl_plot:
-        query = "{} WHERE {}".format(query, svl_plot["filter"])
-
-    if group_axis:
-        query = "{} GROUP BY {}".format(query, ", ".join(group_fields))
+    predicates = scan.get("predicates", [])
+    if "filter" in nodes:
+        predicates = predicates + [nodes["filter"]["predicate"]]
+    if predicates:
+        query = "{} WHERE {}".format(query, _predicate_sql(predicates))
 
-    # If there's a SPLIT BY and a sort, make sure to sort by the split by
-    # field first, since each SPLIT BY value becomes it's own trace.
-    sort_fields = []
-    if split_by_field:
-        sort_fields.append(split_by_field)
-
-    if "sort" in svl_plot["x"]:
-        query = "{} ORDER BY {} {}".format(
-            query, ", ".join(sort_fields + ["x"]), svl_plot["x"]["sort"]
+    if output.get("groups"):
+        query = "{} GROUP BY {}".format(
+            query, ", ".join(_expression_sql(g) for g in output["groups"])
         )
-    elif "sort" in svl_plot["y"]:
+
+    if "sort" in nodes:
         query = "{} ORDER BY {} {}".format(
-            query, ", ".join(sort_fields + ["y"]), svl_plot["y"]["sort"]
+            query,
+            ", ".join(nodes["sort"]["keys"]),
+            nodes["sort"]["direction"],
         )
 
     return query
 
 
-def get_svl_data(svl_plot, conn):
-    """ Obtains the data for the provided SVL plot from the SQLite database.
+def svl_to_sql(svl_plot):
+    """ Constructs the SQL query for the SVL plot from its optimized logical
+        plan.
 
         Parameters
         ----------
         svl_plot : dict
             The SVL plot definition.
 
+        Returns
+        -------
+        str
+            The SQL query for the dataset required for the plot.
+    """
+    return logical_plan_to_sql(optimize([plot_to_plan(svl_plot)])[0])
+
+
+def run_query(query, conn):
+    """ Executes a plot query against the SQLite database.
+
+        Parameters
+        ----------
+        query : str
+            The SQL query.
+
         conn : sqlite3.Connection
             The SQLite database connection. Must point to the database loaded
             with the SVL datasets.
 
         Returns
         -------
-        dict
-            The dataset required for the plot.
-    """
-    # Step 1: Create the query.
-    # NOTE: Kind of annoying to touch this so many times - might be worth
-    # refactoring a little bit so everything's in _one_ if statement.
-    if svl_plot["type"] in {"line", "scatter", "bar"}:
-        query = svl_to_sql_xy(svl_plot)
-    elif svl_plot["type"] == "histogram":
-        query = svl_to_sql_hist(svl_plot)
-    elif svl_plot["type"] == "pie":
-        query = svl_to_sql_pie(svl_plot)
-    elif svl_plot["type"] == "number":
-        query = svl_to_sql_number(svl_plot)
+        list[sqlite3.Row]
+            The rows of the result.
 
-    # Step 2: Execute the query and retrieve the results.
+        Raises
+        ------
+        sqlite3.DatabaseError
+            If the query fails or returns no rows.
+    """
     conn.row_factory = sqlite3.Row
 
     cursor = conn.cursor()
@@ -349,8 +1758,26 @@ def get_svl_data(svl_plot, conn):
             "Encountered empty result set. Check filters or source data."
         )
 
-    # Step 3: Convert the resulting list of sqlite rows into SVL data
-    # structures.
+    return data_list
+
+
+def rows_to_svl_data(svl_plot, data_list):
+    """ Converts the rows of a plot query's result into the SVL data for the
+        plot.
+
+        Parameters
+        ----------
+        svl_plot : dict
+            The SVL plot definition.
+
+        data_list : list[sqlite3.Row]
+            The rows returned by the plot's query.
+
+        Returns
+        -------
+        dict
+            The dataset required for the plot.
+    """
     # NOTE: For now this structure corresponds _mostly_ to plotly's
     # traces, but since it's internal we can change it to something more
     # general later.
@@ -399,3 +1826,25 @@ def get_svl_data(svl_plot, conn):
         svl_data = {"value": data_list[0]["value"]}
 
     return svl_data
+
+
+def get_svl_data(svl_plot, conn):
+    """ Obtains the data for the provided SVL plot from the SQLite database.
+
+        Parameters
+        ----------
+        svl_plot : dict
+            The SVL plot definition.
+
+        conn : sqlite3.Connection
+            The SQLite database connection. Must point to the database loaded
+            with the SVL datasets.
+
+        Returns
+        -------
+        dict
+            The dataset required for the plot.
+    """
+    return rows_to_svl_data(
+        svl_plot, run_query(svl_to_sql(svl_plot), conn)
+    )
@@ -0,0 +1,603 @@
+""" A language server for SVL, speaking the language server protocol over
+    stdio.
+
+    The server keeps the LALR parser warm and publishes diagnostics for
+    syntax errors, invalid plots, unknown datasets and fields that aren't in
+    a file dataset's columns. Documents are split into top level blocks (the
+    DATASETS block and each top level chart) and parses are cached by block
+    text, so an edit only reparses the blocks it touched. Field names are
+    checked against the CSV header or parquet footer of each file dataset,
+    so no data is ever loaded.
+"""
+import bisect
+import json
+import os
+import re
+import sys
+
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+from svl.compiler.ast import get_parser, parse_svl
+from svl.compiler.errors import SvlSyntaxError
+from svl.compiler.layout import tree_to_grid
+from svl.compiler.plot_validators import validate_plot
+from svl.data_sources.schema import file_columns, missing_fields
+
+# LSP diagnostic severities (and message types).
+ERROR = 1
+WARNING = 2
+
+# JSON-RPC error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+# The header giving the length of a message's body. It's looked for anywhere
+# in a header line, so a message without one doesn't take the next message's
+# header with it.
+CONTENT_LENGTH_REGEX = re.compile(
+    rb"content-length\s*:\s*(\d+)", re.IGNORECASE
+)
+
+# LSP text document sync kinds.
+INCREMENTAL_SYNC = 2
+
+# The number of parsed blocks to keep across all open documents.
+PARSE_CACHE_SIZE = 4096
+
+CHART_KEYWORDS = {"LINE", "BAR", "SCATTER", "HISTOGRAM", "PIE", "NUMBER"}
+
+# Declarations followed by a name, which could otherwise be mistaken for the
+# start of a chart (a field called "line", say).
+NAME_DECLARATIONS = CHART_KEYWORDS | {"X", "Y", "AXIS", "VALUE", "BY"}
+
+TOKEN_REGEX = re.compile(
+    r"""
+    (?P<string>"(?:[^"\\]|\\.)*"?)
+    | (?P<comment>--[^\n]*)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<punctuation>[()])
+    | (?P<other>[^\s])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# The DATASETS block can't be parsed on its own, so it's parsed with a chart
+# appended.
+DATASETS_SENTINEL = "\nNUMBER __svl_lsp__ VALUE __svl_lsp__"
+
+
+def _declares_dataset(tokens, index):
+    """ Checks whether the word at the index names a dataset in DATASETS
+        (a dataset called "number", say) rather than starting a chart, from
+        what follows it: a dataset's name is followed by its file or by SQL.
+    """
+    for kind, token, _ in tokens[index + 1 :]:
+        if kind != "comment":
+            return kind == "string" or (
+                kind == "word" and token.upper() == "SQL"
+            )
+    return False
+
+
+def split_blocks(source):
+    """ Splits SVL source into its top level blocks - the DATASETS block and
+        each top level chart or group of charts.
+
+        Parameters
+        ----------
+        source : str
+            The SVL source.
+
+        Returns
+        -------
+        list[dict]
+            The blocks in order, each with its "kind" ("datasets" or "chart"),
+            "start" offset in the source, and "text". Together the blocks
+            cover the whole source.
+    """
+    block_starts = []
+    depth = 0
+    previous_word = None
+    tokens = [
+        (match.lastgroup, match.group(match.lastgroup), match.start())
+        for match in TOKEN_REGEX.finditer(source)
+    ]
+
+    for ii, (kind, token, start) in enumerate(tokens):
+        if kind in {"comment", "string"}:
+            previous_word = None
+            continue
+
+        word = token.upper() if kind == "word" else token
+        in_datasets = bool(block_starts) and block_starts[-1][0] == "datasets"
+        if depth == 0:
+            if word == "DATASETS" and not block_starts:
+                block_starts.append(("datasets", start))
+            elif (
+                (word in CHART_KEYWORDS or word == "CONCAT")
+                and previous_word not in NAME_DECLARATIONS
+                and not (in_datasets and _declares_dataset(tokens, ii))
+            ):
+                block_starts.append(("chart", start))
+            elif word == "(" and previous_word != "CONCAT":
+                block_starts.append(("chart", start))
+
+        if word == "(":
+            depth += 1
+        elif word == ")":
+            depth = max(depth - 1, 0)
+
+        previous_word = word if kind == "word" else None
+
+    if not block_starts:
+        return [{"kind": "chart", "start": 0, "text": source}] if (
+            source.strip()
+        ) else []
+
+    blocks = []
+    for ii, (kind, start) in enumerate(block_starts):
+        # Anything before the first block belongs to it.
+        start = 0 if ii == 0 else start
+        end = (
+            block_starts[ii + 1][1]
+            if ii + 1 < len(block_starts)
+            else len(source)
+        )
+        blocks.append(
+            {"kind": kind, "start": start, "text": source[start:end]}
+        )
+
+    return blocks
+
+
+def apply_change(source, change):
+    """ Applies a content change from a didChange notification.
+
+        Parameters
+        ----------
+        source : str
+            The document text before the change.
+        change : dict
+            The LSP TextDocumentContentChangeEvent.
+
+        Returns
+        -------
+        str
+            The document text after the change.
+    """
+    if "range" not in change:
+        return change["text"]
+
+    positions = Positions(source)
+    start = positions.offset(change["range"]["start"])
+    end = positions.offset(change["range"]["end"])
+    return source[:start] + change["text"] + source[end:]
+
+
+def _utf16_length(text):
+    # Characters outside the basic multilingual plane take two UTF-16 code
+    # units.
+    return len(text) + sum(1 for char in text if ord(char) > 0xFFFF)
+
+
+class Positions:
+    """ Converts between offsets in a document and LSP line / character
+        positions. Like LSP's default position encoding, the characters are
+        counted in UTF-16 code units.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.line_starts = [0] + [
+            match.end() for match in re.finditer("\n", source)
+        ]
+
+    def position(self, offset):
+        line = bisect.bisect_right(self.line_starts, offset) - 1
+        return {
+            "line": line,
+            "character": _utf16_length(
+                self.source[self.line_starts[line] : offset]
+            ),
+        }
+
+    def offset(self, position):
+        line = position["line"]
+        if line >= len(self.line_starts):
+            return len(self.source)
+        # A character past the end of the line is the end of the line.
+        line_end = (
+            self.line_starts[line + 1] - 1
+            if line + 1 < len(self.line_starts)
+            else len(self.source)
+        )
+        offset = self.line_starts[line]
+        units = position["character"]
+        while offset < line_end and units > 0:
+            units -= 2 if ord(self.source[offset]) > 0xFFFF else 1
+            offset += 1
+        return offset
+
+    def range(self, start, end):
+        return {"start": self.position(start), "end": self.position(end)}
+
+
+def _diagnostic(positions, start, end, message, severity=ERROR):
+    return {
+        "range": positions.range(start, max(end, start)),
+        "severity": severity,
+        "source": "svl",
+        "message": message,
+    }
+
+
+class SvlLanguageServer:
+    """ Handles language server protocol messages for SVL documents.
+
+        Parameters
+        ----------
+        send : Callable[[dict], None]
+            Sends a message to the client.
+    """
+
+    def __init__(self, send):
+        self.send = send
+        self.documents = {}
+        self.parse_cache = OrderedDict()
+        self.parse_count = 0
+        self.shutdown_requested = False
+
+    def handle(self, message):
+        """ Handles a message from the client. A request that fails gets an
+            error response, and a notification that fails is logged to the
+            client, so one bad message doesn't take the server down.
+
+            Parameters
+            ----------
+            message : dict
+                The JSON-RPC message.
+
+            Returns
+            -------
+            bool
+                False once the server should exit, True otherwise.
+        """
+        if not isinstance(message, dict):
+            self.send_error(None, INVALID_REQUEST, "Invalid request.")
+            return True
+
+        try:
+            return self._handle(message)
+        except Exception as e:
+            error = "{} failed: {!r}".format(message.get("method"), e)
+            if "id" in message:
+                self.send_error(message["id"], INTERNAL_ERROR, error)
+            else:
+                self.send(
+                    {
+                        "jsonrpc": "2.0",
+                        "method": "window/logMessage",
+                        "params": {"type": ERROR, "message": error},
+                    }
+                )
+            return True
+
+    def _handle(self, message):
+        method = message.get("method")
+        params = message.get("params", {})
+        result = None
+
+        if method == "initialize":
+            # Warm the parser up before the first document arrives.
+            get_parser()
+            result = {
+                "capabilities": {
+                    "positionEncoding": "utf-16",
+                    "textDocumentSync": INCREMENTAL_SYNC,
+                },
+                "serverInfo": {"name": "svl"},
+            }
+        elif method == "shutdown":
+            self.shutdown_requested = True
+        elif method == "exit":
+            return False
+        elif method == "textDocument/didOpen":
+            document = params["textDocument"]
+            self.documents[document["uri"]] = document["text"]
+            self.publish_diagnostics(document["uri"])
+        elif method == "textDocument/didChange":
+            uri = params["textDocument"]["uri"]
+            if uri not in self.documents:
+                # There's no text to apply the changes to until it's opened.
+                return True
+            for change in params["contentChanges"]:
+                self.documents[uri] = apply_change(
+                    self.documents[uri], change
+                )
+            self.publish_diagnostics(uri)
+        elif method == "textDocument/didClose":
+            uri = params["textDocument"]["uri"]
+            self.documents.pop(uri, None)
+            self.send(
+                {
+                    "jsonrpc": "2.0",
+                    "method": "textDocument/publishDiagnostics",
+                    "params": {"uri": uri, "diagnostics": []},
+                }
+            )
+        elif "id" in message:
+            self.send_error(
+                message["id"],
+                METHOD_NOT_FOUND,
+                "Method not found: {}".format(method),
+            )
+            return True
+
+        # Requests get a response, notifications don't.
+        if "id" in message:
+            self.send(
+                {"jsonrpc": "2.0", "id": message["id"], "result": result}
+            )
+
+        return True
+
+    def send_error(self, message_id, code, error):
+        """ Sends a JSON-RPC error response.
+
+            Parameters
+            ----------
+            message_id : int or str or None
+                The id of the request, or None if it couldn't be read.
+            code : int
+                The JSON-RPC error code.
+            error : str
+                The error message.
+        """
+        self.send(
+            {
+                "jsonrpc": "2.0",
+                "id": message_id,
+                "error": {"code": code, "message": error},
+            }
+        )
+
+    def publish_diagnostics(self, uri):
+        self.send(
+            {
+                "jsonrpc": "2.0",
+                "method": "textDocument/publishDiagnostics",
+                "params": {
+                    "uri": uri,
+                    "diagnostics": self.diagnostics(uri),
+                },
+            }
+        )
+
+    def parse_block(self, block):
+        """ Parses a block, reusing the parse of identical block text.
+
+            Returns
+            -------
+            Tuple[dict, SvlSyntaxError]
+                The parsed block, or the syntax error if it didn't parse.
+        """
+        key = (block["kind"], block["text"])
+        if key in self.parse_cache:
+            self.parse_cache.move_to_end(key)
+            return self.parse_cache[key]
+
+        self.parse_count += 1
+        text = block["text"]
+        if block["kind"] == "datasets":
+            text += DATASETS_SENTINEL
+        try:
+            parsed = (parse_svl(text), None)
+        except SvlSyntaxError as e:
+            parsed = (None, e)
+
+        self.parse_cache[key] = parsed
+        while len(self.parse_cache) > PARSE_CACHE_SIZE:
+            self.parse_cache.popitem(last=False)
+
+        return parsed
+
+    def diagnostics(self, uri):
+        """ Computes the diagnostics for an open document.
+
+            Parameters
+            ----------
+            uri : str
+                The document's URI.
+
+            Returns
+            -------
+            list[dict]
+                The LSP diagnostics.
+        """
+        source = self.documents[uri]
+        positions = Positions(source)
+        blocks = split_blocks(source)
+        diagnostics = []
+
+        datasets = {}
+        chart_blocks = []
+        for block in blocks:
+            parsed, error = self.parse_block(block)
+            if error is not None:
+                diagnostics.append(
+                    self._syntax_diagnostic(positions, block, error)
+                )
+            elif block["kind"] == "datasets":
+                datasets = parsed["datasets"]
+            else:
+                chart_blocks.append((block, parsed))
+
+        columns = {
+            name: file_columns(self._resolve(uri, dataset["file"]))
+            for name, dataset in datasets.items()
+            if "file" in dataset
+        }
+
+        for block, parsed in chart_blocks:
+            for plot in tree_to_grid(parsed):
+                diagnostics.extend(
+                    self._plot_diagnostics(
+                        positions, block, plot, datasets, columns
+                    )
+                )
+
+        return diagnostics
+
+    def _resolve(self, uri, filename):
+        # Relative paths are relative to wherever svl runs, which is usually
+        # the script's directory or the editor's working directory.
+        parsed_uri = urlparse(uri)
+        if os.path.isabs(filename) or parsed_uri.scheme != "file":
+            return filename
+        script_dir = os.path.dirname(unquote(parsed_uri.path))
+        script_relative = os.path.join(script_dir, filename)
+        return (
+            script_relative if os.path.exists(script_relative) else filename
+        )
+
+    def _syntax_diagnostic(self, positions, block, error):
+        _, line, column = error.args
+        block_end = block["start"] + len(block["text"].rstrip())
+        if isinstance(line, int) and isinstance(column, int):
+            # The parser counts columns in characters, not UTF-16 units.
+            line_starts = Positions(block["text"]).line_starts
+            offset = (
+                block["start"] + line_starts[line - 1] + column - 1
+                if line <= len(line_starts)
+                else block_end
+            )
+            # Errors in the sentinel chart are at the end of the block.
+            offset = min(offset, block_end)
+        else:
+            offset = block_end
+
+        return _diagnostic(positions, offset, offset + 1, error.label)
+
+    def _plot_diagnostics(self, positions, block, plot, datasets, columns):
+        block_start = block["start"]
+        first_line = block["text"].split("\n", 1)[0]
+        block_range = (block_start, block_start + len(first_line))
+        diagnostics = []
+
+        if plot["data"] not in datasets:
+            # The dataset could still be provided with --dataset.
+            diagnostics.append(
+                _diagnostic(
+                    positions,
+                    *block_range,
+                    "Dataset {} is not in DATASETS.".format(plot["data"]),
+                    severity=WARNING
+                )
+            )
+
+        ok, message = validate_plot(plot)
+        if not ok:
+            diagnostics.append(
+                _diagnostic(positions, *block_range, message)
+            )
+
+        dataset_columns = columns.get(plot["data"])
+        if dataset_columns is None:
+            return diagnostics
+
+        for axis, field in missing_fields(plot, dataset_columns):
+            match = re.search(
+                r"\b{}\b".format(re.escape(field)), block["text"]
+            )
+            field_range = (
+                (block_start + match.start(), block_start + match.end())
+                if match
+                else block_range
+            )
+            diagnostics.append(
+                _diagnostic(
+                    positions,
+                    *field_range,
+                    "Field {} is not a column of {}.".format(
+                        field, plot["data"]
+                    )
+                )
+            )
+
+        return diagnostics
+
+
+def read_message(stream):
+    """ Reads a JSON-RPC message with its LSP base protocol headers.
+
+        Parameters
+        ----------
+        stream : io.BufferedIOBase
+            The binary stream to read from.
+
+        Returns
+        -------
+        dict or None
+            The message, or None at the end of the stream.
+
+        Raises
+        ------
+        ValueError
+            If the message has no Content-Length header or its body isn't
+            JSON. The stream is left at the start of the next message.
+    """
+    content_length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        if not line.strip():
+            break
+        match = CONTENT_LENGTH_REGEX.search(line)
+        if match:
+            content_length = int(match.group(1))
+
+    if content_length is None:
+        raise ValueError("Missing Content-Length header.")
+    body = stream.read(content_length)
+    return json.loads(body.decode("utf-8"))
+
+
+def write_message(stream, message):
+    """ Writes a JSON-RPC message with its LSP base protocol headers.
+
+        Parameters
+        ----------
+        stream : io.BufferedIOBase
+            The binary stream to write to.
+        message : dict
+            The message.
+    """
+    body = json.dumps(message).encode("utf-8")
+    header = "Content-Length: {}\r\n\r\n".format(len(body))
+    stream.write(header.encode("ascii"))
+    stream.write(body)
+    stream.flush()
+
+
+def main():
+    """ Runs the SVL language server on stdin / stdout.
+    """
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    server = SvlLanguageServer(lambda message: write_message(stdout, message))
+
+    while True:
+        try:
+            message = read_message(stdin)
+        except ValueError as e:
+            # A message that can't be read has no id to answer with.
+            server.send_error(None, PARSE_ERROR, "Parse error: {}".format(e))
+            continue
+        if message is None or not server.handle(message):
+            break
+
+    sys.exit(0 if server.shutdown_requested else 1)
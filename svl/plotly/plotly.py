@@ -1,7 +1,6 @@
-import importlib_resources
-
 from toolz import merge, compose, pluck, get, dissoc, get_in
-from jinja2 import Environment, PackageLoader, select_autoescape
+
+from svl.compiler.layout import compact_grid
 
 
 listpluck = compose(list, pluck)
@@ -405,7 +404,7 @@ PLOTLY_PLOTS = {
 }
 
 
-def plotly_template_vars(svl_plots, datas):
+def plotly_template_vars(svl_plots, datas, layout="grid"):
     """ Constructs the variables needed for the plotly template from the
         SVL plots and their associated data values.
 
@@ -417,6 +416,10 @@ def plotly_template_vars(svl_plots, datas):
         datas : list
             A list of dicts defining the data required for each plot in the
             format produced by the sqlite module.
+        layout : str
+            "grid" to place the plots on the grid as laid out, or "compact" to
+            merge the grid rows and columns no plot starts or ends in into
+            wider tracks. Default: "grid".
 
         Returns
         -------
@@ -424,11 +427,18 @@ def plotly_template_vars(svl_plots, datas):
             A dictionary of the keyword arguments required to render the plotly
             template. Specifically, num_rows, num_columns, and plots, which
             contain (respectively) the number of grid rows, the number of grid
-            columns, and the plotly plots.
+            columns, and the plotly plots. For the compact layout, row_tracks
+            and column_tracks hold the number of grid rows and columns each
+            track spans.
     """
     num_rows = max(listpluck("row_end", svl_plots))
     num_columns = max(listpluck("column_end", svl_plots))
 
+    tracks = {}
+    if layout == "compact":
+        svl_plots, row_tracks, column_tracks = compact_grid(svl_plots)
+        tracks = {"row_tracks": row_tracks, "column_tracks": column_tracks}
+
     plots = [
         {
             # CSS grids are 1-indexed, but the layout is zero indexed in the
@@ -445,18 +455,23 @@ def plotly_template_vars(svl_plots, datas):
     # Right now we're just going to slurp that file every time. If that turns
     # out to be a perf issue or something we can always add a flag to the
     # function to skip.
+    import importlib_resources
+
     with importlib_resources.path(
         "svl.plotly.js", "plotly-latest.min.js"
     ) as plotly_js_path:
         # For some reason we need a string in Python 3.5.
         plotly_js = open(str(plotly_js_path), "r").read()
 
-    return {
-        "num_rows": num_rows,
-        "num_columns": num_columns,
-        "plots": plots,
-        "plotly_js": plotly_js,
-    }
+    return merge(
+        {
+            "num_rows": num_rows,
+            "num_columns": num_columns,
+            "plots": plots,
+            "plotly_js": plotly_js,
+        },
+        tracks,
+    )
 
 
 def plotly_template():
@@ -467,6 +482,9 @@ def plotly_template():
         `jinja2.Template`
             The tempate for plotly plots.
     """
+    # jinja is only needed to render, so it isn't imported with the package.
+    from jinja2 import Environment, PackageLoader, select_autoescape
+
     env = Environment(
         loader=PackageLoader("svl.plotly", "templates"),
         autoescape=select_autoescape(["html"]),
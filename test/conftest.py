@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def svl_cache_dir(tmp_path, monkeypatch):
+    """ Points the SVL cache at a directory of the test's own, so the tests
+        neither read nor write the user's cache (serialized parsers from
+        another checkout, say).
+    """
+    cache_dir = tmp_path / "svl_cache"
+    monkeypatch.setenv("SVL_CACHE_DIR", str(cache_dir))
+    return str(cache_dir)
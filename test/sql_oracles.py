@@ -0,0 +1,191 @@
+""" The queries for each type of plot from before the logical plan. The plots'
+    queries come from logical_plan_to_sql; these are kept as the reference
+    the tests check the optimized plans' results against.
+"""
+from svl.data_sources.sqlite import TEMPORAL_CONVERTERS
+
+
+def _get_field(svl_axis):
+    if "transform" in svl_axis:
+        return svl_axis["transform"]
+    elif "temporal" in svl_axis:
+        return TEMPORAL_CONVERTERS[svl_axis["temporal"]].format(
+            svl_axis["field"]
+        )
+    elif "field" in svl_axis:
+        return svl_axis["field"]
+    else:
+        return "*"
+
+
+def svl_to_sql_hist(svl_plot):
+    """ Constructs a SQL query for histogram plots.
+
+        Parameters
+        -----------
+        svl_plot : dict
+            The SVL plot definition.
+
+        Returns
+        -------
+        str
+            The SQL query for the dataset required for the plot.
+    """
+    select_fields = []
+
+    for axis in ["x", "y", "split_by"]:
+        # Skip if the axis isn't in the plot.
+        if axis not in svl_plot:
+            continue
+
+        field = _get_field(svl_plot[axis])
+        select_fields.append("{} AS {}".format(field, axis))
+
+    query = "SELECT {} FROM {}".format(
+        ", ".join(select_fields), svl_plot["data"]
+    )
+
+    if "filter" in svl_plot:
+        query = "{} WHERE {}".format(query, svl_plot["filter"])
+
+    return query
+
+
+def svl_to_sql_pie(svl_plot):
+    """ Constructs a SQL query for pie charts.
+
+        Parameters
+        ----------
+        svl_plot : dict
+            The SVL plot definition.
+
+        Returns
+        -------
+        str
+            The SQL query for the dataset required for the plot.
+    """
+    query = "SELECT {} AS label, COUNT(*) AS value FROM {}".format(
+        _get_field(svl_plot["axis"]), svl_plot["data"]
+    )
+
+    if "filter" in svl_plot:
+        query = "{} WHERE {}".format(query, svl_plot["filter"])
+
+    query = "{} GROUP BY {}".format(query, _get_field(svl_plot["axis"]))
+
+    return query
+
+
+def svl_to_sql_number(svl_plot):
+    """ Constructs a SQL query for number charts.
+
+    Parameters
+    ----------
+    svl_plot : dict
+        The SVL plot definition.
+
+    Returns
+    -------
+    str
+        The SQL query for the dataset required for the plot.
+    """
+    if "agg" not in svl_plot["value"]:
+        query = "SELECT {} AS value FROM {}".format(
+            _get_field(svl_plot["value"]), svl_plot["data"]
+        )
+    else:
+        query = "SELECT {}({}) AS value FROM {}".format(
+            svl_plot["value"]["agg"],  # Agg function.
+            _get_field(svl_plot["value"]),  # The value or transform.
+            svl_plot["data"],  # The dataset.
+        )
+    if "filter" in svl_plot:
+        query = "{} WHERE {}".format(query, svl_plot["filter"])
+
+    return query
+
+
+def svl_to_sql_xy(svl_plot):
+    """ Takes an SVL plot specification and produces a SQL query to retrieve
+        the data.
+
+        Parameters
+        ----------
+        svl_plot : dict
+            The SVL plot specifier.
+
+        Returns
+        -------
+        str
+            The query to execute.
+    """
+    # TODO this is a very big function with a lot of redundant conditionals
+    # Step 1: Process the selects.
+
+    select_fields = []
+
+    for axis in ["x", "y", "split_by", "color_by"]:
+
+        # Skip if the axis isn't in the plot.
+        if axis not in svl_plot:
+            continue
+
+        field = _get_field(svl_plot[axis])
+
+        if "agg" in svl_plot[axis]:
+            # NOTE: Split by axis will not take aggregations.
+            select_fields.append(
+                "{}({}) AS {}".format(svl_plot[axis]["agg"], field, axis)
+            )
+        else:
+            select_fields.append("{} AS {}".format(field, axis))
+
+    # Step 2: Process the aggregations.
+    group_fields = []
+
+    group_axis = None
+
+    if "agg" in svl_plot["x"]:
+        group_axis = "y"
+    elif "agg" in svl_plot["y"]:
+        group_axis = "x"
+
+    if group_axis:
+        group_fields.append(_get_field(svl_plot[group_axis]))
+
+    split_by_field = "" if "split_by" not in svl_plot else "split_by"
+    # Only add the split by to the group by if there's already a group axis.
+    # Empty strings are falsey ... I mean Falsey.
+    if group_axis and split_by_field:
+        group_fields.append(_get_field(svl_plot["split_by"]))
+
+    # NOTE: the color_by field cannot appear in a GROUP BY. If there's an
+    # aggregation on x or y, then there must be an aggregation on color_by.
+
+    # Step 3: Build the query.
+    query = "SELECT {} FROM {}".format(
+        ", ".join(select_fields), svl_plot["data"]
+    )
+
+    if "filter" in svl_plot:
+        query = "{} WHERE {}".format(query, svl_plot["filter"])
+
+    if group_axis:
+        query = "{} GROUP BY {}".format(query, ", ".join(group_fields))
+
+    # If there's a SPLIT BY and a sort, make sure to sort by the split by
+    # field first, since each SPLIT BY value becomes it's own trace.
+    sort_fields = []
+    if split_by_field:
+        sort_fields.append(split_by_field)
+
+    if "sort" in svl_plot["x"]:
+        query = "{} ORDER BY {} {}".format(
+            query, ", ".join(sort_fields + ["x"]), svl_plot["x"]["sort"]
+        )
+    elif "sort" in svl_plot["y"]:
+        query = "{} ORDER BY {} {}".format(
+            query, ", ".join(sort_fields + ["y"]), svl_plot["y"]["sort"]
+        )
+
+    return query
@@ -1,4 +1,14 @@
-from svl.compiler.ast import parse_svl
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from svl.compiler.ast import (
+    parse_svl,
+    get_parser,
+    _load_lalr_parser,
+    _deserialize_parser,
+)
 
 
 def test_line_chart():
@@ -477,6 +487,39 @@ def test_sql_dataset():
     assert parsed_svl_truth == parsed_svl_answer
 
 
+def test_file_dataset_filter():
+    """ Tests that file datasets with a FILTER are parsed correctly.
+    """
+    svl_string = """
+    DATASETS
+        bigfoot "bigfoot_sightings.csv" FILTER "date >= '2008-01-01'"
+        cities "cities.csv"
+    HISTOGRAM bigfoot
+        X temperature_mid
+    """
+
+    parsed_svl_truth = {
+        "datasets": {
+            "bigfoot": {
+                "file": "bigfoot_sightings.csv",
+                "filter": "date >= '2008-01-01'",
+            },
+            "cities": {"file": "cities.csv"},
+        },
+        "vcat": [
+            {
+                "data": "bigfoot",
+                "type": "histogram",
+                "x": {"field": "temperature_mid"},
+            }
+        ],
+    }
+
+    parsed_svl_answer = parse_svl(svl_string)
+
+    assert parsed_svl_truth == parsed_svl_answer
+
+
 def test_no_datasets():
     """ Tests that the parse_svl function returns the correct value when
         there's no DATASETS directive.
@@ -691,3 +734,124 @@ def test_split_by_label():
 
     answer = parse_svl(svl_string)
     assert truth == answer
+
+
+def test_get_parser_memoized():
+    """ Tests that the get_parser function builds each parser once per thread
+        and returns the same instance on subsequent calls.
+    """
+    assert get_parser() is get_parser()
+    assert get_parser(debug=True) is get_parser(debug=True)
+    assert get_parser() is not get_parser(debug=True)
+
+
+def test_get_parser_concurrent():
+    """ Tests that concurrent calls to get_parser obtain one parser per
+        thread.
+    """
+    n_threads = 8
+    # Every thread is alive until they've all got their parsers, so none of
+    # them can be reused by another.
+    barrier = threading.Barrier(n_threads)
+    parsers = [None] * n_threads
+
+    def _get_parsers(ii):
+        first = get_parser()
+        barrier.wait()
+        parsers[ii] = first, get_parser()
+
+    threads = [
+        threading.Thread(target=_get_parsers, args=(ii,))
+        for ii in range(n_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The same thread always gets the same parser ...
+    assert all(first is second for first, second in parsers)
+    # ... and no two threads share one.
+    thread_parsers = [first for first, _ in parsers]
+    assert len({id(parser) for parser in thread_parsers}) == n_threads
+    assert all(get_parser() is not parser for parser in thread_parsers)
+
+
+def test_parse_svl_concurrent():
+    """ Tests that parse_svl produces the same results when many threads parse
+        concurrently as it does sequentially.
+    """
+    svl_strings = [
+        """
+        DATASETS bigfoot "bigfoot_sightings.csv"
+        CONCAT(
+            LINE bigfoot X date BY YEAR Y date COUNT SPLIT BY classification
+            HISTOGRAM bigfoot X temperature_mid BINS {}
+        )
+        """.format(
+            ii + 1
+        )
+        if ii % 2
+        else """
+        (
+            PIE bigfoot AXIS has_location HOLE 0.{}
+            NUMBER bigfoot VALUE temperature_mid AVG TITLE "{}"
+        )
+        """.format(
+            ii % 10, ii
+        )
+        for ii in range(2000)
+    ]
+
+    truth = [parse_svl(svl_string) for svl_string in svl_strings]
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        answer = list(executor.map(parse_svl, svl_strings))
+
+    assert truth == answer
+
+
+def test_load_lalr_parser_cache(tmp_path, monkeypatch):
+    """ Tests that the _load_lalr_parser function serializes the parser and
+        syntax error classifier to the cache directory and that the cached
+        parser produces the same AST.
+    """
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    svl_string = """
+    DATASETS bigfoot "bigfoot_sightings.csv"
+    CONCAT(
+        BAR bigfoot X classification Y classification COUNT SORT DESC
+        PIE bigfoot AXIS has_location HOLE 0.3
+    )
+    """
+
+    built_parser, built_syntax_errors = _load_lalr_parser()
+    cached_files = os.listdir(os.path.join(str(tmp_path), "parsers"))
+    assert 1 == len(cached_files)
+
+    cached_parser, cached_syntax_errors = _load_lalr_parser()
+    assert built_syntax_errors == cached_syntax_errors
+
+    truth = _deserialize_parser(built_parser).parse(svl_string)
+    answer = _deserialize_parser(cached_parser).parse(svl_string)
+    assert truth == answer
+
+
+def test_load_lalr_parser_corrupt_cache(tmp_path, monkeypatch):
+    """ Tests that the _load_lalr_parser function rebuilds the parser when the
+        cached parser can't be loaded.
+    """
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    _load_lalr_parser()
+    parser_dir = os.path.join(str(tmp_path), "parsers")
+    cache_path = os.path.join(parser_dir, os.listdir(parser_dir)[0])
+    with open(cache_path, "wb") as f:
+        f.write(b"not a parser")
+
+    parser_data, _ = _load_lalr_parser()
+    parser = _deserialize_parser(parser_data)
+    truth = {
+        "vcat": [{"type": "number", "data": "b", "value": {"field": "v"}}]
+    }
+    answer = parser.parse("NUMBER b VALUE v")
+    assert truth == answer
@@ -0,0 +1,55 @@
+import os
+import pytest
+
+from svl.cache import cache_dir, write_atomic
+
+
+def test_cache_dir_env(tmp_path, monkeypatch):
+    """ Tests that the cache_dir function creates the directory under
+        SVL_CACHE_DIR when it's set.
+    """
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    truth = os.path.join(str(tmp_path), "parsers")
+    answer = cache_dir("parsers")
+
+    assert truth == answer
+    assert os.path.isdir(answer)
+
+
+def test_cache_dir_xdg(tmp_path, monkeypatch):
+    """ Tests that the cache_dir function falls back to XDG_CACHE_HOME.
+    """
+    monkeypatch.delenv("SVL_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    truth = os.path.join(str(tmp_path), "svl")
+    answer = cache_dir()
+
+    assert truth == answer
+
+
+def test_write_atomic(tmp_path):
+    """ Tests that the write_atomic function writes the file and leaves no
+        temporary files behind.
+    """
+    path = os.path.join(str(tmp_path), "cached")
+    write_atomic(path, lambda f: f.write(b"hello"))
+
+    with open(path, "rb") as f:
+        assert b"hello" == f.read()
+    assert ["cached"] == os.listdir(str(tmp_path))
+
+
+def test_write_atomic_failure(tmp_path):
+    """ Tests that the write_atomic function cleans up after a failed write
+        and doesn't create the destination.
+    """
+    path = os.path.join(str(tmp_path), "cached")
+
+    def _write(f):
+        f.write(b"partial")
+        raise RuntimeError("write failed")
+
+    with pytest.raises(RuntimeError):
+        write_atomic(path, _write)
+
+    assert [] == os.listdir(str(tmp_path))
@@ -141,6 +141,68 @@ def test_histogram_cli_plotly_offline_js(svl_script_template, output_path):
     )
 
 
+def test_histogram_cli_plotly_compact_layout(
+    svl_script_template, output_path
+):
+    """ Tests that the command line interface works correctly on the test
+        dataset for histogram plots with the compact layout.
+    """
+    subprocess.run(
+        [
+            "svl",
+            svl_script_template("histogram.svl"),
+            "--output-file",
+            output_path,
+            "--no-browser",
+            "--layout",
+            "compact",
+        ],
+        check=True,
+    )
+
+
+def test_histogram_cli_load_workers(svl_script_template, output_path):
+    """ Tests that the command line interface works correctly on the test
+        dataset for histogram plots with the data parsed by two processes.
+    """
+    subprocess.run(
+        [
+            "svl",
+            svl_script_template("histogram.svl"),
+            "--output-file",
+            output_path,
+            "--no-browser",
+            "--load-workers",
+            "2",
+        ],
+        check=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "option,value", [("--chunk-rows", "10"), ("--memory-budget", "2000")]
+)
+def test_histogram_cli_batches(
+    svl_script_template, output_path, option, value
+):
+    """ Tests that the command line interface works correctly on the test
+        dataset for histogram plots with the size of the loading's batches
+        set.
+    """
+    subprocess.run(
+        [
+            "svl",
+            svl_script_template("histogram.svl"),
+            "--output-file",
+            output_path,
+            "--no-browser",
+            option,
+            value,
+        ],
+        check=True,
+    )
+
+
 def test_histogram_cli_no_datasets(output_path):
     """ Tests that the command line interface works correctly on the test
         dataset for histogram plots when the test dataset is passed in via
@@ -166,6 +228,58 @@ def test_histogram_cli_no_datasets(output_path):
     )
 
 
+def test_histogram_cli_compile_cache(
+    svl_script_template, output_path, tmp_path
+):
+    """ Tests that the command line interface works correctly with the
+        --compile-cache flag, both when the compile cache is cold and warm.
+    """
+    env = dict(os.environ, SVL_CACHE_DIR=str(tmp_path))
+    script = svl_script_template("histogram.svl")
+
+    for _ in range(2):
+        subprocess.run(
+            [
+                "svl",
+                script,
+                "--output-file",
+                output_path,
+                "--no-browser",
+                "--compile-cache",
+            ],
+            check=True,
+            env=env,
+        )
+
+    assert 1 == len(os.listdir(os.path.join(str(tmp_path), "compiled")))
+
+
+def test_histogram_cli_dataset_cache(
+    svl_script_template, output_path, tmp_path
+):
+    """ Tests that the command line interface works correctly with the
+        --dataset-cache flag, both when the dataset cache is cold and warm.
+    """
+    env = dict(os.environ, SVL_CACHE_DIR=str(tmp_path))
+    script = svl_script_template("histogram.svl")
+
+    for _ in range(2):
+        subprocess.run(
+            [
+                "svl",
+                script,
+                "--output-file",
+                output_path,
+                "--no-browser",
+                "--dataset-cache",
+            ],
+            check=True,
+            env=env,
+        )
+
+    assert 1 == len(os.listdir(os.path.join(str(tmp_path), "datasets")))
+
+
 def test_cli_dataset_arg_error():
     """ Tests that the command line interface returns the correct error when
         the --dataset argument is malformed.
@@ -316,7 +430,7 @@ def test_cli_missing_field(svl_script_template):
     )
 
     assert completed.returncode == 1
-    assert "Data processing error:" in completed.stdout.decode("ascii")
+    assert "Plot error:" in completed.stdout.decode("ascii")
 
 
 def test_cli_invalid_dataset_sql(svl_script_template):
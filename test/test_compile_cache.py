@@ -0,0 +1,119 @@
+import os
+import pkgutil
+import pytest
+
+from svl.compiler.compile_cache import (
+    compiled_key,
+    load_compiled,
+    store_compiled,
+    evict_compiled,
+)
+
+
+@pytest.fixture
+def compiled():
+    return {
+        "datasets": {"bigfoot": {"file": "bigfoot_sightings.csv"}},
+        "plots": [
+            {
+                "type": "histogram",
+                "data": "bigfoot",
+                "x": {"field": "temperature_mid"},
+                "row_start": 0,
+                "row_end": 1,
+                "column_start": 0,
+                "column_end": 1,
+            }
+        ],
+    }
+
+
+@pytest.fixture
+def compiled_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    return os.path.join(str(tmp_path), "compiled")
+
+
+def test_compiled_key():
+    """ Tests that the compiled_key function depends on the source and the
+        additional datasets, but not on the order of the datasets.
+    """
+    source = "HISTOGRAM bigfoot X temperature_mid"
+    datasets = {"bigfoot": "bigfoot.csv", "mothman": "mothman.csv"}
+
+    key = compiled_key(source, datasets)
+
+    assert key == compiled_key(
+        source, {"mothman": "mothman.csv", "bigfoot": "bigfoot.csv"}
+    )
+    assert key != compiled_key(source + " BINS 10", datasets)
+    assert key != compiled_key(source, {"bigfoot": "bigfoot.csv"})
+
+
+@pytest.mark.parametrize("resource", ["compiler.py", "errors.py"])
+def test_compiled_key_compiler(resource, monkeypatch):
+    """ Tests that the compiled_key function depends on the compiler's checks
+        and error messages, which are part of the compiled program.
+    """
+    source = "HISTOGRAM bigfoot X temperature_mid"
+    key = compiled_key(source, {})
+    get_data = pkgutil.get_data
+
+    def edited_get_data(package, name):
+        data = get_data(package, name)
+        return data + b"# Edited." if name == resource else data
+
+    monkeypatch.setattr(
+        "svl.compiler.compile_cache.pkgutil.get_data", edited_get_data
+    )
+
+    assert key != compiled_key(source, {})
+
+
+def test_load_compiled(compiled, compiled_dir):
+    """ Tests that the load_compiled function returns a stored compiled
+        program.
+    """
+    store_compiled("key", compiled)
+    answer = load_compiled("key")
+
+    assert compiled == answer
+
+
+def test_load_compiled_missing(compiled_dir):
+    """ Tests that the load_compiled function returns None for a key that
+        isn't in the cache.
+    """
+    assert load_compiled("key") is None
+
+
+def test_evict_compiled(compiled, compiled_dir):
+    """ Tests that the evict_compiled function evicts the least recently used
+        entries first.
+    """
+    for key in ["a", "b", "c"]:
+        store_compiled(key, compiled)
+    entry_size = os.path.getsize(os.path.join(compiled_dir, "a.json"))
+
+    # Set explicit access times so the order doesn't depend on the file
+    # system's timestamp resolution.
+    for access_time, key in enumerate(["b", "a", "c"]):
+        path = os.path.join(compiled_dir, "{}.json".format(key))
+        os.utime(path, (access_time, access_time))
+
+    evict_compiled(max_bytes=2 * entry_size)
+
+    assert ["a.json", "c.json"] == sorted(os.listdir(compiled_dir))
+
+
+def test_store_compiled_evicts(compiled, compiled_dir):
+    """ Tests that the store_compiled function keeps the cache within the
+        maximum size.
+    """
+    store_compiled("a", compiled)
+    entry_size = os.path.getsize(os.path.join(compiled_dir, "a.json"))
+    os.utime(os.path.join(compiled_dir, "a.json"), (0, 0))
+
+    store_compiled("b", compiled, max_bytes=entry_size)
+
+    assert ["b.json"] == os.listdir(compiled_dir)
@@ -1,9 +1,20 @@
 import pytest
 import os
+import shutil
+import subprocess
+import sys
 
 from jinja2 import Environment, BaseLoader
 
-from svl.compiler.compiler import _extract_additional_datasets, svl
+from svl.compiler.compiler import (
+    _extract_additional_datasets,
+    compile_program,
+    execute_plan,
+    load_datasets,
+    plan_program,
+    render_result,
+    svl,
+)
 from svl.compiler.errors import (
     SvlSyntaxError,
     SvlMissingFileError,
@@ -11,6 +22,13 @@ from svl.compiler.errors import (
     SvlDataLoadError,
     SvlDataProcessingError,
 )
+from svl.data_sources.sqlite import (
+    LOAD_BATCH_ROWS,
+    _insert_batch,
+    rows_to_svl_data,
+    run_query,
+    svl_to_sql,
+)
 
 
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -69,6 +87,450 @@ def test_svl_datasets(svl_source):
     )
 
 
+def test_svl_compile_cache(svl_source, tmp_path, monkeypatch):
+    """ Tests that the svl function reuses the compiled program from the
+        compile cache when compile_cache is specified.
+    """
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    truth = svl(svl_source, compile_cache=True)
+
+    # A cache hit can't parse.
+    def _parse_svl(*args, **kwargs):
+        raise AssertionError("parse_svl called on a compile cache hit.")
+
+    monkeypatch.setattr("svl.compiler.ast.parse_svl", _parse_svl)
+    answer = svl(svl_source, compile_cache=True)
+
+    assert truth == answer
+
+
+def test_svl_compile_cache_missing_file(tmp_path, monkeypatch):
+    """ Tests that the svl function raises a SvlMissingFileError on a compile
+        cache hit when a file dataset no longer exists.
+    """
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    data_path = os.path.join(str(tmp_path), "bigfoot_sightings.csv")
+    shutil.copy(
+        os.path.join(CURRENT_DIR, "test_datasets", "bigfoot_sightings.csv"),
+        data_path,
+    )
+    svl_source = """
+    DATASETS bigfoot "{}"
+    HISTOGRAM bigfoot X temperature_mid
+    """.format(
+        data_path
+    )
+
+    svl(svl_source, compile_cache=True)
+    os.remove(data_path)
+
+    with pytest.raises(SvlMissingFileError, match="File"):
+        svl(svl_source, compile_cache=True)
+
+
+def test_execute_plan_dataset_cache(tmp_path, monkeypatch):
+    """ Tests that the execute_plan function attaches the files loaded before
+        from the dataset cache when dataset_cache is specified, and loads
+        them again once they change.
+    """
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    data_path = os.path.join(str(tmp_path), "bigfoot_sightings.csv")
+    shutil.copy(
+        os.path.join(CURRENT_DIR, "test_datasets", "bigfoot_sightings.csv"),
+        data_path,
+    )
+    svl_source = """
+    DATASETS
+        bigfoot "{}"
+        recent_bigfoot SQL "SELECT * FROM bigfoot WHERE date > '2008'"
+    BAR bigfoot X classification Y temperature_mid AVG
+    NUMBER recent_bigfoot VALUE humidity AVG
+    """.format(
+        data_path
+    )
+    plan = plan_program(compile_program(svl_source))
+
+    truth = execute_plan(plan, dataset_cache=True)
+
+    # A cache hit can't read the file.
+    def file_batches(*args, **kwargs):
+        raise AssertionError("file_batches called on a dataset cache hit.")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("svl.data_sources.sqlite.file_batches", file_batches)
+        answer = execute_plan(plan, dataset_cache=True)
+
+    assert truth.data == answer.data
+    assert truth.stats["datasets_cached"] == 0
+    assert answer.stats["datasets_cached"] == 1
+
+    os.utime(data_path, (0, 0))
+    assert execute_plan(plan, dataset_cache=True).stats["datasets_cached"] == 0
+
+
+def test_compile_program(svl_source):
+    """ Tests that the compile_program function returns the datasets and the
+        positioned plots.
+    """
+    answer = compile_program(svl_source)
+
+    assert list(answer.datasets) == ["bigfoot"]
+    assert len(answer.plots) == 1
+    assert answer.plots[0]["type"] == "histogram"
+    assert answer.plots[0]["row_end"] == 1
+
+
+def test_compile_program_missing_field():
+    """ Tests that the compile_program function raises a SvlPlotError for a
+        field that isn't a column of a file or SQL dataset, without loading
+        the data.
+    """
+    svl_source = """
+    DATASETS
+        bigfoot "{}/test_datasets/bigfoot_sightings.csv"
+        class_counts SQL
+            "SELECT classification, COUNT(*) AS n FROM bigfoot
+            GROUP BY classification"
+    BAR class_counts X classification Y number
+    """.format(
+        CURRENT_DIR
+    )
+
+    with pytest.raises(
+        SvlPlotError, match="Field number is not a column of class_counts"
+    ):
+        compile_program(svl_source)
+
+    # Fields are compared case insensitively, like SQLite does.
+    compile_program(svl_source.replace("Y number", "Y N"))
+
+
+def test_plan_program(svl_source):
+    """ Tests that the plan_program function generates a query per plot.
+    """
+    program = compile_program(svl_source)
+
+    truth = [svl_to_sql(plot) for plot in program.plots]
+    answer = plan_program(program)
+
+    assert program == answer.program
+    assert truth == answer.queries
+
+
+def test_staged_svl(svl_source):
+    """ Tests that running the stages one by one renders the same page as
+        the svl function, reusing the loaded datasets across executions.
+    """
+    truth = svl(svl_source)
+
+    plan = plan_program(compile_program(svl_source))
+    conn = load_datasets(plan.program)
+    result = execute_plan(plan, conn)
+    answer = render_result(result)
+
+    assert truth == answer
+    assert result.data == execute_plan(plan, conn).data
+
+
+def test_execute_plan_shared_queries():
+    """ Tests that the execute_plan function runs identical queries once and
+        gives every plot its data under its own column names.
+    """
+    svl_source = """
+    DATASETS bigfoot "{}/test_datasets/bigfoot_sightings.csv"
+    BAR bigfoot X classification Y number COUNT TITLE "Sightings"
+    BAR bigfoot X classification Y number COUNT TITLE "Sightings again"
+    HISTOGRAM bigfoot X temperature_mid
+    HISTOGRAM bigfoot Y temperature_mid
+    PIE bigfoot AXIS classification
+    """.format(
+        CURRENT_DIR
+    )
+
+    plan = plan_program(compile_program(svl_source))
+    conn = load_datasets(plan.program)
+
+    answer = execute_plan(plan, conn)
+
+    truth_data = [
+        rows_to_svl_data(plot, run_query(query, conn))
+        for plot, query in zip(plan.program.plots, plan.queries)
+    ]
+    assert truth_data == answer.data
+    assert {"queries": 3, "queries_saved": 2, "shared_scans": 0} == (
+        answer.stats
+    )
+
+
+def test_execute_plan_shared_scans():
+    """ Tests that the execute_plan function gives the same data with the
+        plots over the same dataset and filter reading a shared scan.
+    """
+    svl_source = """
+    DATASETS bigfoot "{}/test_datasets/bigfoot_sightings.csv"
+    BAR bigfoot X classification Y number COUNT FILTER "humidity > 0.5"
+    HISTOGRAM bigfoot X temperature_mid FILTER "humidity > 0.5"
+    NUMBER bigfoot VALUE humidity AVG FILTER "humidity > 0.5"
+    NUMBER bigfoot VALUE humidity AVG
+    """.format(
+        CURRENT_DIR
+    )
+
+    program = compile_program(svl_source)
+    conn = load_datasets(program)
+    plan = plan_program(program)
+
+    truth = execute_plan(plan_program(program, fuse_scans=False), conn)
+    answer = execute_plan(plan, conn)
+
+    assert len(plan.shared_scans) == 1
+    assert truth.data == answer.data
+    assert answer.stats["shared_scans"] == 1
+    # The shared scan is dropped afterwards.
+    assert [] == conn.execute(
+        "SELECT name FROM sqlite_temp_master WHERE type = 'table'"
+    ).fetchall()
+
+
+def test_execute_plan_load_workers():
+    """ Tests that the execute_plan function gives the same data with the
+        datasets parsed by a pool of processes.
+    """
+    svl_source = """
+    DATASETS
+        bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+        bigfoot_parquet "{0}/test_datasets/bigfoot_sightings.parquet"
+    BAR bigfoot X classification Y number COUNT
+    HISTOGRAM bigfoot_parquet X temperature_mid FILTER "humidity > 0.5"
+    """.format(
+        CURRENT_DIR
+    )
+    plan = plan_program(compile_program(svl_source))
+
+    truth = execute_plan(plan, load_workers=1)
+    answer = execute_plan(plan, load_workers=2)
+
+    assert truth.data == answer.data
+    assert answer.stats["datasets_loaded"] == 2
+
+
+@pytest.mark.parametrize("load_workers", [None, 2])
+def test_svl_unguarded_script(tmp_path, load_workers):
+    """ Tests that the svl function works in a script without an
+        if __name__ == "__main__" guard, which the processes of a pool
+        can't be spawned from.
+    """
+    script = tmp_path / "dashboard.py"
+    script.write_text(
+        "from svl import svl\n"
+        "html = svl(\n"
+        "    'DATASETS bigfoot \"{}/test_datasets/bigfoot_sightings.csv\" '\n"
+        "    'BAR bigfoot X classification Y number COUNT',\n"
+        "    load_workers={},\n"
+        ")\n"
+        "print('rendered' if 'classification' in html else 'missing')\n"
+        "".format(CURRENT_DIR, load_workers)
+    )
+
+    process = subprocess.run(
+        [sys.executable, str(script)],
+        cwd=str(tmp_path),
+        stdout=subprocess.PIPE,
+        timeout=120,
+    )
+
+    assert process.returncode == 0
+    # Each process spawned for the pool runs the script too, and fails.
+    assert process.stdout.decode("utf-8").split() == ["rendered"]
+
+
+@pytest.fixture
+def batch_sizes(monkeypatch):
+    """ Records the number of rows in each batch inserted into the database.
+    """
+    sizes = []
+
+    def _record_batch(conn, table_name, batch, *args, **kwargs):
+        sizes.append(len(batch))
+        return _insert_batch(conn, table_name, batch, *args, **kwargs)
+
+    monkeypatch.setattr(
+        "svl.data_sources.sqlite._insert_batch", _record_batch
+    )
+    return sizes
+
+
+def test_execute_plan_chunk_rows(batch_sizes):
+    """ Tests that the execute_plan function loads the files chunk_rows rows
+        at a time.
+    """
+    svl_source = """
+    DATASETS
+        bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+    BAR bigfoot X classification Y number COUNT
+    """.format(
+        CURRENT_DIR
+    )
+    plan = plan_program(compile_program(svl_source))
+
+    truth = execute_plan(plan)
+    del batch_sizes[:]
+    answer = execute_plan(plan, chunk_rows=10)
+
+    assert truth.data == answer.data
+    assert len(batch_sizes) > 1
+    assert max(batch_sizes) == 10
+
+
+def test_execute_plan_memory_budget(batch_sizes):
+    """ Tests that the execute_plan function loads the files in batches that
+        fit the memory budget.
+    """
+    svl_source = """
+    DATASETS
+        bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+    BAR bigfoot X classification Y number COUNT
+    """.format(
+        CURRENT_DIR
+    )
+    plan = plan_program(compile_program(svl_source))
+
+    truth = execute_plan(plan)
+    del batch_sizes[:]
+    answer = execute_plan(plan, memory_budget=2000)
+
+    assert truth.data == answer.data
+    assert 1 < max(batch_sizes) < LOAD_BATCH_ROWS
+
+
+def test_svl_chunk_rows(svl_source, batch_sizes):
+    """ Tests that the svl function passes chunk_rows on to the loading.
+    """
+    svl(svl_source, chunk_rows=10)
+
+    assert len(batch_sizes) > 1
+    assert max(batch_sizes) == 10
+
+
+def test_execute_plan_number_aggregates():
+    """ Tests that the execute_plan function gives the same data with the
+        NUMBER plots over a dataset computed in one query.
+    """
+    svl_source = """
+    DATASETS bigfoot "{}/test_datasets/bigfoot_sightings.csv"
+    NUMBER bigfoot VALUE humidity AVG
+    NUMBER bigfoot VALUE humidity AVG TITLE "Again"
+    NUMBER bigfoot VALUE temperature_mid MAX FILTER "humidity > 0.5"
+    NUMBER bigfoot VALUE number COUNT FILTER "classification = 'Class A'"
+    """.format(
+        CURRENT_DIR
+    )
+
+    program = compile_program(svl_source)
+    conn = load_datasets(program)
+
+    truth = execute_plan(plan_program(program, fuse_numbers=False), conn)
+    answer = execute_plan(plan_program(program), conn)
+
+    assert truth.data == answer.data
+    assert truth.stats["queries"] == 3
+    assert answer.stats["queries"] == 1
+
+
+def test_execute_plan_dead_datasets():
+    """ Tests that the execute_plan function only loads the datasets the plots
+        read from and reports the loading statistics.
+    """
+    svl_source = """
+    DATASETS
+        bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+        recent_bigfoot SQL "SELECT * FROM bigfoot WHERE date > '2008'"
+        unused "{0}/test_datasets/bigfoot_sightings.csv"
+        broken SQL "SELECT nope FROM nowhere"
+    NUMBER recent_bigfoot VALUE humidity AVG
+    """.format(
+        CURRENT_DIR
+    )
+
+    answer = execute_plan(plan_program(compile_program(svl_source)))
+
+    assert answer.stats["datasets_loaded"] == 2
+    assert answer.stats["datasets_skipped"] == 2
+    assert 0 < answer.stats["load_critical_path_seconds"]
+    assert (
+        answer.stats["load_critical_path_seconds"]
+        <= answer.stats["load_seconds"]
+    )
+
+
+def test_execute_plan_dataset_filter():
+    """ Tests that the execute_plan function gives the same data whether a
+        filter is on the plots or on the dataset.
+    """
+    svl_source = """
+    DATASETS
+        bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+        recent_bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+            FILTER "date > '2008-01-01'"
+    BAR bigfoot X classification Y number COUNT FILTER "date > '2008-01-01'"
+    NUMBER bigfoot VALUE humidity AVG FILTER "date > '2008-01-01'"
+    BAR recent_bigfoot X classification Y number COUNT
+    NUMBER recent_bigfoot VALUE humidity AVG
+    """.format(
+        CURRENT_DIR
+    )
+
+    answer = execute_plan(plan_program(compile_program(svl_source)))
+
+    assert answer.data[0] == answer.data[2]
+    assert answer.data[1] == answer.data[3]
+
+
+@pytest.mark.parametrize("load_workers", [1, 2])
+def test_execute_plan_qualified_filter(load_workers):
+    """ Tests that the execute_plan function loads the rows matching dataset
+        and plot filters that qualify the columns with the dataset's name.
+    """
+    svl_source = """
+    DATASETS
+        bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+        recent_bigfoot "{0}/test_datasets/bigfoot_sightings.csv"
+            FILTER "recent_bigfoot.date > '2008-01-01'"
+    NUMBER bigfoot VALUE number COUNT FILTER "bigfoot.date > '2008-01-01'"
+    NUMBER recent_bigfoot VALUE number COUNT
+    NUMBER bigfoot VALUE number COUNT
+    """.format(
+        CURRENT_DIR
+    )
+    # Only the plots over bigfoot that share the filter get it pushed down.
+    pushed_source = svl_source.replace(
+        "    NUMBER bigfoot VALUE number COUNT\n", ""
+    )
+
+    answer = execute_plan(
+        plan_program(compile_program(svl_source)), load_workers=load_workers
+    )
+    pushed_answer = execute_plan(
+        plan_program(compile_program(pushed_source)),
+        load_workers=load_workers,
+    )
+
+    assert answer.data[0] == answer.data[1]
+    assert answer.data[0] != answer.data[2]
+    assert pushed_answer.data == answer.data[:2]
+
+
+def test_execute_plan_data_processing_error(svl_source):
+    """ Tests that the execute_plan function raises a SvlDataProcessingError
+        when a query fails.
+    """
+    plan = plan_program(compile_program(svl_source))
+    plan = plan._replace(queries=["SELECT nope FROM bigfoot"])
+
+    with pytest.raises(SvlDataProcessingError, match="Error processing"):
+        execute_plan(plan)
+
+
 def test_svl_debug(svl_source):
     """ Tests that the svl function works when the debug option is specified.
     """
@@ -83,6 +545,42 @@ def test_svl_offline_js(svl_source):
     svl(svl_source, offline_js=True)
 
 
+def test_svl_compact_layout():
+    """ Tests that the svl function lays the plots out on merged tracks when
+        the compact layout is selected.
+    """
+    svl_source = """
+    DATASETS bigfoot "{}/test_datasets/bigfoot_sightings.csv"
+    CONCAT(
+        (
+            NUMBER bigfoot VALUE temperature_mid AVG
+            NUMBER bigfoot VALUE temperature_mid MIN
+            NUMBER bigfoot VALUE temperature_mid MAX
+        )
+        (
+            NUMBER bigfoot VALUE humidity AVG
+            NUMBER bigfoot VALUE humidity MAX
+        )
+    )
+    """.format(
+        CURRENT_DIR
+    )
+
+    grid = svl(svl_source)
+    compact = svl(svl_source, layout="compact")
+
+    assert "repeat(6, minmax(300px" in grid
+    assert "grid-template-rows: minmax(600px" in compact
+
+
+def test_svl_layout_error(svl_source):
+    """ Tests that the svl function raises a ValueError when the layout isn't
+        supported.
+    """
+    with pytest.raises(ValueError, match="layout"):
+        svl(svl_source, layout="masonry")
+
+
 def test_svl_dataset_error(svl_source):
     """ Tests that the svl function raises a ValueError when the additional
         datasets are incorrectly specified.
@@ -141,7 +639,7 @@ def test_svl_data_load_error():
         bigfoot "{}/test_datasets/bigfoot_sightings.csv"
         bigfoot_failure SQL "SELECT date FROM bigfoots"
 
-    HISTOGRAM bigfoot
+    HISTOGRAM bigfoot_failure
         X temperature_mid BINS 25
     """.format(
         CURRENT_DIR
@@ -178,3 +676,23 @@ def test_svl_not_implemented_error(svl_source):
     """
     with pytest.raises(NotImplementedError, match="Unable to use"):
         svl(svl_source, backend="vega")
+
+
+def test_execute_plan_duplicate_header(tmpdir):
+    """ Tests that the execute_plan function loads the columns a plot uses
+        from a CSV whose header repeats a name.
+    """
+    csv_file = tmpdir.join("duplicates.csv")
+    # c isn't used, so only some of the columns are loaded.
+    csv_file.write("a,a,b,c\n1,2,3,0\n4,5,6,0\n")
+    svl_source = """
+    DATASETS d "{}"
+    NUMBER d VALUE a SUM
+    NUMBER d VALUE b SUM
+    """
+
+    answer = execute_plan(
+        plan_program(compile_program(svl_source.format(csv_file)))
+    )
+
+    assert [{"value": 5}, {"value": 9}] == answer.data
@@ -0,0 +1,151 @@
+import os
+import shutil
+import sqlite3
+import pytest
+
+from svl.data_sources.dataset_cache import (
+    attach_dataset,
+    cached_dataset,
+    dataset_key,
+    evict_datasets,
+    store_dataset,
+)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture
+def datasets_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("SVL_CACHE_DIR", str(tmp_path))
+    return os.path.join(str(tmp_path), "datasets")
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = os.path.join(str(tmp_path), "bigfoot_sightings.csv")
+    shutil.copy(
+        os.path.join(CURRENT_DIR, "test_datasets", "bigfoot_sightings.csv"),
+        path,
+    )
+    return path
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE bigfoot (classification TEXT, humidity REAL);")
+    with conn:
+        conn.executemany(
+            "INSERT INTO bigfoot VALUES (?, ?);",
+            [("Class A", 0.5), ("Class B", None), ("Class A", 0.75)],
+        )
+    return conn
+
+
+def test_dataset_key(data_file):
+    """ Tests that the dataset_key function depends on the file's version
+        and the columns and rows loaded from it.
+    """
+    spec = {"file": data_file}
+    key = dataset_key(spec)
+
+    assert key == dataset_key(dict(spec))
+    assert key != dataset_key(dict(spec, columns=["humidity"]))
+    assert key != dataset_key(dict(spec, filter="humidity > 0.5"))
+
+    os.utime(data_file, (0, 0))
+    assert key != dataset_key(spec)
+
+
+def test_dataset_key_content_hash(data_file):
+    """ Tests that the dataset_key function with content_hash depends on the
+        contents of the file rather than its modification time.
+    """
+    spec = {"file": data_file}
+    key = dataset_key(spec, content_hash=True)
+
+    os.utime(data_file, (0, 0))
+    assert key == dataset_key(spec, content_hash=True)
+
+    with open(data_file, "r+") as f:
+        # Same size, different contents.
+        f.write("X")
+    os.utime(data_file, (0, 0))
+    assert key != dataset_key(spec, content_hash=True)
+
+
+def test_dataset_key_missing_file(tmp_path):
+    """ Tests that the dataset_key function raises an OSError for a file that
+        doesn't exist.
+    """
+    with pytest.raises(OSError):
+        dataset_key({"file": os.path.join(str(tmp_path), "nope.csv")})
+
+
+def test_attach_dataset(conn, datasets_dir):
+    """ Tests that the attach_dataset function makes a stored dataset
+        available under its name, with the same rows and column types.
+    """
+    store_dataset("key", conn, "bigfoot")
+    truth = conn.execute(
+        "SELECT classification, typeof(humidity), humidity FROM bigfoot;"
+    ).fetchall()
+
+    attached = sqlite3.connect(":memory:")
+    assert attach_dataset(attached, "bigfoot", cached_dataset("key"))
+    answer = attached.execute(
+        "SELECT classification, typeof(humidity), humidity FROM bigfoot;"
+    ).fetchall()
+
+    assert truth == answer
+
+
+def test_attach_dataset_not_cached(conn, tmp_path):
+    """ Tests that the attach_dataset function doesn't attach a database
+        that isn't a cached dataset.
+    """
+    path = os.path.join(str(tmp_path), "empty.sqlite")
+
+    assert not attach_dataset(conn, "empty", path)
+    assert [("main", "")] == [
+        (name, path) for _, name, path in conn.execute("PRAGMA database_list;")
+    ]
+
+
+def test_cached_dataset_missing(datasets_dir):
+    """ Tests that the cached_dataset function returns None for a key that
+        isn't in the cache.
+    """
+    assert cached_dataset("key") is None
+
+
+def test_store_dataset_evicts(conn, datasets_dir):
+    """ Tests that the store_dataset function keeps the cache within the
+        maximum size, evicting the least recently used entries first.
+    """
+    store_dataset("a", conn, "bigfoot")
+    entry_size = os.path.getsize(os.path.join(datasets_dir, "a.sqlite"))
+    os.utime(os.path.join(datasets_dir, "a.sqlite"), (0, 0))
+
+    store_dataset("b", conn, "bigfoot", max_bytes=entry_size)
+
+    assert ["b.sqlite"] == os.listdir(datasets_dir)
+
+
+def test_evict_datasets(conn, datasets_dir):
+    """ Tests that the evict_datasets function evicts the least recently used
+        entries first.
+    """
+    for key in ["a", "b", "c"]:
+        store_dataset(key, conn, "bigfoot")
+    entry_size = os.path.getsize(os.path.join(datasets_dir, "a.sqlite"))
+
+    # Set explicit access times so the order doesn't depend on the file
+    # system's timestamp resolution.
+    for access_time, key in enumerate(["b", "a", "c"]):
+        path = os.path.join(datasets_dir, "{}.sqlite".format(key))
+        os.utime(path, (access_time, access_time))
+
+    evict_datasets(max_bytes=2 * entry_size)
+
+    assert ["a.sqlite", "c.sqlite"] == sorted(os.listdir(datasets_dir))
@@ -0,0 +1,258 @@
+import os
+
+from collections import OrderedDict
+
+from svl.compiler.dataset_graph import (
+    critical_path,
+    dataset_columns,
+    dataset_graph,
+    live_datasets,
+    load_order,
+    project_datasets,
+    push_down_filters,
+    sql_identifiers,
+    table_references,
+)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_CSV_FILE = os.path.join(
+    CURRENT_DIR, "test_datasets", "bigfoot_sightings.csv"
+)
+
+SVL_DATASETS = {
+    "recent_class_a": {
+        "sql": "SELECT * FROM Recent_Bigfoot WHERE classification = 'Class A'"
+    },
+    "recent_bigfoot": {
+        "sql": "SELECT * FROM bigfoot WHERE date >= '2008-01-01'"
+    },
+    "bigfoot": {"file": "bigfoot_sightings.csv"},
+    "cities": {"file": "cities.csv"},
+}
+
+
+def test_table_references():
+    """ Tests that the table_references function finds the dataset names in
+        the identifiers of the statement, but not in strings or comments.
+    """
+    sql = """
+    SELECT b.date, "cities".name -- from towns
+    FROM bigfoot AS b JOIN [cities] ON b.city = cities.name
+    WHERE b.name != 'towns' /* and villages */
+    """
+    names = ["villages", "cities", "towns", "bigfoot", "Date"]
+
+    truth = ["cities", "bigfoot", "Date"]
+    answer = table_references(sql, names)
+
+    assert truth == answer
+
+
+def test_sql_identifiers():
+    """ Tests that the sql_identifiers function only reports a wildcard when
+        the statement selects all columns.
+    """
+    assert {"select", "count", "from", "bigfoot"} == sql_identifiers(
+        "SELECT COUNT(*) FROM bigfoot"
+    )
+    assert {"select", "latitude", "from", "bigfoot"} == sql_identifiers(
+        "SELECT latitude * 2 FROM bigfoot"
+    )
+    assert "*" in sql_identifiers("SELECT b.* FROM bigfoot AS b")
+    assert "*" in sql_identifiers("SELECT /* everything */ * FROM bigfoot")
+
+
+def test_dataset_graph():
+    """ Tests that the dataset_graph function returns the correct value.
+    """
+    truth = OrderedDict(
+        [
+            ("recent_class_a", ["recent_bigfoot"]),
+            ("recent_bigfoot", ["bigfoot"]),
+            ("bigfoot", []),
+            ("cities", []),
+        ]
+    )
+    answer = dataset_graph(SVL_DATASETS)
+
+    assert truth == answer
+
+
+def test_live_datasets():
+    """ Tests that the live_datasets function keeps the datasets the plots
+        read from, directly or through SQL datasets.
+    """
+    svl_plots = [{"data": "recent_class_a"}, {"data": "recent_class_a"}]
+
+    truth = {
+        name: SVL_DATASETS[name]
+        for name in ["recent_class_a", "recent_bigfoot", "bigfoot"]
+    }
+    answer = live_datasets(SVL_DATASETS, svl_plots)
+
+    assert truth == answer
+
+
+def test_load_order():
+    """ Tests that the load_order function puts datasets after their
+        dependencies and cycles last.
+    """
+    graph = dataset_graph(SVL_DATASETS)
+    graph["loop_a"] = ["loop_b"]
+    graph["loop_b"] = ["loop_a"]
+
+    truth = [
+        "bigfoot",
+        "cities",
+        "recent_bigfoot",
+        "recent_class_a",
+        "loop_a",
+        "loop_b",
+    ]
+    answer = load_order(graph)
+
+    assert truth == answer
+
+
+def test_critical_path():
+    """ Tests that the critical_path function returns the longest chain of
+        dependent load times.
+    """
+    graph = dataset_graph(SVL_DATASETS)
+    durations = {
+        "recent_class_a": 1.0,
+        "recent_bigfoot": 2.0,
+        "bigfoot": 3.0,
+        "cities": 5.0,
+    }
+
+    assert 6.0 == critical_path(graph, durations)
+    assert 0.0 == critical_path(OrderedDict(), {})
+
+
+def test_project_datasets():
+    """ Tests that the project_datasets function records the file columns
+        the plots and SQL datasets refer to.
+    """
+    svl_datasets = {
+        "bigfoot": {"file": TEST_CSV_FILE},
+        "class_a": {
+            "sql": "SELECT date, COUNT(*) AS n FROM bigfoot "
+            "WHERE classification = 'Class A' GROUP BY date"
+        },
+        "everything": {"file": TEST_CSV_FILE},
+    }
+    svl_plots = [
+        {
+            "data": "bigfoot",
+            "x": {"field": "Latitude"},
+            "y": {"transform": "temperature_high - temperature_low"},
+            "filter": "humidity * 2 > 1",
+        },
+        {"data": "class_a", "x": {"field": "date"}, "y": {"field": "n"}},
+        {"data": "everything", "value": {"agg": "COUNT"}},
+    ]
+
+    answer = project_datasets(svl_datasets, svl_plots)
+
+    assert answer["bigfoot"]["columns"] == [
+        "latitude",
+        "date",
+        "classification",
+        "temperature_high",
+        "temperature_low",
+        "humidity",
+    ]
+    assert answer["class_a"] == svl_datasets["class_a"]
+    # Counting rows still needs a column.
+    assert answer["everything"]["columns"] == ["state"]
+
+
+def test_project_datasets_wildcard():
+    """ Tests that the project_datasets function leaves the datasets a SQL
+        dataset selects all columns from alone.
+    """
+    svl_datasets = {
+        "bigfoot": {"file": TEST_CSV_FILE},
+        "recent_bigfoot": {
+            "sql": "SELECT * FROM bigfoot WHERE date > '2008-01-01'"
+        },
+    }
+    svl_plots = [{"data": "recent_bigfoot", "x": {"field": "date"}}]
+
+    assert svl_datasets == project_datasets(svl_datasets, svl_plots)
+
+
+def test_push_down_filters():
+    """ Tests that the push_down_filters function moves a filter shared by
+        all the plots over a file dataset onto the dataset.
+    """
+    svl_datasets = {
+        "bigfoot": {"file": TEST_CSV_FILE, "filter": "humidity > 0.5"},
+        "shared_filter": {"file": TEST_CSV_FILE},
+        "different_filters": {"file": TEST_CSV_FILE},
+        "invalid_filter": {"file": TEST_CSV_FILE},
+        "with_sql": {"file": TEST_CSV_FILE},
+        "class_a": {"sql": "SELECT * FROM with_sql"},
+    }
+    svl_plots = [
+        {"data": "bigfoot", "filter": "date > '2008'"},
+        {"data": "shared_filter", "filter": "date > '2008'"},
+        {"data": "shared_filter", "filter": "date > '2008'"},
+        {"data": "different_filters", "filter": "date > '2008'"},
+        {"data": "different_filters"},
+        {"data": "invalid_filter", "filter": "daet > '2008'"},
+        {"data": "with_sql", "filter": "date > '2008'"},
+        {"data": "class_a"},
+    ]
+
+    truth = dict(
+        svl_datasets,
+        bigfoot={
+            "file": TEST_CSV_FILE,
+            "filter": "(humidity > 0.5) AND (date > '2008')",
+        },
+        shared_filter={"file": TEST_CSV_FILE, "filter": "date > '2008'"},
+    )
+    answer = push_down_filters(svl_datasets, svl_plots)
+
+    assert truth == answer
+
+
+def test_push_down_filters_qualified():
+    """ Tests that the push_down_filters function moves a filter that
+        qualifies the columns with the dataset's name onto the dataset.
+    """
+    svl_datasets = {"bigfoot": {"file": TEST_CSV_FILE}}
+    svl_plots = [{"data": "bigfoot", "filter": "bigfoot.date > '2008'"}]
+
+    truth = {
+        "bigfoot": {"file": TEST_CSV_FILE, "filter": "bigfoot.date > '2008'"}
+    }
+    answer = push_down_filters(svl_datasets, svl_plots)
+
+    assert truth == answer
+
+
+def test_dataset_columns():
+    """ Tests that the dataset_columns function works out the columns of file
+        and SQL datasets from the file headers.
+    """
+    svl_datasets = {
+        "class_counts": {
+            "sql": "SELECT classification, COUNT(*) AS n FROM bigfoot "
+            "GROUP BY classification"
+        },
+        "bigfoot": {"file": TEST_CSV_FILE},
+        "broken": {"sql": "SELECT nope FROM bigfoot"},
+        "missing": {"file": "missing.csv"},
+        "from_missing": {"sql": "SELECT * FROM missing"},
+    }
+
+    answer = dataset_columns(svl_datasets)
+
+    assert answer["class_counts"] == ["classification", "n"]
+    assert answer["bigfoot"][:3] == ["state", "latitude", "longitude"]
+    assert answer["broken"] is None
+    assert answer["missing"] is None
+    assert answer["from_missing"] is None
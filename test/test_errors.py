@@ -1,13 +1,21 @@
 import pytest
 
+from lark import UnexpectedInput
+
 from svl.compiler.errors import (
+    SVL_SYNTAX_ERRORS,
     SvlSyntaxError,
     SvlMissingValue,
     SvlMissingParen,
     SvlTypeError,
     SvlUnsupportedDeclaration,
 )
-from svl.compiler.ast import parse_svl
+from svl.compiler.ast import (
+    parse_svl,
+    get_parser,
+    get_syntax_error_classifier,
+    classify_syntax_error,
+)
 
 
 def test_missing_dataset_definition():
@@ -528,3 +536,39 @@ def test_color_by_on_wrong_chart():
     # TODO Make this exception more specific if possible.
     with pytest.raises(SvlSyntaxError):
         parse_svl(svl_string)
+
+
+@pytest.mark.parametrize(
+    "svl_string",
+    [
+        malformed
+        for examples in SVL_SYNTAX_ERRORS.values()
+        for malformed in examples
+    ]
+    + [
+        """
+        DATASETS bigfoot "data/bigfoot_sightings.csv"
+        LINE bigfoot X X date BY YEAR Y report_number COUNT
+        """,
+        "DATASETS",
+        "CONCAT(",
+        "HISTOGRAM bigfoot X temperature_mid BINS 10 BINS",
+        "PIE bigfoot AXIS has_location HOLE",
+        "BAR bigfoot X classification Y classification COUNT SORT",
+        "LINE bigfoot X date Y @@@",
+        "SCATTER bigfoot X latitude Y longitude COLOR BY",
+    ],
+)
+def test_classify_syntax_error(svl_string):
+    """ Tests that the precomputed syntax error classifier labels errors the
+        same way as matching against the examples on every error.
+    """
+    parser = get_parser()
+
+    with pytest.raises(UnexpectedInput) as e:
+        parser.parse(svl_string)
+
+    truth = e.value.match_examples(parser.parse, SVL_SYNTAX_ERRORS)
+    answer = classify_syntax_error(get_syntax_error_classifier(), e.value)
+
+    assert truth == answer
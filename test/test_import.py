@@ -0,0 +1,99 @@
+import pytest
+import subprocess
+import sys
+
+import svl
+
+# Importing svl takes about 30ms, so this leaves room for slower machines but
+# not for a dependency like multiprocessing (which took it to over 90ms).
+IMPORT_TIME_BUDGET_US = 60000
+
+# Dependencies (and modules of svl) that are only needed on specific code
+# paths.
+LAZY_DEPENDENCIES = [
+    "pandas",
+    "jinja2",
+    "lark",
+    "pkg_resources",
+    "importlib_resources",
+    "multiprocessing",
+    "concurrent.futures",
+    "svl.compiler.compile_cache",
+    "svl.data_sources.dataset_cache",
+]
+
+NO_SUBPROCESS_IMPORT = """
+import subprocess
+
+
+class _NoPopen(subprocess.Popen):
+    def __init__(self, args, *positional, **kwargs):
+        raise AssertionError("import svl spawned {}".format(args))
+
+
+subprocess.Popen = _NoPopen
+
+import svl
+"""
+
+
+def test_import_spawns_no_subprocess():
+    """ Tests that importing svl doesn't spawn any subprocesses (in
+        particular, that versioneer doesn't run git).
+    """
+    subprocess.run([sys.executable, "-c", NO_SUBPROCESS_IMPORT], check=True)
+
+
+def test_version():
+    """ Tests that the version is resolved when it's accessed.
+    """
+    assert isinstance(svl.__version__, str)
+    assert svl.__version__
+
+
+def _import_times(module):
+    """ Imports the module in a new interpreter with -X importtime and
+        returns the cumulative import time in microseconds of each module
+        imported along the way.
+    """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stderr
+
+    import_times = {}
+    for line in stderr.splitlines():
+        # import time: <self us> | <cumulative us> | <indented module name>
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        import_times[fields[2].strip()] = int(fields[1])
+
+    return import_times
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="-X importtime requires Python 3.7"
+)
+@pytest.mark.parametrize("module", ["svl", "svl.cli"])
+def test_import_lazy_dependencies(module):
+    """ Tests that importing svl doesn't import dependencies that are only
+        needed to parse, load data, or render.
+    """
+    import_times = _import_times(module)
+
+    for dependency in LAZY_DEPENDENCIES:
+        assert dependency not in import_times
+
+
+@pytest.mark.skipif(
+    sys.version_info < (3, 7), reason="-X importtime requires Python 3.7"
+)
+def test_import_time_budget():
+    """ Tests that importing svl stays within the import time budget.
+    """
+    import_times = _import_times("svl")
+
+    assert import_times["svl"] < IMPORT_TIME_BUDGET_US
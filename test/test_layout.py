@@ -1,4 +1,10 @@
-from svl.compiler.layout import shift_node_position, tree_to_grid, gcd, lcm
+from svl.compiler.layout import (
+    compact_grid,
+    shift_node_position,
+    tree_to_grid,
+    gcd,
+    lcm,
+)
 
 
 def test_gcd():
@@ -593,3 +599,109 @@ def test_tree_to_grid_doomsday():
     answer = tree_to_grid(tree)
 
     assert truth == answer
+
+
+def test_tree_to_grid_deep():
+    """ Tests that the tree_to_grid function lays out trees nested far deeper
+        than the recursion limit.
+    """
+    depth = 2000
+    tree = {"vcat": [{"plot": depth}, {"plot": depth + 1}]}
+    for level in reversed(range(depth)):
+        tree = {"vcat": [{"plot": level}, tree]}
+
+    # Each level gets half of the rows left over by the levels above it.
+    rows = 2 ** (depth + 1)
+    truth = [
+        {
+            "plot": level,
+            "row_start": rows - rows // 2 ** level,
+            "row_end": rows - rows // 2 ** (level + 1),
+            "column_start": 0,
+            "column_end": 1,
+        }
+        for level in range(depth + 1)
+    ] + [
+        {
+            "plot": depth + 1,
+            "row_start": rows - 1,
+            "row_end": rows,
+            "column_start": 0,
+            "column_end": 1,
+        }
+    ]
+
+    answer = tree_to_grid(tree)
+
+    assert truth == answer
+
+
+def test_compact_grid():
+    """ Tests that the compact_grid function merges the grid rows and columns
+        no plot starts or ends in.
+    """
+    # Seven plots over three: the lcm grid has 21 rows.
+    tree = {
+        "hcat": [
+            {"vcat": [{"plot": ii} for ii in range(7)]},
+            {"vcat": [{"plot": ii} for ii in range(7, 10)]},
+        ]
+    }
+
+    svl_plots = tree_to_grid(tree)
+    answer_plots, answer_row_tracks, answer_column_tracks = compact_grid(
+        svl_plots
+    )
+
+    truth_row_tracks = [3, 3, 1, 2, 3, 2, 1, 3, 3]
+    truth_column_tracks = [1, 1]
+
+    assert max(plot["row_end"] for plot in svl_plots) == 21
+    assert truth_row_tracks == answer_row_tracks
+    assert truth_column_tracks == answer_column_tracks
+    assert answer_plots[0] == {
+        "plot": 0,
+        "row_start": 0,
+        "row_end": 1,
+        "column_start": 0,
+        "column_end": 1,
+    }
+    assert answer_plots[7] == {
+        "plot": 7,
+        "row_start": 0,
+        "row_end": 3,
+        "column_start": 1,
+        "column_end": 2,
+    }
+    # The plots span the same number of grid rows and columns as before.
+    for plot, compacted_plot in zip(svl_plots, answer_plots):
+        assert plot["row_end"] - plot["row_start"] == sum(
+            answer_row_tracks[
+                compacted_plot["row_start"] : compacted_plot["row_end"]
+            ]
+        )
+        assert plot["column_end"] - plot["column_start"] == sum(
+            answer_column_tracks[
+                compacted_plot["column_start"] : compacted_plot["column_end"]
+            ]
+        )
+
+
+def test_compact_grid_coprime_columns():
+    """ Tests that the compact_grid function needs 19 row tracks for columns
+        of 5, 7 and 9 plots, which take 315 rows of the lcm grid.
+    """
+    tree = {
+        "hcat": [
+            {"vcat": [{"plot": ii} for ii in range(start, start + size)]}
+            for start, size in [(0, 5), (5, 7), (12, 9)]
+        ]
+    }
+
+    svl_plots = tree_to_grid(tree)
+    _, answer_row_tracks, answer_column_tracks = compact_grid(svl_plots)
+
+    assert max(plot["row_end"] for plot in svl_plots) == 315
+    assert 19 == len(answer_row_tracks)
+    assert 315 == sum(answer_row_tracks)
+    assert [1, 1, 1] == answer_column_tracks
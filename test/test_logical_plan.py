@@ -0,0 +1,405 @@
+import pytest
+
+from svl.compiler.logical_plan import (
+    canonical_plan,
+    common_subplans,
+    expression,
+    fuse_number_aggregates,
+    fuse_shared_scans,
+    optimize,
+    output_aliases,
+    plan_columns,
+    plot_to_plan,
+    push_down_predicates,
+    push_down_projections,
+    query_plan,
+)
+from svl.data_sources.sqlite import logical_plan_to_sql
+
+from sql_oracles import (
+    svl_to_sql_hist,
+    svl_to_sql_number,
+    svl_to_sql_pie,
+    svl_to_sql_xy,
+)
+
+SVL_TO_SQL = {
+    "line": svl_to_sql_xy,
+    "bar": svl_to_sql_xy,
+    "scatter": svl_to_sql_xy,
+    "histogram": svl_to_sql_hist,
+    "pie": svl_to_sql_pie,
+    "number": svl_to_sql_number,
+}
+
+PLOTS = [
+    {
+        "type": "line",
+        "data": "bigfoot",
+        "x": {"field": "date", "temporal": "YEAR", "label": "Year"},
+        "y": {"field": "number", "agg": "COUNT", "sort": "DESC"},
+        "filter": "date > '1990-01-01'",
+    },
+    {
+        "type": "bar",
+        "data": "bigfoot",
+        "x": {"field": "classification", "sort": "ASC"},
+        "y": {"field": "temperature_mid", "agg": "AVG"},
+        "split_by": {"field": "season"},
+    },
+    {
+        "type": "bar",
+        "data": "bigfoot",
+        "x": {"field": "classification"},
+        "y": {"field": "temperature_mid", "agg": "AVG"},
+        "color_by": {"field": "humidity", "agg": "MAX"},
+    },
+    {
+        "type": "scatter",
+        "data": "bigfoot",
+        "x": {"transform": "latitude * 2"},
+        "y": {"field": "longitude"},
+        "color_by": {"field": "humidity", "color_scale": "Viridis"},
+    },
+    {
+        "type": "scatter",
+        "data": "bigfoot",
+        "x": {"field": "latitude"},
+        "y": {"field": "longitude", "sort": "DESC"},
+        "split_by": {"field": "classification"},
+    },
+    {
+        "type": "histogram",
+        "data": "bigfoot",
+        "y": {"field": "temperature_mid"},
+        "split_by": {"field": "classification"},
+        "bins": 25,
+        "filter": "temperature_mid > 0",
+    },
+    {
+        "type": "pie",
+        "data": "bigfoot",
+        "axis": {"field": "date", "temporal": "MONTH"},
+        "hole": 0.3,
+        "filter": "humidity > 0.5",
+    },
+    {
+        "type": "number",
+        "data": "bigfoot",
+        "value": {"field": "temperature_mid", "agg": "AVG"},
+    },
+    {
+        "type": "number",
+        "data": "bigfoot",
+        "value": {"transform": "MAX(temperature_mid) - MIN(temperature_mid)"},
+        "filter": "classification = 'Class A'",
+    },
+]
+
+
+@pytest.mark.parametrize("svl_plot", PLOTS)
+def test_logical_plan_to_sql(svl_plot):
+    """ Tests that lowering the optimized logical plan of a plot produces the
+        same query as building it from the plot directly.
+    """
+    truth = SVL_TO_SQL[svl_plot["type"]](svl_plot)
+    answer = logical_plan_to_sql(optimize([plot_to_plan(svl_plot)])[0])
+
+    assert truth == answer
+
+
+def test_expression():
+    """ Tests that the expression function folds temporal bucketing and drops
+        the presentation keys.
+    """
+    svl_axis = {
+        "field": "date",
+        "temporal": "YEAR",
+        "agg": "COUNT",
+        "label": "Year",
+        "sort": "ASC",
+    }
+
+    truth = {"bucket": "YEAR", "field": "date", "agg": "COUNT"}
+    answer = expression(svl_axis)
+
+    assert truth == answer
+
+
+def test_plot_to_plan():
+    """ Tests that the plot_to_plan function builds the plan from the scan
+        up.
+    """
+    svl_plot = {
+        "type": "bar",
+        "data": "bigfoot",
+        "x": {"field": "classification", "sort": "DESC"},
+        "y": {"field": "number", "agg": "COUNT"},
+        "filter": "humidity > 0.5",
+    }
+
+    truth = {
+        "node": "sort",
+        "keys": ["x"],
+        "direction": "DESC",
+        "input": {
+            "node": "aggregate",
+            "groups": [{"field": "classification"}],
+            "columns": [
+                {"expr": {"field": "classification"}, "alias": "x"},
+                {"expr": {"field": "number", "agg": "COUNT"}, "alias": "y"},
+            ],
+            "input": {
+                "node": "filter",
+                "predicate": "humidity > 0.5",
+                "input": {"node": "scan", "table": "bigfoot"},
+            },
+        },
+    }
+    answer = plot_to_plan(svl_plot)
+
+    assert truth == answer
+
+
+def test_push_down_predicates():
+    """ Tests that the push_down_predicates function merges filters into the
+        scans.
+    """
+    plan = plot_to_plan(PLOTS[6])
+
+    answer = push_down_predicates(plan)
+
+    assert answer["input"] == {
+        "node": "scan",
+        "table": "bigfoot",
+        "predicates": ["humidity > 0.5"],
+    }
+    # The original plan isn't modified.
+    assert plan["input"]["node"] == "filter"
+
+
+def test_plan_columns():
+    """ Tests that the plan_columns function finds the columns the plan
+        reads.
+    """
+    truth = {"classification", "temperature_mid", "humidity"}
+    answer = plan_columns(plot_to_plan(PLOTS[2]))
+
+    assert truth == answer
+
+
+def test_plan_columns_sql():
+    """ Tests that the plan_columns function can't tell which columns a plan
+        with a transform or a filter reads.
+    """
+    assert plan_columns(plot_to_plan(PLOTS[0])) is None
+    assert plan_columns(plot_to_plan(PLOTS[3])) is None
+
+
+def test_push_down_projections():
+    """ Tests that the push_down_projections function records the columns on
+        the scan.
+    """
+    answer = push_down_projections(plot_to_plan(PLOTS[7]))
+
+    assert answer["input"] == {
+        "node": "scan",
+        "table": "bigfoot",
+        "columns": ["temperature_mid"],
+    }
+
+
+def test_common_subplans():
+    """ Tests that the common_subplans function finds identical plans and
+        scans.
+    """
+    pie = PLOTS[6]
+    titled_pie = dict(pie, title="Sightings by month")
+    unfiltered_pie = {k: v for k, v in pie.items() if k != "filter"}
+    number = dict(PLOTS[7], filter=pie["filter"])
+
+    plans = optimize(
+        [plot_to_plan(p) for p in [pie, unfiltered_pie, titled_pie, number]]
+    )
+
+    truth = {"plans": [[0, 2], [1], [3]], "scans": [[0, 2, 3], [1]]}
+    answer = common_subplans(plans)
+
+    assert truth == answer
+
+
+def test_output_aliases():
+    """ Tests that the output_aliases function lists the output column names.
+    """
+    truth = ["x", "y", "split_by"]
+    answer = output_aliases(plot_to_plan(PLOTS[1]))
+
+    assert truth == answer
+
+
+def test_canonical_plan():
+    """ Tests that the canonical_plan function makes plans that only differ
+        in their output column names equal.
+    """
+    histogram_x = {
+        "type": "histogram",
+        "data": "bigfoot",
+        "x": {"field": "temperature_mid"},
+    }
+    histogram_y = {
+        "type": "histogram",
+        "data": "bigfoot",
+        "y": {"field": "temperature_mid"},
+    }
+
+    assert plot_to_plan(histogram_x) != plot_to_plan(histogram_y)
+    assert canonical_plan(plot_to_plan(histogram_x)) == canonical_plan(
+        plot_to_plan(histogram_y)
+    )
+
+
+def test_canonical_plan_sort():
+    """ Tests that the canonical_plan function renames the sort keys along
+        with the output columns.
+    """
+    answer = canonical_plan(plot_to_plan(PLOTS[1]))
+
+    assert answer["keys"] == ["_2", "_0"]
+    assert output_aliases(answer) == ["_0", "_1", "_2"]
+
+
+def test_fuse_shared_scans():
+    """ Tests that the fuse_shared_scans function shares filtered scans
+        between plots that compute different things.
+    """
+    pie = PLOTS[6]
+    number = dict(PLOTS[7], filter=pie["filter"])
+    unfiltered_number = PLOTS[7]
+
+    plans = optimize(
+        [plot_to_plan(p) for p in [pie, number, unfiltered_number]]
+    )
+    answer_plans, answer_scans = fuse_shared_scans(plans)
+
+    assert answer_scans == [
+        {
+            "name": "_svl_scan_0",
+            "plan": {
+                "node": "scan",
+                "table": "bigfoot",
+                "predicates": ["humidity > 0.5"],
+                # The filter is applied by the shared scan, so the columns
+                # it reads aren't needed past it.
+                "columns": ["date", "temperature_mid"],
+            },
+        }
+    ]
+    assert answer_plans[0]["input"] == {
+        "node": "scan",
+        "table": "bigfoot",
+        "source": "_svl_scan_0",
+        "columns": ["date"],
+    }
+    assert answer_plans[1]["input"]["source"] == "_svl_scan_0"
+    assert answer_plans[2] == plans[2]
+
+
+def test_fuse_shared_scans_transform():
+    """ Tests that the fuse_shared_scans function doesn't share scans with
+        plots that have a TRANSFORM.
+    """
+    transform_number = dict(PLOTS[8], filter=PLOTS[6]["filter"])
+    plans = optimize([plot_to_plan(p) for p in [PLOTS[6], transform_number]])
+
+    answer_plans, answer_scans = fuse_shared_scans(plans)
+
+    assert answer_scans == []
+    assert answer_plans == plans
+
+
+def test_fuse_shared_scans_identical_plans():
+    """ Tests that the fuse_shared_scans function doesn't share scans between
+        plots that compute the same thing, since they share a query instead.
+    """
+    plans = optimize([plot_to_plan(PLOTS[6])] * 2)
+
+    answer_plans, answer_scans = fuse_shared_scans(plans)
+
+    assert answer_scans == []
+    assert answer_plans == plans
+
+
+def test_fuse_number_aggregates():
+    """ Tests that the fuse_number_aggregates function computes the NUMBER
+        plots over a dataset in one aggregate, with each plot's filter
+        applied to its own value.
+    """
+    number = PLOTS[7]
+    filtered_number = dict(
+        number,
+        value={"field": "humidity", "agg": "MAX"},
+        filter="humidity > 0.5",
+    )
+    plans = optimize(
+        [plot_to_plan(p) for p in [number, filtered_number, number, PLOTS[6]]]
+    )
+
+    answer = fuse_number_aggregates(plans)
+
+    truth_fused = {
+        "node": "aggregate",
+        "groups": [],
+        "columns": [
+            {
+                "expr": {"field": "temperature_mid", "agg": "AVG"},
+                "alias": "_0",
+            },
+            {
+                "expr": {
+                    "field": "humidity",
+                    "agg": "MAX",
+                    "when": ["humidity > 0.5"],
+                },
+                "alias": "_1",
+            },
+        ],
+        "input": {"node": "scan", "table": "bigfoot", "columns": None},
+    }
+    assert answer[0] == {
+        "node": "pick",
+        "column": "_0",
+        "alias": "value",
+        "input": truth_fused,
+    }
+    assert answer[1]["column"] == "_1"
+    assert answer[2] == answer[0]
+    # Only NUMBER plots are fused.
+    assert answer[3] == plans[3]
+    assert query_plan(answer[1]) == truth_fused
+
+
+def test_fuse_number_aggregates_same_filter():
+    """ Tests that the fuse_number_aggregates function keeps a filter shared
+        by all the NUMBER plots in the fused query's WHERE clause.
+    """
+    number = dict(PLOTS[7], filter="humidity > 0.5")
+    other_number = dict(number, value={"field": "humidity", "agg": "MAX"})
+    plans = optimize([plot_to_plan(p) for p in [number, other_number]])
+
+    answer = fuse_number_aggregates(plans)
+
+    truth = (
+        "SELECT AVG(temperature_mid) AS _0, MAX(humidity) AS _1 "
+        "FROM bigfoot WHERE humidity > 0.5"
+    )
+    assert truth == logical_plan_to_sql(query_plan(answer[0]))
+    assert query_plan(answer[0]) == query_plan(answer[1])
+
+
+def test_fuse_number_aggregates_single():
+    """ Tests that the fuse_number_aggregates function leaves a lone NUMBER
+        plot alone.
+    """
+    plans = optimize([plot_to_plan(PLOTS[7])] * 2)
+
+    assert plans == fuse_number_aggregates(plans)
@@ -0,0 +1,479 @@
+import io
+import json
+import os
+import pytest
+import subprocess
+import sys
+
+from svl.lsp import (
+    SvlLanguageServer,
+    apply_change,
+    read_message,
+    split_blocks,
+    write_message,
+)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+URI = "file://{}".format(os.path.join(CURRENT_DIR, "dashboard.svl"))
+
+SOURCE = """DATASETS
+    bigfoot "test_datasets/bigfoot_sightings.csv"
+
+LINE bigfoot X date BY YEAR Y number COUNT
+
+CONCAT(
+    HISTOGRAM bigfoot X temperature_mid
+    BAR bigfoot X classification Y temperature_mid AVG
+)
+"""
+
+
+@pytest.fixture
+def server():
+    """ Produces a language server that collects the messages it sends.
+    """
+    messages = []
+    server = SvlLanguageServer(messages.append)
+    server.messages = messages
+    return server
+
+
+def open_document(server, text):
+    server.handle(
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didOpen",
+            "params": {"textDocument": {"uri": URI, "text": text}},
+        }
+    )
+    return server.messages[-1]["params"]["diagnostics"]
+
+
+def change_document(server, change):
+    server.handle(
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didChange",
+            "params": {
+                "textDocument": {"uri": URI},
+                "contentChanges": [change],
+            },
+        }
+    )
+    return server.messages[-1]["params"]["diagnostics"]
+
+
+def test_split_blocks():
+    """ Tests that the split_blocks function splits the source into the
+        DATASETS block and top level charts.
+    """
+    truth = [
+        ("datasets", 'DATASETS\n    bigfoot "test_datasets'),
+        ("chart", "LINE bigfoot X date BY YEAR Y number COUNT"),
+        ("chart", "CONCAT(\n    HISTOGRAM bigfoot X temperature_mid"),
+    ]
+    answer = split_blocks(SOURCE)
+
+    assert truth == [
+        (block["kind"], block["text"][: len(text)])
+        for block, (_, text) in zip(answer, truth)
+    ]
+    assert len(answer) == 3
+    assert "".join(block["text"] for block in answer) == SOURCE
+    assert [block["start"] for block in answer] == [
+        SOURCE.index(block["text"]) for block in answer
+    ]
+
+
+def test_split_blocks_chart_keyword_fields():
+    """ Tests that the split_blocks function doesn't split on fields or
+        datasets named like chart keywords.
+    """
+    source = "LINE bar X line Y number COUNT\nBAR pie X x Y y"
+
+    truth = ["LINE bar X line Y number COUNT\n", "BAR pie X x Y y"]
+    answer = [block["text"] for block in split_blocks(source)]
+
+    assert truth == answer
+
+
+def test_split_blocks_chart_keyword_datasets():
+    """ Tests that the split_blocks function doesn't split on datasets named
+        like chart keywords in DATASETS.
+    """
+    source = (
+        'DATASETS number "x.csv" line SQL "SELECT * FROM number"\n'
+        '    -- A comment before the file.\n'
+        '    bar -- Or after the name.\n'
+        '    "y.csv" FILTER "a > 1"\n'
+        "NUMBER line VALUE a COUNT"
+    )
+
+    truth = [("datasets", 0), ("chart", source.index("NUMBER line"))]
+    answer = [
+        (block["kind"], block["start"]) for block in split_blocks(source)
+    ]
+
+    assert truth == answer
+
+
+def test_apply_change():
+    """ Tests that the apply_change function applies range and full document
+        changes.
+    """
+    source = "LINE bigfoot\nX date Y number"
+    change = {
+        "range": {
+            "start": {"line": 1, "character": 2},
+            "end": {"line": 1, "character": 6},
+        },
+        "text": "latitude",
+    }
+
+    assert apply_change(source, change) == "LINE bigfoot\nX latitude Y number"
+    assert apply_change(source, {"text": "PIE"}) == "PIE"
+
+
+def test_apply_change_utf16():
+    """ Tests that the apply_change function counts characters outside the
+        basic multilingual plane as two UTF-16 code units.
+    """
+    source = 'LINE bigfoot TITLE "\U0001f9b6"\nX date Y number'
+    change = {
+        "range": {
+            "start": {"line": 0, "character": 22},
+            "end": {"line": 0, "character": 22},
+        },
+        "text": " feet",
+    }
+
+    assert apply_change(source, change) == (
+        'LINE bigfoot TITLE "\U0001f9b6 feet"\nX date Y number'
+    )
+
+
+def test_initialize(server):
+    """ Tests that the server responds to initialize with incremental sync.
+    """
+    server.handle(
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}
+    )
+
+    answer = server.messages[-1]
+
+    assert answer["id"] == 1
+    assert answer["result"]["capabilities"]["textDocumentSync"] == 2
+    assert answer["result"]["capabilities"]["positionEncoding"] == "utf-16"
+
+
+def test_diagnostics_valid(server):
+    """ Tests that a valid document has no diagnostics.
+    """
+    assert open_document(server, SOURCE) == []
+
+
+@pytest.mark.parametrize("name", ["number", "line", "bar"])
+def test_diagnostics_chart_keyword_datasets(server, name):
+    """ Tests that a valid document with a dataset named like a chart keyword
+        has no diagnostics.
+    """
+    source = """DATASETS
+    {0} "test_datasets/bigfoot_sightings.csv"
+    recent SQL "SELECT * FROM {0} WHERE date >= '2008-01-01'"
+
+NUMBER {0} VALUE temperature_mid AVG
+LINE recent X date BY YEAR Y humidity AVG
+""".format(
+        name
+    )
+
+    assert open_document(server, source) == []
+
+
+def test_diagnostics_chart_keyword_later_dataset(server):
+    """ Tests that a dataset named like a chart keyword after the first one,
+        which the parser reads as the keyword, is reported as a syntax error
+        in DATASETS rather than as a chart.
+    """
+    source = SOURCE.replace(
+        '.csv"\n', '.csv"\n    number "test_datasets/bigfoot_sightings.csv"\n'
+    )
+
+    answer = [
+        (d["message"], d["range"]["start"])
+        for d in open_document(server, source)
+        if d["severity"] == 1
+    ]
+
+    # Where parse_svl puts it: the file, since "number" started a chart.
+    assert answer == [("Syntax error", {"line": 2, "character": 11})]
+
+
+def test_diagnostics_syntax_error(server):
+    """ Tests that syntax errors are reported at their position in the
+        document.
+    """
+    source = SOURCE.replace("Y number COUNT", "Y number COUNT LABEL")
+
+    answer = open_document(server, source)
+
+    assert len(answer) == 1
+    assert answer[0]["message"] == "Missing value"
+    assert answer[0]["range"]["start"]["line"] in {3, 4}
+
+
+def test_diagnostics_missing_field(server):
+    """ Tests that fields that aren't columns of the dataset's file are
+        reported.
+    """
+    source = SOURCE.replace("X temperature_mid", "X temprature_mid")
+
+    answer = open_document(server, source)
+
+    assert len(answer) == 1
+    assert answer[0]["message"] == (
+        "Field temprature_mid is not a column of bigfoot."
+    )
+    assert answer[0]["range"] == {
+        "start": {"line": 6, "character": 24},
+        "end": {"line": 6, "character": 38},
+    }
+
+
+def test_diagnostics_utf16(server):
+    """ Tests that diagnostic positions count characters outside the basic
+        multilingual plane as two UTF-16 code units.
+    """
+    source = SOURCE.replace(
+        "HISTOGRAM bigfoot X temperature_mid",
+        'HISTOGRAM bigfoot TITLE "\U0001f9b6" X temprature_mid',
+    )
+
+    answer = open_document(server, source)
+
+    assert len(answer) == 1
+    assert answer[0]["range"] == {
+        "start": {"line": 6, "character": 35},
+        "end": {"line": 6, "character": 49},
+    }
+
+
+def test_diagnostics_syntax_error_utf16(server):
+    """ Tests that syntax errors after characters outside the basic
+        multilingual plane are reported at their UTF-16 position.
+    """
+    source = 'LINE bigfoot TITLE "\U0001f9b6" X date Y number COUNT LABEL'
+
+    answer = open_document(server, source)
+
+    assert len(answer) == 1
+    # The emoji is two UTF-16 code units.
+    assert answer[0]["range"]["start"] == {
+        "line": 0,
+        "character": source.index("LABEL") + 1,
+    }
+
+
+def test_diagnostics_unknown_dataset(server):
+    """ Tests that datasets that aren't declared are reported as warnings.
+    """
+    answer = open_document(server, SOURCE + "PIE sasquatch AXIS state")
+
+    assert len(answer) == 1
+    assert answer[0]["severity"] == 2
+
+
+def test_diagnostics_invalid_plot(server):
+    """ Tests that plot validation failures are reported.
+    """
+    source = SOURCE.replace(
+        "Y temperature_mid AVG", "Y temperature_mid AVG COLOR BY humidity"
+    ).replace("Y number COUNT", "Y number")
+
+    answer = open_document(server, source)
+
+    assert len(answer) == 1
+    assert answer[0]["range"]["start"]["line"] == 3
+
+
+def test_incremental_reparse(server):
+    """ Tests that an edit only reparses the blocks it changed.
+    """
+    open_document(server, SOURCE)
+    assert server.parse_count == 3
+
+    answer = change_document(
+        server,
+        {
+            "range": {
+                "start": {"line": 6, "character": 24},
+                "end": {"line": 6, "character": 39},
+            },
+            "text": "humidty",
+        },
+    )
+
+    assert server.parse_count == 4
+    assert [d["message"] for d in answer] == [
+        "Field humidty is not a column of bigfoot."
+    ]
+
+
+def test_did_change_unopened(server):
+    """ Tests that changes to a document that isn't open are ignored.
+    """
+    change_message = {
+        "jsonrpc": "2.0",
+        "method": "textDocument/didChange",
+        "params": {
+            "textDocument": {"uri": URI},
+            "contentChanges": [{"text": SOURCE}],
+        },
+    }
+
+    assert server.handle(change_message)
+    assert server.messages == []
+    assert server.documents == {}
+
+
+def test_handle_error(server, monkeypatch):
+    """ Tests that a request that fails gets an error response and a
+        notification that fails is logged, and the server keeps going.
+    """
+
+    def fail(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(server, "diagnostics", fail)
+    monkeypatch.setattr("svl.lsp.get_parser", fail)
+
+    assert server.handle(
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}}
+    )
+    assert server.handle(
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didOpen",
+            "params": {"textDocument": {"uri": URI, "text": SOURCE}},
+        }
+    )
+    assert server.handle({"jsonrpc": "2.0", "id": 2, "method": "shutdown"})
+
+    error, log, shutdown = server.messages
+    assert error["id"] == 1
+    assert error["error"]["code"] == -32603
+    assert "boom" in error["error"]["message"]
+    assert log["method"] == "window/logMessage"
+    assert "boom" in log["params"]["message"]
+    assert shutdown == {"jsonrpc": "2.0", "id": 2, "result": None}
+
+
+def test_read_write_message():
+    """ Tests that messages round trip through the base protocol framing.
+    """
+    truth = {"jsonrpc": "2.0", "id": 1, "method": "shutdown"}
+    stream = io.BytesIO()
+    write_message(stream, truth)
+    stream.seek(0)
+
+    assert read_message(stream) == truth
+    assert read_message(stream) is None
+
+
+def test_read_message_malformed():
+    """ Tests that read_message raises a ValueError for a message without a
+        Content-Length header or with a body that isn't JSON, and reads the
+        next message after it.
+    """
+    truth = {"jsonrpc": "2.0", "id": 1, "method": "shutdown"}
+    stream = io.BytesIO()
+    stream.write(b"Content-Type: application/json\r\n\r\n{}")
+    stream.write(b"Content-Length: 5\r\n\r\n{oops")
+    write_message(stream, truth)
+    stream.seek(0)
+
+    with pytest.raises(ValueError):
+        read_message(stream)
+    with pytest.raises(ValueError):
+        read_message(stream)
+    assert read_message(stream) == truth
+    assert read_message(stream) is None
+
+
+def test_main():
+    """ Tests the server end to end over stdio.
+    """
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {
+            "jsonrpc": "2.0",
+            "method": "textDocument/didOpen",
+            "params": {
+                "textDocument": {"uri": URI, "text": "LINE bigfoot X date"}
+            },
+        },
+        {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]
+    stdin = io.BytesIO()
+    for message in messages:
+        write_message(stdin, message)
+
+    process = subprocess.run(
+        [sys.executable, "-c", "from svl.lsp import main; main()"],
+        input=stdin.getvalue(),
+        stdout=subprocess.PIPE,
+    )
+    stdout = io.BytesIO(process.stdout)
+    responses = []
+    while True:
+        response = read_message(stdout)
+        if response is None:
+            break
+        responses.append(response)
+
+    assert process.returncode == 0
+    assert [r.get("id") for r in responses] == [1, None, 2]
+    assert [d["message"] for d in responses[1]["params"]["diagnostics"]] == [
+        "Dataset bigfoot is not in DATASETS.",
+        "XY plot does not have X and Y.",
+    ]
+    assert json.dumps(responses[2]["result"]) == "null"
+
+
+def test_main_malformed_message():
+    """ Tests that the server answers messages it can't read with a parse
+        error and keeps serving.
+    """
+    stdin = io.BytesIO()
+    stdin.write(b"Content-Length: 5\r\n\r\n{oops")
+    stdin.write(b"Content-Type: application/json\r\n\r\n")
+    stdin.write(b'Content-Length: 2\r\n\r\n""')
+    for message in [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+        {"jsonrpc": "2.0", "id": 2, "method": "shutdown"},
+        {"jsonrpc": "2.0", "method": "exit"},
+    ]:
+        write_message(stdin, message)
+
+    process = subprocess.run(
+        [sys.executable, "-c", "from svl.lsp import main; main()"],
+        input=stdin.getvalue(),
+        stdout=subprocess.PIPE,
+    )
+    stdout = io.BytesIO(process.stdout)
+    responses = []
+    while True:
+        response = read_message(stdout)
+        if response is None:
+            break
+        responses.append(response)
+
+    assert process.returncode == 0
+    assert [r["id"] for r in responses] == [None, None, None, 1, 2]
+    assert [r["error"]["code"] for r in responses[:3]] == [
+        -32700,
+        -32700,
+        -32600,
+    ]
+    assert "capabilities" in responses[3]["result"]
@@ -1236,6 +1236,50 @@ def test_plotly_template_vars(univariate_appended_data_x):
     assert truth == dissoc(answer, "plotly_js")
 
 
+def test_plotly_template_vars_compact(univariate_appended_data_x):
+    """ Tests that the plotly_template_vars function positions the plots on
+        the merged tracks for the compact layout.
+    """
+    svl_plots = [
+        {
+            "row_start": 0,
+            "row_end": 3,
+            "column_start": 0,
+            "column_end": 2,
+            "type": "histogram",
+            "x": {"field": "temperature"},
+            "data": "bigfoot",
+        },
+        {
+            "row_start": 3,
+            "row_end": 4,
+            "column_start": 0,
+            "column_end": 2,
+            "type": "histogram",
+            "x": {"field": "temperature"},
+            "data": "bigfoot",
+        },
+    ]
+
+    datas = [univariate_appended_data_x] * 2
+
+    answer = plotly_template_vars(svl_plots, datas, layout="compact")
+
+    assert answer["num_rows"] == 4
+    assert answer["num_columns"] == 2
+    assert answer["row_tracks"] == [3, 1]
+    assert answer["column_tracks"] == [2]
+    assert [
+        (
+            plot["row_start"],
+            plot["row_end"],
+            plot["column_start"],
+            plot["column_end"],
+        )
+        for plot in answer["plots"]
+    ] == [(1, 2, 1, 2), (2, 3, 1, 2)]
+
+
 def test_plotly_template():
     """ Tests that the plotly_template function returns the correct value.
     """
@@ -0,0 +1,128 @@
+import os
+import pytest
+
+from svl.data_sources.schema import (
+    file_columns,
+    file_fingerprint,
+    missing_fields,
+    plot_fields,
+    unique_names,
+)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+TEST_CSV_FILE = os.path.join(
+    CURRENT_DIR, "test_datasets", "bigfoot_sightings.csv"
+)
+TEST_PARQUET_FILE = os.path.join(
+    CURRENT_DIR, "test_datasets", "bigfoot_sightings.parquet"
+)
+
+
+def test_file_columns_csv():
+    """ Tests that the file_columns function reads the CSV header.
+    """
+    answer = file_columns(TEST_CSV_FILE)
+
+    assert answer[:3] == ["state", "latitude", "longitude"]
+    assert "temperature_mid" in answer
+
+
+def test_file_columns_parquet():
+    """ Tests that the file_columns function reads the parquet schema.
+    """
+    pytest.importorskip("pyarrow")
+    truth = file_columns(TEST_CSV_FILE)
+    answer = file_columns(TEST_PARQUET_FILE)
+
+    assert set(answer) <= set(truth)
+    assert "temperature_mid" in answer
+
+
+def test_file_columns_duplicate_header(tmpdir):
+    """ Tests that the file_columns function renames repeated CSV header
+        names the way the loader does.
+    """
+    csv_file = tmpdir.join("data.csv")
+    csv_file.write("a,a,b,a\n1,2,3,4\n")
+
+    assert file_columns(str(csv_file)) == ["a", "a.1", "b", "a.2"]
+
+
+def test_unique_names():
+    """ Tests that the unique_names function suffixes repeated names in
+        order, leaving the first occurrence as it is.
+    """
+    truth = ["x", "y", "x.1", "x.2", "y.1"]
+    answer = unique_names(["x", "y", "x", "x", "y"])
+
+    assert truth == answer
+
+
+def test_file_columns_missing_file(tmpdir):
+    """ Tests that the file_columns function returns None for a file that
+        doesn't exist.
+    """
+    assert file_columns(str(tmpdir.join("nope.csv"))) is None
+
+
+def test_file_columns_changed_file(tmpdir):
+    """ Tests that the file_columns function re-reads a file that changed
+        since it was cached.
+    """
+    csv_file = tmpdir.join("data.csv")
+    csv_file.write("a,b\n1,2\n")
+    assert file_columns(str(csv_file)) == ["a", "b"]
+
+    csv_file.write("a,b,c\n1,2,3\n")
+    # Make sure the fingerprint changes even on a coarse clock.
+    os.utime(str(csv_file), ns=(0, 0))
+
+    assert file_columns(str(csv_file)) == ["a", "b", "c"]
+
+
+def test_file_fingerprint(tmpdir):
+    """ Tests that the file_fingerprint function identifies the file by path,
+        size and modification time.
+    """
+    csv_file = tmpdir.join("data.csv")
+    csv_file.write("a,b\n")
+    os.utime(str(csv_file), ns=(1, 2))
+
+    truth = (str(csv_file), 4, 2)
+    answer = file_fingerprint(str(csv_file))
+
+    assert truth == answer
+
+
+def test_plot_fields():
+    """ Tests that the plot_fields function lists the fields of the plot.
+    """
+    svl_plot = {
+        "type": "scatter",
+        "data": "bigfoot",
+        "x": {"field": "latitude"},
+        "y": {"transform": "temperature_mid + 1"},
+        "color_by": {"field": "humidity"},
+    }
+
+    truth = [("x", "latitude"), ("color_by", "humidity")]
+    answer = plot_fields(svl_plot)
+
+    assert truth == answer
+
+
+def test_missing_fields():
+    """ Tests that the missing_fields function finds the fields that aren't
+        columns, ignoring case.
+    """
+    svl_plot = {
+        "type": "bar",
+        "data": "bigfoot",
+        "x": {"field": "Classification"},
+        "y": {"field": "temprature", "agg": "AVG"},
+    }
+
+    truth = [("y", "temprature")]
+    answer = missing_fields(svl_plot, ["classification", "temperature"])
+
+    assert truth == answer
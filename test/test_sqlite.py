@@ -1,24 +1,40 @@
 import pytest
+import csv
+import io
 import os
+import sys
 import pandas as pd
 import sqlite3
 
 from pandas.testing import assert_frame_equal
 
 from svl.data_sources.sqlite import (
-    _csv_to_sqlite_pandas,
-    _parquet_to_sqlite_pandas,
-    _get_field,
     file_to_sqlite,
+    file_batches,
+    csv_byte_ranges,
+    csv_to_sqlite,
+    load_processes,
     sqlite_table,
     create_datasets,
+    materialize_datasets,
+    create_database,
+    svl_to_sql,
+    logical_plan_to_sql,
+    materialize_scan,
+    drop_scan,
+    run_query,
+    rows_to_svl_data,
+    get_svl_data,
+)
+from svl.compiler.errors import SvlNumberValueError
+
+from sql_oracles import (
+    _get_field,
     svl_to_sql_xy,
     svl_to_sql_hist,
     svl_to_sql_pie,
     svl_to_sql_number,
-    get_svl_data,
 )
-from svl.compiler.errors import SvlNumberValueError
 
 
 @pytest.fixture()
@@ -30,6 +46,22 @@ def test_csv_file():
     return test_csv_file
 
 
+@pytest.fixture()
+def stray_quote_csv_file(tmp_path):
+    # A quote in an unquoted value (which the csv module reads as is) throws
+    # off counting quotes, so the newlines in the quoted values after it look
+    # like the ends of records.
+    csv_filename = str(tmp_path / "stray_quote.csv")
+    with open(csv_filename, "w", newline="") as f:
+        f.write('id,text,value\n1,six 5" nails,1.5\n')
+        writer = csv.writer(f)
+        for ii in range(2, 200):
+            writer.writerow(
+                [ii, "line one\nline two" if ii % 3 else "plain", ii / 2]
+            )
+    return csv_filename
+
+
 @pytest.fixture()
 def test_parquet_file():
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -54,34 +86,274 @@ def test_conn(test_csv_file):
     conn.close()
 
 
-def test_csv_to_sqlite_pandas(test_csv_file):
-    """ Tests that the _csv_to_sqlite_pandas function loads the database with
-        the correct values.
+def test_csv_to_sqlite(test_csv_file):
+    """ Tests that the csv_to_sqlite function loads the database with the
+        same values as pandas.
     """
-    csv_filename = test_csv_file
-    table_name = "bigfoot"
     conn = sqlite3.connect(":memory:")
 
     truth = pd.read_csv(test_csv_file)
-    _csv_to_sqlite_pandas(csv_filename, table_name, conn)
+    csv_to_sqlite(test_csv_file, "bigfoot", conn)
     answer = pd.read_sql_query("SELECT * FROM bigfoot", conn)
 
     assert_frame_equal(truth, answer)
 
 
-def test_parquet_to_sqlite_pandas(test_parquet_file):
-    """ Tests that the _parquet_to_sqlite_pandas function loads the database
-        with the correct values.
+def test_csv_to_sqlite_types(tmp_path, monkeypatch):
+    """ Tests that the csv_to_sqlite function infers the column types from
+        the sample and loads the rows in batches.
     """
-    parquet_filename = test_parquet_file
-    table_name = "bigfoot"
+    monkeypatch.setattr("svl.data_sources.sqlite.LOAD_SAMPLE_ROWS", 2)
+    monkeypatch.setattr("svl.data_sources.sqlite.LOAD_BATCH_ROWS", 2)
+    csv_filename = str(tmp_path / "types.csv")
+    with open(csv_filename, "w") as f:
+        f.write(
+            "integer,real,boolean,text,empty,text\n"
+            "1,1.5,True,a,,b\n"
+            "2,NA,false,1,,c\n"
+            ",3,TRUE,c,,d\n"
+        )
     conn = sqlite3.connect(":memory:")
 
-    truth = pd.read_parquet(test_parquet_file)
-    _parquet_to_sqlite_pandas(parquet_filename, table_name, conn)
+    csv_to_sqlite(csv_filename, "types", conn)
+
+    truth_types = [
+        ("integer", "INTEGER"),
+        ("real", "REAL"),
+        ("boolean", "INTEGER"),
+        ("text", "TEXT"),
+        ("empty", "REAL"),
+        ("text.1", "TEXT"),
+    ]
+    answer_types = [
+        (row[1], row[2]) for row in conn.execute("PRAGMA table_info(types)")
+    ]
+    assert truth_types == answer_types
+
+    truth_rows = [
+        (1, 1.5, 1, "a", None, "b"),
+        (2, None, 0, "1", None, "c"),
+        (None, 3.0, 1, "c", None, "d"),
+    ]
+    answer_rows = conn.execute("SELECT * FROM types").fetchall()
+    assert truth_rows == answer_rows
+
+
+def test_csv_to_sqlite_columns_predicate(test_csv_file, monkeypatch):
+    """ Tests that the csv_to_sqlite function only loads the columns and rows
+        it's asked for.
+    """
+    monkeypatch.setattr("svl.data_sources.sqlite.LOAD_BATCH_ROWS", 100)
+    conn = sqlite3.connect(":memory:")
+
+    truth = (
+        pd.read_csv(test_csv_file)
+        .query("date >= '2008-01-01'")[["date", "classification"]]
+        .reset_index(drop=True)
+    )
+    csv_to_sqlite(
+        test_csv_file,
+        "bigfoot",
+        conn,
+        columns=["date", "classification"],
+        predicate="date >= '2008-01-01'",
+    )
     answer = pd.read_sql_query("SELECT * FROM bigfoot", conn)
 
     assert_frame_equal(truth, answer)
+    # The table the batches were filtered in is gone.
+    assert [] == conn.execute(
+        "SELECT name FROM sqlite_temp_master WHERE type = 'table'"
+    ).fetchall()
+
+
+def test_csv_byte_ranges(tmp_path):
+    """ Tests that the csv_byte_ranges function splits a CSV into ranges of
+        whole records, even with newlines and quotes in the values.
+    """
+    csv_filename = str(tmp_path / "quoted.csv")
+    with open(csv_filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "description"])
+        for ii in range(50):
+            writer.writerow(
+                [ii, 'a "tall"\nfigure,\n\nseen' if ii % 3 else "short"]
+            )
+    with open(csv_filename, newline="") as f:
+        truth = list(csv.reader(f))[1:]
+    header_end = len("id,description\r\n")
+
+    for range_bytes in [1, 7, 40, 100000]:
+        ranges = csv_byte_ranges(csv_filename, header_end, range_bytes)
+        answer = []
+        with open(csv_filename, "rb") as f:
+            for start, end in ranges:
+                f.seek(start)
+                text = f.read(end - start).decode("utf-8")
+                answer.extend(csv.reader(io.StringIO(text, newline="")))
+
+        assert ranges[0][0] == header_end
+        assert all(
+            end == next_start
+            for (_, end), (next_start, _) in zip(ranges, ranges[1:])
+        )
+        assert truth == answer
+    assert len(csv_byte_ranges(csv_filename, header_end, 1)) == 50
+
+
+def test_csv_to_sqlite_processes(test_csv_file, monkeypatch):
+    """ Tests that the csv_to_sqlite function loads the same table parsing
+        the file in parallel as it does in the calling process.
+    """
+    monkeypatch.setattr("svl.data_sources.sqlite.CSV_RANGE_BYTES", 2000)
+    conn = sqlite3.connect(":memory:")
+
+    for processes, table_name in [(1, "truth"), (2, "answer")]:
+        csv_to_sqlite(
+            test_csv_file,
+            table_name,
+            conn,
+            columns=["date", "classification", "temperature_mid"],
+            predicate="date >= '2008-01-01'",
+            processes=processes,
+        )
+    truth = pd.read_sql_query("SELECT * FROM truth", conn)
+    answer = pd.read_sql_query("SELECT * FROM answer", conn)
+
+    assert_frame_equal(truth, answer)
+    assert [
+        row[2] for row in conn.execute("PRAGMA table_info(answer)")
+    ] == [row[2] for row in conn.execute("PRAGMA table_info(truth)")]
+    # The parts were all detached.
+    assert "svl_part" not in [
+        row[1] for row in conn.execute("PRAGMA database_list")
+    ]
+
+
+def test_csv_to_sqlite_processes_stray_quote(
+    stray_quote_csv_file, monkeypatch
+):
+    """ Tests that the csv_to_sqlite function loads the same table from a CSV
+        with a stray quote with more than one process as it does with one.
+    """
+    monkeypatch.setattr("svl.data_sources.sqlite.CSV_RANGE_BYTES", 100)
+    conn = sqlite3.connect(":memory:")
+
+    for processes, table_name in [(1, "truth"), (2, "answer")]:
+        csv_to_sqlite(
+            stray_quote_csv_file,
+            table_name,
+            conn,
+            predicate="value > 10",
+            processes=processes,
+        )
+    truth = conn.execute("SELECT * FROM truth").fetchall()
+    answer = conn.execute("SELECT * FROM answer").fetchall()
+
+    assert 179 == len(truth)
+    assert truth == answer
+
+
+def test_csv_to_sqlite_qualified_predicate(test_csv_file, monkeypatch):
+    """ Tests that the csv_to_sqlite function filters the rows with a
+        predicate that qualifies the columns with the table's name, in the
+        calling process and in parallel.
+    """
+    monkeypatch.setattr("svl.data_sources.sqlite.CSV_RANGE_BYTES", 2000)
+    conn = sqlite3.connect(":memory:")
+
+    csv_to_sqlite(test_csv_file, "truth", conn, predicate="humidity > 0.5")
+    for processes in [1, 2]:
+        table_name = "answer_{}".format(processes)
+        csv_to_sqlite(
+            test_csv_file,
+            table_name,
+            conn,
+            predicate="{}.humidity > 0.5".format(table_name),
+            processes=processes,
+        )
+        truth = conn.execute("SELECT * FROM truth").fetchall()
+        answer = conn.execute("SELECT * FROM {}".format(table_name)).fetchall()
+
+        assert truth == answer
+
+
+def test_load_processes_no_process_pools(test_csv_file, monkeypatch):
+    """ Tests that the files are parsed in the calling process where there
+        are no process pools (Python before 3.7).
+    """
+    monkeypatch.setattr("svl.data_sources.sqlite.PROCESS_POOLS", False)
+
+    def process_pool(processes):
+        raise AssertionError("process_pool called without process pools.")
+
+    monkeypatch.setattr("svl.data_sources.sqlite.process_pool", process_pool)
+    conn = sqlite3.connect(":memory:")
+    csv_to_sqlite(test_csv_file, "bigfoot", conn, processes=4)
+
+    assert 1 == load_processes(4)
+    assert 99 == conn.execute("SELECT COUNT(*) FROM bigfoot").fetchone()[0]
+
+
+def test_load_processes_default(test_csv_file, monkeypatch):
+    """ Tests that the files are parsed in the calling process unless more
+        processes are asked for.
+    """
+
+    def process_pool(processes):
+        raise AssertionError("process_pool called by default.")
+
+    monkeypatch.setattr("svl.data_sources.sqlite.process_pool", process_pool)
+    conn = sqlite3.connect(":memory:")
+    csv_to_sqlite(test_csv_file, "bigfoot", conn)
+    materialize_datasets({"sightings": {"file": test_csv_file}}, conn)
+
+    assert 1 == load_processes()
+    assert 99 == conn.execute("SELECT COUNT(*) FROM sightings").fetchone()[0]
+
+
+class BrokenPool:
+    """ A pool of processes one of which died, say because the script that
+        spawned it has no if __name__ == "__main__" guard.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+    def submit(self, *args):
+        from concurrent.futures.process import BrokenProcessPool
+
+        raise BrokenProcessPool("A process in the pool died.")
+
+    def shutdown(self):
+        pass
+
+
+def test_to_sqlite_broken_pool(test_csv_file, monkeypatch):
+    """ Tests that the csv_to_sqlite and materialize_datasets functions
+        parse the files in the calling process if the pool breaks.
+    """
+    monkeypatch.setattr(
+        "svl.data_sources.sqlite.process_pool", lambda processes: BrokenPool()
+    )
+    conn = sqlite3.connect(":memory:")
+    csv_to_sqlite(test_csv_file, "truth", conn, predicate="humidity > 0.5")
+    csv_to_sqlite(
+        test_csv_file, "answer", conn, predicate="humidity > 0.5", processes=2
+    )
+    materialize_datasets(
+        {"sightings": {"file": test_csv_file, "filter": "humidity > 0.5"}},
+        conn,
+        processes=2,
+    )
+
+    truth = conn.execute("SELECT * FROM truth").fetchall()
+
+    assert truth == conn.execute("SELECT * FROM answer").fetchall()
+    assert truth == conn.execute("SELECT * FROM sightings").fetchall()
 
 
 def test_get_field_transform():
@@ -164,11 +436,97 @@ def test_file_to_sqlite_parquet(test_parquet_file):
     assert_frame_equal(truth, answer)
 
 
+def test_file_to_sqlite_parquet_no_pyarrow(test_parquet_file, monkeypatch):
+    """ Tests that the file_to_sqlite function raises a NotImplementedError
+        for a parquet file when pyarrow isn't installed.
+    """
+    monkeypatch.setattr("svl.data_sources.sqlite.PYARROW", False)
+    conn = sqlite3.connect(":memory:")
+
+    with pytest.raises(NotImplementedError, match="needs pyarrow"):
+        file_to_sqlite(test_parquet_file, "bigfoot", conn)
+
+
+def test_file_to_sqlite_chunks(test_csv_file, test_parquet_file):
+    """ Tests that the file_to_sqlite function loads the same table a chunk
+        of rows at a time as it does all at once, for CSV and parquet.
+    """
+    for filename in [test_csv_file, test_parquet_file]:
+        conn = sqlite3.connect(":memory:")
+        file_to_sqlite(filename, "bigfoot", conn)
+        file_to_sqlite(filename, "bigfoot_chunks", conn, chunk_rows=7)
+
+        truth = pd.read_sql_query("SELECT * FROM bigfoot", conn)
+        answer = pd.read_sql_query("SELECT * FROM bigfoot_chunks", conn)
+
+        assert_frame_equal(truth, answer)
+        assert [
+            row[2]
+            for row in conn.execute("PRAGMA table_info(bigfoot_chunks)")
+        ] == [row[2] for row in conn.execute("PRAGMA table_info(bigfoot)")]
+
+
+def test_file_to_sqlite_parquet_types(test_parquet_file):
+    """ Tests that the file_to_sqlite function loads a parquet file with the
+        same values pandas does.
+    """
+    conn = sqlite3.connect(":memory:")
+    pd.read_parquet(test_parquet_file).to_sql("truth", conn, index=False)
+    file_to_sqlite(test_parquet_file, "answer", conn, chunk_rows=10)
+
+    truth = pd.read_sql_query("SELECT * FROM truth", conn)
+    answer = pd.read_sql_query("SELECT * FROM answer", conn)
+
+    assert_frame_equal(truth, answer)
+
+
+def test_file_to_sqlite_parquet_old_pyarrow(test_parquet_file, monkeypatch):
+    """ Tests that the file_to_sqlite function loads a parquet file with a
+        pyarrow that doesn't have the large types.
+    """
+    conn = sqlite3.connect(":memory:")
+    file_to_sqlite(test_parquet_file, "truth", conn)
+    monkeypatch.delattr("pyarrow.types.is_large_binary")
+    monkeypatch.delattr("pyarrow.types.is_large_string")
+    file_to_sqlite(test_parquet_file, "answer", conn)
+
+    truth = conn.execute("SELECT * FROM truth").fetchall()
+    answer = conn.execute("SELECT * FROM answer").fetchall()
+
+    assert truth == answer
+
+
+def test_file_batches_memory_budget(test_csv_file):
+    """ Tests that the file_batches function fits the batches of rows in the
+        memory budget.
+    """
+    truth = file_batches(test_csv_file)
+    answer = file_batches(test_csv_file, memory_budget=10000)
+    truth_batches = list(truth.batches)
+    answer_batches = list(answer.batches)
+    batch_bytes = [
+        sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+            for row in batch
+        )
+        for batch in answer_batches
+    ]
+
+    assert truth.columns == answer.columns
+    assert len(truth_batches) == 1
+    assert len(answer_batches) > 1
+    # The size of a row is estimated from the sample, which is all of them.
+    assert sum(batch_bytes) / len(answer_batches) <= 10000
+    assert truth_batches[0] == [
+        row for batch in answer_batches for row in batch
+    ]
+
+
 def test_sqlite_table(test_csv_file):
     """ Tests that the sqlite_table function executes correctly.
     """
     conn = sqlite3.connect(":memory:")
-    _csv_to_sqlite_pandas(test_csv_file, "bigfoot", conn)
+    csv_to_sqlite(test_csv_file, "bigfoot", conn)
     sqlite_table(
         "SELECT * FROM bigfoot WHERE date >= '2008-01-01'",
         "recent_bigfoot",
@@ -212,6 +570,103 @@ def test_create_datasets(test_csv_file):
     assert_frame_equal(truth_recent_bigfoot, answer_recent_bigfoot)
 
 
+def test_materialize_datasets(test_csv_file):
+    """ Tests that the materialize_datasets function creates SQL datasets
+        after the datasets they refer to, whatever order they're declared in.
+    """
+    svl_datasets = {
+        "recent_class_a": {
+            "sql": "SELECT * FROM recent_bigfoot "
+            "WHERE classification = 'Class A'"
+        },
+        "recent_bigfoot": {
+            "sql": "SELECT * FROM bigfoot WHERE date >= '2008-01-01'"
+        },
+        "bigfoot": {"file": test_csv_file},
+    }
+    conn = create_database()
+
+    answer = materialize_datasets(svl_datasets, conn, workers=2)
+
+    assert set(svl_datasets) == set(answer)
+    truth = pd.read_csv(test_csv_file).query(
+        "date >= '2008-01-01' and classification == 'Class A'"
+    )
+    assert len(truth) == (
+        conn.execute("SELECT COUNT(*) FROM recent_class_a").fetchone()[0]
+    )
+
+
+def test_materialize_datasets_processes(
+    test_csv_file, test_parquet_file, tmp_path, monkeypatch
+):
+    """ Tests that the materialize_datasets function loads the same tables
+        parsing the files in a pool of processes as it does in the threads
+        reading them.
+    """
+    import pyarrow.parquet as pq
+
+    monkeypatch.setattr("svl.data_sources.sqlite.CSV_RANGE_BYTES", 5000)
+    # Several row groups, so the file is parsed in parts.
+    parquet_filename = str(tmp_path / "bigfoot_sightings.parquet")
+    pq.write_table(
+        pq.read_table(test_parquet_file), parquet_filename, row_group_size=10
+    )
+    svl_datasets = {
+        "bigfoot": {"file": test_csv_file},
+        "bigfoot_parquet": {
+            "file": parquet_filename,
+            "filter": "classification = 'Class B'",
+        },
+        "class_a": {
+            "file": test_csv_file,
+            "columns": ["date", "classification"],
+            "filter": "classification = 'Class A'",
+        },
+    }
+    truth_conn = create_database()
+    answer_conn = create_database()
+
+    materialize_datasets(svl_datasets, truth_conn, processes=1)
+    materialize_datasets(svl_datasets, answer_conn, processes=2)
+
+    for name in svl_datasets:
+        query = "SELECT * FROM {}".format(name)
+        assert_frame_equal(
+            pd.read_sql_query(query, truth_conn),
+            pd.read_sql_query(query, answer_conn),
+        )
+
+
+def test_materialize_datasets_processes_stray_quote(
+    stray_quote_csv_file, monkeypatch
+):
+    """ Tests that the materialize_datasets function loads a CSV with a stray
+        quote in the thread reading it when the ranges of it parsed in the
+        pool of processes don't split it into whole records.
+    """
+    monkeypatch.setattr("svl.data_sources.sqlite.CSV_RANGE_BYTES", 100)
+    svl_datasets = {
+        "quotes": {"file": stray_quote_csv_file, "filter": "value > 10"},
+        "quote_count": {"sql": "SELECT COUNT(*) AS n FROM quotes"},
+    }
+    truth_conn = create_database()
+    answer_conn = create_database()
+
+    materialize_datasets(svl_datasets, truth_conn, processes=1)
+    materialize_datasets(svl_datasets, answer_conn, processes=2)
+
+    for name in svl_datasets:
+        query = "SELECT * FROM {}".format(name)
+        assert (
+            truth_conn.execute(query).fetchall()
+            == answer_conn.execute(query).fetchall()
+        )
+    assert [(179,)] == answer_conn.execute(
+        "SELECT * FROM quote_count"
+    ).fetchall()
+
+
 def test_svl_to_sql_hist():
     """ Tests that the svl_to_sql_hist function returns the correct value.
     """
@@ -867,3 +1322,144 @@ def test_get_svl_data_empty_result_set(test_conn):
 
     with pytest.raises(sqlite3.DatabaseError):
         get_svl_data(svl_plot, test_conn)
+
+
+def test_svl_to_sql():
+    """ Tests that the svl_to_sql function builds the query for the plot
+        type.
+    """
+    svl_plot = {
+        "type": "pie",
+        "data": "bigfoot",
+        "axis": {"field": "classification"},
+    }
+
+    truth = svl_to_sql_pie(svl_plot)
+    answer = svl_to_sql(svl_plot)
+
+    assert truth == answer
+
+
+def test_run_query_rows_to_svl_data(test_conn):
+    """ Tests that running a plot's query and converting the rows gives the
+        same data as get_svl_data.
+    """
+    svl_plot = {
+        "type": "pie",
+        "data": "bigfoot",
+        "axis": {"field": "classification"},
+    }
+
+    truth = get_svl_data(svl_plot, test_conn)
+    answer = rows_to_svl_data(
+        svl_plot, run_query(svl_to_sql(svl_plot), test_conn)
+    )
+
+    assert truth == answer
+
+
+def test_run_query_empty_result_set(test_conn):
+    """ Tests that the run_query function raises a sqlite3.DatabaseError when
+        the query returns no rows.
+    """
+    with pytest.raises(sqlite3.DatabaseError, match="empty result set"):
+        run_query("SELECT * FROM bigfoot WHERE 0", test_conn)
+
+
+def test_logical_plan_to_sql_scan():
+    """ Tests that the logical_plan_to_sql function lowers a bare scan to a
+        query for its columns.
+    """
+    plan = {
+        "node": "scan",
+        "table": "bigfoot",
+        "predicates": ["humidity > 0.5", "latitude > 40 OR state = 'WA'"],
+        "columns": ["classification", "humidity"],
+    }
+
+    # Each predicate is parenthesized, so the OR doesn't take the AND in.
+    truth = (
+        "SELECT classification, humidity FROM bigfoot "
+        "WHERE (humidity > 0.5) AND (latitude > 40 OR state = 'WA')"
+    )
+    answer = logical_plan_to_sql(plan)
+
+    assert truth == answer
+
+
+def test_logical_plan_to_sql_shared_scan():
+    """ Tests that the logical_plan_to_sql function reads shared scans under
+        the name of the dataset.
+    """
+    plan = {
+        "node": "project",
+        "columns": [{"expr": {"field": "humidity"}, "alias": "x"}],
+        "input": {
+            "node": "scan",
+            "table": "bigfoot",
+            "source": "_svl_scan_0",
+            "columns": ["humidity"],
+        },
+    }
+
+    truth = "SELECT humidity AS x FROM _svl_scan_0 AS bigfoot"
+    answer = logical_plan_to_sql(plan)
+
+    assert truth == answer
+
+
+def test_materialize_scan(test_conn):
+    """ Tests that the materialize_scan function creates (and replaces) the
+        temporary table, and drop_scan drops it.
+    """
+    query = "SELECT classification FROM bigfoot WHERE classification = 'A'"
+    materialize_scan("_svl_scan_0", query, test_conn)
+    materialize_scan("_svl_scan_0", query, test_conn)
+
+    truth = test_conn.execute(query).fetchall()
+    answer = test_conn.execute("SELECT * FROM _svl_scan_0").fetchall()
+
+    assert [tuple(row) for row in truth] == [tuple(row) for row in answer]
+
+    drop_scan("_svl_scan_0", test_conn)
+
+    with pytest.raises(sqlite3.OperationalError):
+        test_conn.execute("SELECT * FROM _svl_scan_0")
+
+
+def test_logical_plan_to_sql_when():
+    """ Tests that the logical_plan_to_sql function lowers conditional
+        aggregates to CASE expressions.
+    """
+    plan = {
+        "node": "aggregate",
+        "groups": [],
+        "columns": [
+            {
+                "expr": {"agg": "COUNT", "when": ["humidity > 0.5"]},
+                "alias": "_0",
+            },
+            {
+                "expr": {
+                    "field": "humidity",
+                    "agg": "AVG",
+                    "when": [
+                        "humidity > 0.5",
+                        "latitude > 40 OR state = 'WA'",
+                    ],
+                },
+                "alias": "_1",
+            },
+        ],
+        "input": {"node": "scan", "table": "bigfoot"},
+    }
+
+    truth = (
+        "SELECT COUNT(CASE WHEN humidity > 0.5 THEN 1 END) AS _0, "
+        "AVG(CASE WHEN (humidity > 0.5) AND "
+        "(latitude > 40 OR state = 'WA') THEN humidity END) AS _1 "
+        "FROM bigfoot"
+    )
+    answer = logical_plan_to_sql(plan)
+
+    assert truth == answer